@@ -151,13 +151,19 @@ else:
     from .interface import CLASSES_TO_REGISTER as INTERFACE_CLASSES
     from .main_operator import CLASSES_TO_REGISTER as OPERATOR_CLASSES
     from .head import MESH_OT_FBAddHead
-    from .settings import FBExifItem, FBCameraItem, FBHeadItem, FBSceneSettings
+    from .settings import (FBExifItem, FBCameraItem, FBHeadItem,
+                           FBSceneSettings, migrate_model_matrices_handler,
+                           object_index_reset_handler)
     from .pinmode import FB_OT_PinMode
-    from .pick_operator import FB_OT_PickMode, FB_OT_PickModeStarter
+    from .pick_operator import (FB_OT_PickMode, FB_OT_PickModeStarter,
+                                FB_OT_AutoPinAll)
     from .movepin import FB_OT_MovePin
     from .actor import FB_OT_HistoryActor, FB_OT_CameraActor
+    from .fbloader import (deferred_save_pre_handler,
+                           deferred_save_load_pre_handler)
 
     from .utils.icons import FBIcons
+    from .preferences.user_preferences import UserPreferences
 
     CLASSES_TO_REGISTER = (MESH_OT_FBAddHead,
                            FBExifItem,
@@ -167,6 +173,7 @@ else:
                            FB_OT_PinMode,
                            FB_OT_PickMode,
                            FB_OT_PickModeStarter,
+                           FB_OT_AutoPinAll,
                            FB_OT_MovePin,
                            FB_OT_HistoryActor,
                            FB_OT_CameraActor) + OPERATOR_CLASSES + \
@@ -186,6 +193,11 @@ else:
         delattr(bpy.types.Scene, Config.addon_global_var_name)
 
 
+    def _object_index_handlers():
+        return (bpy.app.handlers.load_post, bpy.app.handlers.undo_post,
+                bpy.app.handlers.redo_post)
+
+
     def menu_func(self, context):
         self.layout.operator(MESH_OT_FBAddHead.bl_idname, icon='USER')
 
@@ -206,9 +218,19 @@ else:
         FBIcons.register()
         logger.debug("ICONS REGISTERED")
 
+        bpy.app.handlers.save_pre.append(deferred_save_pre_handler)
+        logger.debug("SAVE HANDLER REGISTERED")
+        bpy.app.handlers.load_pre.append(deferred_save_load_pre_handler)
+        bpy.app.handlers.load_post.append(migrate_model_matrices_handler)
+        logger.debug("LOAD HANDLER REGISTERED")
+        for handlers in _object_index_handlers():
+            handlers.append(object_index_reset_handler)
+
 
     def unregister():
         logger = logging.getLogger(__name__)
+        UserPreferences.flush()
+        logger.debug("USER PREFERENCES SAVED")
         logger.debug("START UNREGISTER CLASSES")
         for cls in reversed(CLASSES_TO_REGISTER):
             logger.debug("UNREGISTER CLASS: {}".format(str(cls)))
@@ -221,6 +243,18 @@ else:
         FBIcons.unregister()
         logger.debug("ICONS UNREGISTERED")
 
+        if deferred_save_pre_handler in bpy.app.handlers.save_pre:
+            bpy.app.handlers.save_pre.remove(deferred_save_pre_handler)
+        logger.debug("SAVE HANDLER UNREGISTERED")
+        if deferred_save_load_pre_handler in bpy.app.handlers.load_pre:
+            bpy.app.handlers.load_pre.remove(deferred_save_load_pre_handler)
+        if migrate_model_matrices_handler in bpy.app.handlers.load_post:
+            bpy.app.handlers.load_post.remove(migrate_model_matrices_handler)
+        logger.debug("LOAD HANDLER UNREGISTERED")
+        for handlers in _object_index_handlers():
+            if object_index_reset_handler in handlers:
+                handlers.remove(object_index_reset_handler)
+
 
 if __name__ == "__main__":
     register()
@@ -0,0 +1,230 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+
+import logging
+import threading
+import time
+
+from .config import Config, get_main_settings
+from .fbloader import FBLoader
+from .preferences.user_preferences import UserPreferences
+from .utils.focal_length import update_camera_focal
+from .utils.other import FBTimer, force_ui_redraw
+from .utils.tracing import FBTracer
+
+
+class FBAsyncSolveTimer(FBTimer):
+    @classmethod
+    def _apply_results(cls):
+        if not cls.is_active() or not FBAsyncSolver.is_running():
+            cls.stop()
+            return None
+        FBAsyncSolver.apply_result()
+        return Config.drag_frame_interval
+
+    @classmethod
+    def start(cls):
+        cls._start(cls._apply_results, persistent=False)
+
+    @classmethod
+    def stop(cls):
+        cls._stop(cls._apply_results)
+
+
+class FBAsyncSolver:
+    """ Solves pin drags in a worker thread with latest-wins semantics.
+        One request is solved at a time and a newer request replaces the
+        waiting one. The worker does not touch the builder until the main
+        thread has applied the previous result in a bpy.app.timers callback,
+        so the builder is never used from two threads at once """
+    _condition = threading.Condition()
+    _thread = None
+    _request = None  # (keyframe, pin index, position in frame space)
+    # (keyframe, exception or None, solve start time, solve duration)
+    _result = None
+    _busy = False
+    _stop_requested = False
+    _headnum = -1
+    _camnum = -1
+    # None until the first solve is measured.
+    # False means synchronous solve is used
+    _gil_released = None
+    _submitted = 0
+    _dropped = 0
+    _applied = 0
+
+    @classmethod
+    def is_enabled(cls):
+        return UserPreferences.get_value('async_solve',
+                                         UserPreferences.type_bool)
+
+    @classmethod
+    def is_running(cls):
+        return cls._thread is not None
+
+    @classmethod
+    def _measure_first_solve(cls):
+        """ Main thread only. The first real request of a session decides
+            whether the worker thread is used. The main thread sleeps in
+            short waits, if the binding holds the GIL during the solve
+            they can't return until the solve is over """
+        interval = Config.async_solve_probe_interval
+        last = time.perf_counter()
+        max_gap = 0.0
+        with cls._condition:
+            while cls._result is None:
+                cls._condition.wait(timeout=interval)
+                now = time.perf_counter()
+                max_gap = max(max_gap, now - last)
+                last = now
+            solve_time = cls._result[3]
+
+        # Fast solves don't need a thread at all
+        cls._gil_released = solve_time >= Config.async_solve_min_time and \
+            max_gap < 0.5 * solve_time
+        logger = logging.getLogger(__name__)
+        logger.info('ASYNC SOLVE PROBE: solve {:.4f}s, main thread stall '
+                    '{:.4f}s, async {}'.format(solve_time, max_gap,
+                                               cls._gil_released))
+        if cls._gil_released:
+            cls.apply_result()
+        else:
+            cls.finish()  # Rest of the drag is solved synchronously
+
+    @classmethod
+    def start(cls, headnum, camnum):
+        """ Returns False when the synchronous path should be used """
+        if cls.is_running() or not cls.is_enabled() or \
+                cls._gil_released is False:
+            return False
+        FBLoader.prepare_solve(headnum, camnum)
+        cls._headnum = headnum
+        cls._camnum = camnum
+        cls._request = None
+        cls._result = None
+        cls._busy = False
+        cls._stop_requested = False
+        cls._thread = threading.Thread(target=cls._worker, daemon=True)
+        cls._thread.start()
+        FBAsyncSolveTimer.start()
+        return True
+
+    @classmethod
+    def submit(cls, kid, pin_idx, frame_pos):
+        with cls._condition:
+            if cls._request is not None:
+                cls._dropped += 1
+            cls._request = (kid, pin_idx, frame_pos)
+            cls._submitted += 1
+            cls._condition.notify_all()
+        if cls._gil_released is None:
+            cls._measure_first_solve()
+
+    @classmethod
+    def _worker(cls):
+        fb = FBLoader.get_builder()
+        while True:
+            with cls._condition:
+                while cls._request is None or cls._result is not None:
+                    if cls._stop_requested and cls._request is None:
+                        return
+                    cls._condition.wait()
+                kid, pin_idx, frame_pos = cls._request
+                cls._request = None
+                cls._busy = True
+
+            start = time.perf_counter()
+            error = None
+            try:
+                fb.move_pin(kid, pin_idx, frame_pos)
+                fb.solve_for_current_pins(kid)
+            except Exception as err:
+                error = err
+            duration = time.perf_counter() - start
+
+            with cls._condition:
+                cls._result = (kid, error, start, duration)
+                cls._busy = False
+                cls._condition.notify_all()
+
+    @classmethod
+    def apply_result(cls):
+        """ Main thread only. The worker waits while a result is pending """
+        with cls._condition:
+            result = cls._result
+        if result is None:
+            return False
+
+        kid, error, start, duration = result
+        # FBTracer is not thread-safe, so the worker only measures
+        if FBTracer.is_enabled():
+            FBTracer.add_event('solve.async', start, duration)
+        if error is not None:
+            FBLoader.solve_error(cls._headnum, error)
+        else:
+            cls._apply(kid)
+        with cls._condition:
+            cls._result = None
+            cls._applied += 1
+            cls._condition.notify_all()
+        return True
+
+    @classmethod
+    def _apply(cls, kid):
+        settings = get_main_settings()
+        head = settings.get_head(cls._headnum)
+        if head is None or head.get_camera(cls._camnum) is None:
+            return
+        camera = head.get_camera(cls._camnum)
+        fb = FBLoader.get_builder()
+        update_camera_focal(camera, fb)
+        FBLoader.place_camera(cls._headnum, cls._camnum)
+
+        vp = FBLoader.viewport()
+        vp.update_wireframe_lod()
+        vp.wireframer().init_geom_data_from_fb(head.headobj, fb, kid)
+        vp.wireframer().update_edges_vertices()
+        vp.wireframer().create_batches()
+        vp.update_surface_points(fb, head.headobj, kid)
+        force_ui_redraw('VIEW_3D')
+
+    @classmethod
+    def finish(cls):
+        """ Main thread only. Waits for the latest request,
+            applies it and stops the worker """
+        if not cls.is_running():
+            return
+        while True:
+            cls.apply_result()
+            with cls._condition:
+                if cls._request is None and not cls._busy and \
+                        cls._result is None:
+                    cls._stop_requested = True
+                    cls._condition.notify_all()
+                    break
+                cls._condition.wait(timeout=0.1)
+        cls._thread.join()
+        cls._thread = None
+        FBAsyncSolveTimer.stop()
+        logger = logging.getLogger(__name__)
+        logger.debug('ASYNC SOLVE FINISHED: {}'.format(cls.stats()))
+
+    @classmethod
+    def stats(cls):
+        return {'submitted': cls._submitted, 'dropped': cls._dropped,
+                'applied': cls._applied}
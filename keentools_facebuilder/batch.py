@@ -0,0 +1,352 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+""" Headless batch processing of photo sets.
+
+Every subdirectory of the input directory holds photos of one head.
+For each of them a head is created, cameras are loaded with EXIF data,
+all views are auto-pinned, the texture is baked and the results are
+exported to <output>/<set name>/ together with a manifest.json file.
+
+Command line (the addon has to be installed):
+
+    blender -b --addons keentools_facebuilder --python-expr \\
+        "import keentools_facebuilder.batch as b; b.main()" -- \\
+        --input /path/to/photo/sets --output /path/to/results --workers 4
+
+From Python inside Blender:
+
+    from keentools_facebuilder import batch
+    batch.process_image_set('/photos/john', '/results/john')
+    batch.run_batch('/photos', '/results', workers=4)
+
+run_batch and run_queue spread heads across `workers` long-living
+background Blender processes (see blender_independent_packages.head_farm)
+with per-head timeouts, retries and a resumable journal in the output
+directory. Workers reuse the pykeentools library directory of the
+parent process. No UI context is needed.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import bpy
+
+from .blender_independent_packages import head_farm
+from .blender_independent_packages import pykeentools_loader as pkt_loader
+from .blender_independent_packages.pykeentools_loader import module as pkt_module
+from .config import Config, get_main_settings, get_operator
+from .fbloader import FBLoader
+from .pick_operator import auto_pin_cameras, AutoPinStatus
+from .settings import FBModelMatCache, FBObjectIndex
+from .utils import coords, manipulate, materials
+from .utils.face_detection import FBDetectionCache
+from .utils.operator_action import fbx_export_params
+
+
+_MAIN_EXPR = 'import {}.batch as b; b.main()'
+
+
+def _addon_name():
+    return __name__.split('.')[0]
+
+
+def image_files(directory):
+    return sorted(os.path.join(directory, name)
+                  for name in os.listdir(directory)
+                  if os.path.splitext(name)[1].lower()
+                  in Config.batch_image_extensions and
+                  os.path.isfile(os.path.join(directory, name)))
+
+
+def find_image_sets(input_dir):
+    """ Subdirectories with images or input_dir itself if it has images """
+    sets = [os.path.join(input_dir, name)
+            for name in sorted(os.listdir(input_dir))
+            if os.path.isdir(os.path.join(input_dir, name))]
+    sets = [x for x in sets if len(image_files(x)) > 0]
+    if len(sets) == 0 and len(image_files(input_dir)) > 0:
+        return [input_dir]
+    return sets
+
+
+def manifest_path(output_dir):
+    return os.path.join(output_dir, Config.batch_manifest_filename)
+
+
+def read_manifest(output_dir):
+    try:
+        with open(manifest_path(output_dir), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(output_dir, manifest):
+    with open(manifest_path(output_dir), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _create_head():
+    op = get_operator(Config.fb_add_head_operator_idname)
+    if op('EXEC_DEFAULT') != {'FINISHED'}:
+        raise RuntimeError('Head creation failed')
+    return get_main_settings().get_last_headnum()
+
+
+def _save_texture(tex_name, filepath):
+    image = bpy.data.images[tex_name]
+    image.filepath_raw = filepath
+    image.file_format = 'PNG'
+    image.save()
+
+
+def _export_fbx(headobj, filepath):
+    manipulate.select_object_only(headobj)
+    bpy.ops.export_scene.fbx('EXEC_DEFAULT', filepath=filepath,
+                             **fbx_export_params())
+
+
+def process_image_set(set_dir, output_dir, bake_texture=True,
+                      export_fbx=True, save_blend=True):
+    """ Build one head in the current Blender session in a new scene.
+        Returns manifest dict that is also written to output_dir """
+    logger = logging.getLogger(__name__)
+    os.makedirs(output_dir, exist_ok=True)
+    files = image_files(set_dir)
+    manifest = {'name': os.path.basename(os.path.normpath(set_dir)),
+                'input': set_dir,
+                'status': 'failed',
+                'error': None,
+                'images': files,
+                'cameras': [],
+                'outputs': {},
+                'timings': {}}
+
+    def _step(name, start):
+        manifest['timings'][name] = time.time() - start
+        return time.time()
+
+    start = time.time()
+    try:
+        if len(files) == 0:
+            raise RuntimeError('No images in {}'.format(set_dir))
+
+        bpy.ops.scene.new(type='NEW')
+        headnum = _create_head()
+        FBLoader.load_model(headnum)
+        camnums = FBLoader.load_images_as_cameras(headnum, files)
+        FBLoader.save_only(headnum)
+        start = _step('load', start)
+
+        status, results = auto_pin_cameras(headnum, camnums)
+        if status != AutoPinStatus.Ok:
+            raise RuntimeError('Auto-pinning failed, status: {}'.format(
+                status))
+        head = get_main_settings().get_head(headnum)
+        coords.update_head_mesh_neutral(FBLoader.get_builder(), head.headobj)
+        for camnum in camnums:
+            camera = head.get_camera(camnum)
+            manifest['cameras'].append({
+                'image': camera.get_abspath(),
+                'pinned': bool(results.get(camnum)),
+                'pins': camera.pins_count,
+                'focal': camera.focal})
+        if not any(results.values()):
+            raise RuntimeError('No face has been pinned')
+        start = _step('auto_pin', start)
+
+        if bake_texture:
+            if not materials.bake_tex(headnum, Config.tex_builder_filename):
+                raise RuntimeError('Texture baking failed')
+            filepath = os.path.join(output_dir, 'texture.png')
+            _save_texture(Config.tex_builder_filename, filepath)
+            mat = materials.show_texture_in_mat(Config.tex_builder_filename,
+                                                Config.tex_builder_matname)
+            materials.assign_material_to_object(head.headobj, mat)
+            manifest['outputs']['texture'] = filepath
+            start = _step('bake_texture', start)
+
+        if export_fbx:
+            filepath = os.path.join(output_dir, 'head.fbx')
+            _export_fbx(head.headobj, filepath)
+            manifest['outputs']['fbx'] = filepath
+            start = _step('export_fbx', start)
+
+        if save_blend:
+            filepath = os.path.join(output_dir, 'head.blend')
+            bpy.ops.wm.save_as_mainfile(filepath=filepath, copy=True)
+            manifest['outputs']['blend'] = filepath
+            _step('save_blend', start)
+
+        manifest['status'] = 'done'
+    except Exception as err:
+        logger.error('Batch processing of {} failed: {}'.format(set_dir,
+                                                                str(err)))
+        manifest['error'] = str(err)
+
+    _write_manifest(output_dir, manifest)
+    return manifest
+
+
+def reset_session():
+    """ Empty file and clean addon state. Farm workers are long-living,
+        so data of previous jobs must not get into the next head.blend """
+    bpy.ops.wm.read_homefile(use_empty=True)
+    FBLoader.new_builder()
+    FBDetectionCache.clear()
+    FBObjectIndex.reset()
+    FBModelMatCache.clear()
+    coords.FBViewGeometry.invalidate()
+
+
+def farm_job(job):
+    """ Head farm job function, see blender_independent_packages.head_farm """
+    reset_session()
+    manifest = process_image_set(job['set'], job['output'],
+                                 **job.get('options', {}))
+    if manifest['status'] != 'done':
+        raise RuntimeError(manifest['error'])
+    return manifest
+
+
+def _shared_pkt_env():
+    """ Workers import already prepared pykeentools library directory
+        instead of making own shadow copies """
+    env = dict(os.environ)
+    try:
+        pkt_module()
+    except ImportError:
+        return env
+    lib_directory = pkt_loader.lib_directory()
+    if lib_directory is not None:
+        env[pkt_loader.SHARED_LIB_DIRECTORY_ENV] = lib_directory
+    return env
+
+
+def make_farm(source, output_dir, workers=1, blender=None,
+              timeout=Config.batch_job_timeout,
+              retries=Config.batch_job_retries):
+    os.makedirs(output_dir, exist_ok=True)
+    command = head_farm.blender_worker_command(
+        '{}:farm_job'.format(__name__), blender or bpy.app.binary_path,
+        _addon_name())
+    return head_farm.HeadFarm(
+        source, os.path.join(output_dir, Config.batch_journal_filename),
+        command, workers=workers, timeout=timeout, retries=retries,
+        env=_shared_pkt_env(), log_dir=os.path.join(output_dir, 'logs'))
+
+
+def run_batch(input_dir, output_dir, workers=1, blender=None,
+              timeout=Config.batch_job_timeout,
+              retries=Config.batch_job_retries, **options):
+    """ Process all image sets found in input_dir by worker processes.
+        options are passed to process_image_set. The run is journaled
+        in output_dir, restarting it skips already built heads.
+        Returns manifests in the order of image sets """
+    logger = logging.getLogger(__name__)
+    jobs = [{'id': os.path.basename(x), 'set': x,
+             'output': os.path.join(output_dir, os.path.basename(x)),
+             'options': options} for x in find_image_sets(input_dir)]
+    farm = make_farm(head_farm.ListJobSource(jobs), output_dir,
+                     workers=workers, blender=blender,
+                     timeout=timeout, retries=retries)
+    logger.info('batch stats: {}'.format(farm.run()))
+
+    manifests = []
+    for job in jobs:
+        manifest = read_manifest(job['output'])
+        if manifest is None:
+            manifest = {'name': job['id'], 'input': job['set'],
+                        'status': 'failed', 'error': 'Worker crashed'}
+        manifests.append(manifest)
+    return manifests
+
+
+def run_queue(queue_dir, output_dir, workers=1, blender=None,
+              timeout=Config.batch_job_timeout,
+              retries=Config.batch_job_retries):
+    """ Process jobs of a DirectoryJobQueue until it is empty.
+        Jobs are dicts with 'set', 'output' and optional 'options' keys """
+    queue = head_farm.DirectoryJobQueue(queue_dir)
+    queue.recover()
+    farm = make_farm(queue, output_dir, workers=workers, blender=blender,
+                     timeout=timeout, retries=retries)
+    return farm.run()
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='blender -b --python-expr "{}" --'.format(
+            _MAIN_EXPR.format(_addon_name())),
+        description='FaceBuilder batch processing of photo sets')
+    parser.add_argument('--input', help='directory with photo sets')
+    parser.add_argument('--set', help='process one photo set directory')
+    parser.add_argument('--queue', help='head farm job queue directory')
+    parser.add_argument('--output', required=True, help='output directory')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--timeout', type=float,
+                        default=Config.batch_job_timeout,
+                        help='seconds per head')
+    parser.add_argument('--retries', type=int,
+                        default=Config.batch_job_retries)
+    parser.add_argument('--blender', help='Blender executable for workers')
+    parser.add_argument('--no-bake-texture', dest='bake_texture',
+                        action='store_false')
+    parser.add_argument('--no-export-fbx', dest='export_fbx',
+                        action='store_false')
+    parser.add_argument('--no-save-blend', dest='save_blend',
+                        action='store_false')
+    args = parser.parse_args(argv)
+    if len([x for x in (args.input, args.set, args.queue)
+            if x is not None]) != 1:
+        parser.error('exactly one of --input, --set or --queue is required')
+    return args
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[sys.argv.index('--') + 1:] \
+            if '--' in sys.argv else []
+    args = _parse_args(argv)
+    options = {'bake_texture': args.bake_texture,
+               'export_fbx': args.export_fbx,
+               'save_blend': args.save_blend}
+    if args.set is not None:
+        manifest = process_image_set(args.set, args.output, **options)
+        sys.exit(0 if manifest['status'] == 'done' else 1)
+
+    if args.queue is not None:
+        stats = run_queue(args.queue, args.output, workers=args.workers,
+                          blender=args.blender, timeout=args.timeout,
+                          retries=args.retries)
+        print('Head farm: {}'.format(stats))
+        sys.exit(0 if stats['failed'] == 0 else 1)
+
+    manifests = run_batch(args.input, args.output, workers=args.workers,
+                          blender=args.blender, timeout=args.timeout,
+                          retries=args.retries, **options)
+    failed = [x['name'] for x in manifests if x['status'] != 'done']
+    print('Heads built: {} of {}'.format(len(manifests) - len(failed),
+                                         len(manifests)))
+    if len(failed) > 0:
+        print('Failed: {}'.format(', '.join(failed)))
+    sys.exit(0 if len(failed) == 0 else 1)
@@ -0,0 +1,178 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+""" Replay of recorded pin-mode sessions for drag responsiveness benchmarks.
+
+A session is recorded in Blender (Addon Preferences > Record pin session)
+and saved to a small JSON file. It keeps the head state before the first
+drag and every add_pin / mouse_move / mouse_release event in image space.
+
+Command line (the addon has to be installed, the .blend file has to
+contain the recorded head):
+
+    blender -b scene.blend --addons keentools_facebuilder --python-expr \\
+        "import keentools_facebuilder.benchmark as b; b.main()" -- \\
+        session.json --report report.json --repeat 5
+
+The report lists latency of every replayed event, percentiles per event
+type and per traced stage (solve, place_camera, batch creation, ...)
+and the total solve count.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+
+import bpy
+
+from .config import Config, get_main_settings, get_operator
+from .fbloader import FBLoader
+from .utils import coords
+from .utils.pin_session import load_session
+from .utils.tracing import FBTracer
+
+
+_MAIN_EXPR = 'import {}.benchmark as b; b.main()'
+_REPLAY_SPAN_PREFIX = 'replay.'
+
+
+def _addon_name():
+    return __name__.split('.')[0]
+
+
+def _find_headnum(headobj_name):
+    settings = get_main_settings()
+    for i, head in enumerate(settings.heads):
+        if head.headobj is not None and head.headobj.name == headobj_name:
+            return i
+    return -1
+
+
+def _restore_head(headnum, session):
+    FBLoader.flush_deferred_save()
+    head = get_main_settings().get_head(headnum)
+    head.set_serial_str(session['serial_str'])
+    FBLoader.load_model(headnum)
+
+
+def _select_camera(headnum, camnum):
+    op = get_operator(Config.fb_select_camera_idname)
+    op('EXEC_DEFAULT', headnum=headnum, camnum=camnum)
+
+
+def replay_session(session, repeat=1):
+    """ Replay in the current Blender session. Returns report dict """
+    logger = logging.getLogger(__name__)
+    headnum = _find_headnum(session['head'])
+    if headnum < 0:
+        raise ValueError('Head not found: {}'.format(session['head']))
+
+    movepin = get_operator(Config.fb_movepin_idname)
+    events = []
+    tracing_was_enabled = FBTracer.is_enabled()
+    FBTracer.clear()
+    FBTracer.enable(True)
+    coords.FBViewGeometry.reset_stats()
+    start = time.perf_counter()
+    try:
+        for _ in range(repeat):
+            _restore_head(headnum, session)
+            current_camnum = None
+            for _time, action, camnum, x, y in session['events']:
+                if camnum != current_camnum:
+                    _select_camera(headnum, camnum)
+                    current_camnum = camnum
+                px, py = coords.image_space_to_region(
+                    x, y, *coords.get_camera_border(bpy.context))
+                event_start = time.perf_counter()
+                with FBTracer.span(_REPLAY_SPAN_PREFIX + action):
+                    movepin('EXEC_DEFAULT', headnum=headnum, camnum=camnum,
+                            pinx=px, piny=py, test_action=action)
+                events.append((action, camnum,
+                               time.perf_counter() - event_start))
+        FBLoader.out_pinmode(headnum)
+    finally:
+        FBTracer.enable(tracing_was_enabled)
+    total_time = time.perf_counter() - start
+
+    stats = FBTracer.stats()
+    report = {
+        'head': session['head'],
+        'addon_version': Config.addon_version,
+        'recorded_with': session.get('addon_version'),
+        'repeat': repeat,
+        'total_time': total_time,
+        'solve_count': stats.get('solve', {}).get('count', 0),
+        'view_geometry': coords.FBViewGeometry.stats(),
+        'events': [{'action': action, 'camnum': camnum, 'latency': latency}
+                   for action, camnum, latency in events],
+        'actions': {name[len(_REPLAY_SPAN_PREFIX):]: item
+                    for name, item in stats.items()
+                    if name.startswith(_REPLAY_SPAN_PREFIX)},
+        'stages': {name: item for name, item in stats.items()
+                   if not name.startswith(_REPLAY_SPAN_PREFIX)}}
+    logger.info('PIN SESSION REPLAYED: {} events in {:.3f}s, '
+                '{} solves'.format(len(events), total_time,
+                                   report['solve_count']))
+    return report
+
+
+def replay_file(session_path, report_path=None, repeat=1):
+    report = replay_session(load_session(session_path), repeat=repeat)
+    report['session'] = session_path
+    if report_path is not None:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def _print_report(report):
+    print('Events: {}  total: {:.3f}s  solves: {}'.format(
+        len(report['events']), report['total_time'], report['solve_count']))
+    print('View geometry cache hit rate: {:.1%}'.format(
+        report['view_geometry']['hit_rate']))
+    for title, items in (('Event', report['actions']),
+                         ('Stage', report['stages'])):
+        print('{:<40} {:>7} {:>9} {:>9} {:>9}'.format(
+            title, 'count', 'p50 ms', 'p95 ms', 'max ms'))
+        for name in sorted(items.keys()):
+            item = items[name]
+            print('{:<40} {:>7} {:>9.2f} {:>9.2f} {:>9.2f}'.format(
+                name, item['count'], item['p50'] * 1000,
+                item['p95'] * 1000, item['max'] * 1000))
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='blender -b scene.blend --python-expr "{}" --'.format(
+            _MAIN_EXPR.format(_addon_name())),
+        description='FaceBuilder pin session replay benchmark')
+    parser.add_argument('session', help='recorded pin session file')
+    parser.add_argument('--report', help='write JSON report to this file')
+    parser.add_argument('--repeat', type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[sys.argv.index('--') + 1:] \
+            if '--' in sys.argv else []
+    args = _parse_args(argv)
+    report = replay_file(args.session, args.report, repeat=args.repeat)
+    _print_report(report)
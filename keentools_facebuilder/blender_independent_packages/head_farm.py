@@ -0,0 +1,421 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+"""
+Multi-process head farm.
+
+The scheduler (HeadFarm) takes jobs from a job source and spreads them
+across long-living worker processes: background Blender instances or plain
+Python interpreters. Workers get jobs as JSON lines on stdin and answer
+with prefixed JSON lines on stdout, so one worker imports pykeentools once
+and builds many heads. Every job event is appended to a journal file,
+so an interrupted farm can be restarted and will skip finished jobs.
+
+This module does not import bpy and can be started as a worker script:
+    python head_farm.py --function my_module:my_job
+    blender -b --addons my_addon --python head_farm.py -- --function ...
+"""
+
+import importlib
+import importlib.util
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+
+
+__all__ = ['FarmJournal', 'ListJobSource', 'DirectoryJobQueue', 'HeadFarm',
+           'python_worker_command', 'blender_worker_command', 'worker_main']
+
+
+_PROTOCOL_PREFIX = '@@head_farm@@ '
+
+
+class FarmJournal:
+    """ Append-only JSON lines journal of job events """
+    def __init__(self, path):
+        self.path = path
+        self._jobs = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    self._apply(json.loads(line))
+                except ValueError:  # Line broken by a crash
+                    continue
+
+    def _apply(self, record):
+        state = self._jobs.setdefault(record['job'],
+                                      {'event': None, 'attempts': 0,
+                                       'result': None})
+        state['event'] = record['event']
+        if record['event'] == 'start':
+            state['attempts'] += 1
+        if 'result' in record:
+            state['result'] = record['result']
+
+    def record(self, job_id, event, **fields):
+        record = dict(fields, job=job_id, event=event, time=time.time())
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._apply(record)
+
+    def last_event(self, job_id):
+        return self._jobs.get(job_id, {}).get('event')
+
+    def attempts(self, job_id):
+        return self._jobs.get(job_id, {}).get('attempts', 0)
+
+    def result(self, job_id):
+        return self._jobs.get(job_id, {}).get('result')
+
+    def is_done(self, job_id):
+        return self.last_event(job_id) == 'done'
+
+
+class ListJobSource:
+    """ In-memory job source """
+    def __init__(self, jobs):
+        self._jobs = deque(jobs)
+        self.finished = []
+        self.failed = []
+
+    def next_job(self):
+        return self._jobs.popleft() if len(self._jobs) > 0 else None
+
+    def job_finished(self, job, result):
+        self.finished.append((job, result))
+
+    def job_failed(self, job, error):
+        self.failed.append((job, error))
+
+
+class DirectoryJobQueue:
+    """ Local job source: jobs are JSON files in <root>/pending.
+        A job is claimed by an atomic rename into <root>/running,
+        so several farms can share one queue directory """
+    def __init__(self, root):
+        self.root = root
+        for name in ('pending', 'running', 'done', 'failed'):
+            os.makedirs(self._dir(name), exist_ok=True)
+
+    def _dir(self, name):
+        return os.path.join(self.root, name)
+
+    def _path(self, name, job_id):
+        return os.path.join(self._dir(name), '{}.json'.format(job_id))
+
+    def _write(self, path, job):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def submit(self, job):
+        job = dict(job)
+        job.setdefault('id', uuid.uuid4().hex)
+        self._write(self._path('pending', job['id']), job)
+        return job['id']
+
+    def jobs(self, state='pending'):
+        return sorted(os.path.splitext(name)[0]
+                      for name in os.listdir(self._dir(state))
+                      if name.endswith('.json'))
+
+    def next_job(self):
+        for job_id in self.jobs('pending'):
+            running_path = self._path('running', job_id)
+            try:
+                os.rename(self._path('pending', job_id), running_path)
+            except OSError:  # Claimed by somebody else
+                continue
+            with open(running_path, 'r') as f:
+                return json.load(f)
+        return None
+
+    def _move(self, job, state, **fields):
+        self._write(self._path(state, job['id']), dict(job, **fields))
+        try:
+            os.remove(self._path('running', job['id']))
+        except OSError:
+            pass
+
+    def job_finished(self, job, result):
+        self._move(job, 'done', result=result)
+
+    def job_failed(self, job, error):
+        self._move(job, 'failed', error=error)
+
+    def recover(self):
+        """ Return jobs of a crashed farm back to the pending state """
+        for job_id in self.jobs('running'):
+            os.replace(self._path('running', job_id),
+                       self._path('pending', job_id))
+
+
+def python_worker_command(function, python=None):
+    return [python or sys.executable, os.path.abspath(__file__),
+            '--function', function]
+
+
+def blender_worker_command(function, blender, addon):
+    return [blender, '-b', '--addons', addon,
+            '--python', os.path.abspath(__file__),
+            '--', '--function', function]
+
+
+class _Worker:
+    def __init__(self, command, env, log_path):
+        self.job = None
+        self.started = None
+        self._messages = queue.Queue()
+        self._log = open(log_path, 'a') if log_path else None
+        self._process = subprocess.Popen(
+            command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, universal_newlines=True, bufsize=1)
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        for line in self._process.stdout:
+            if line.startswith(_PROTOCOL_PREFIX):
+                try:
+                    self._messages.put(
+                        json.loads(line[len(_PROTOCOL_PREFIX):]))
+                    continue
+                except ValueError:
+                    pass
+            if self._log:
+                self._log.write(line)
+                self._log.flush()
+
+    def send(self, job):
+        self.job = job
+        self.started = time.time()
+        self._process.stdin.write(json.dumps(job) + '\n')
+        self._process.stdin.flush()
+
+    def message(self):
+        try:
+            return self._messages.get_nowait()
+        except queue.Empty:
+            return None
+
+    def is_alive(self):
+        return self._process.poll() is None
+
+    def elapsed(self):
+        return time.time() - self.started if self.started else 0.0
+
+    def release(self):
+        self.job = None
+        self.started = None
+
+    def stop(self, kill=False):
+        try:
+            if kill:
+                self._process.kill()
+            else:
+                self._process.stdin.close()
+            self._process.wait(timeout=None if kill else 30)
+        except (OSError, subprocess.TimeoutExpired):
+            self._process.kill()
+        self._reader.join(timeout=1.0)
+        if self._log:
+            self._log.close()
+            self._log = None
+
+
+class HeadFarm:
+    """ Runs jobs from a job source on worker processes.
+        A job is a JSON-serializable dict with a unique 'id' key.
+        timeout -- seconds per job attempt (None means no limit),
+        retries -- extra attempts after a failure or a timeout """
+    def __init__(self, source, journal_path, worker_command, workers=1,
+                 timeout=None, retries=0, env=None, log_dir=None,
+                 poll_interval=0.05):
+        self.source = source
+        self.journal = FarmJournal(journal_path)
+        self.worker_command = worker_command
+        self.workers_count = max(1, workers)
+        self.timeout = timeout
+        self.retries = retries
+        self.env = env
+        self.log_dir = log_dir
+        self.poll_interval = poll_interval
+        self._workers = []
+        self._retry_queue = deque()
+        self.stats = {'done': 0, 'failed': 0, 'skipped': 0, 'retried': 0}
+
+    def _log_path(self, index):
+        if self.log_dir is None:
+            return None
+        os.makedirs(self.log_dir, exist_ok=True)
+        return os.path.join(self.log_dir, 'worker{}.log'.format(index))
+
+    def _new_worker(self, index):
+        return _Worker(self.worker_command, self.env, self._log_path(index))
+
+    def _next_job(self):
+        while True:
+            if len(self._retry_queue) > 0:
+                return self._retry_queue.popleft()
+            job = self.source.next_job()
+            if job is None:
+                return None
+            job_id = job['id']
+            if self.journal.is_done(job_id):
+                self.stats['skipped'] += 1
+                self.source.job_finished(job, self.journal.result(job_id))
+                continue
+            if self.journal.last_event(job_id) == 'failed':
+                self.stats['skipped'] += 1
+                self.source.job_failed(job, 'Failed in previous run')
+                continue
+            return job
+
+    def _attempt_failed(self, job, event, error):
+        job_id = job['id']
+        self.journal.record(job_id, event, error=error)
+        if self.journal.attempts(job_id) <= self.retries:
+            self.stats['retried'] += 1
+            self._retry_queue.append(job)
+            return
+        self.journal.record(job_id, 'failed', error=error)
+        self.stats['failed'] += 1
+        self.source.job_failed(job, error)
+
+    def _restart_worker(self, index, kill):
+        self._workers[index].stop(kill=kill)
+        self._workers[index] = self._new_worker(index)
+
+    def _check_worker(self, index):
+        worker = self._workers[index]
+        job = worker.job
+        message = worker.message()
+        if message is not None and message.get('id') == job['id']:
+            worker.release()
+            if message['status'] == 'ok':
+                self.journal.record(job['id'], 'done',
+                                    result=message.get('result'))
+                self.stats['done'] += 1
+                self.source.job_finished(job, message.get('result'))
+            else:
+                self._attempt_failed(job, 'error', message.get('error'))
+        elif not worker.is_alive():
+            worker.release()
+            self._attempt_failed(job, 'error', 'Worker process exited')
+            self._restart_worker(index, kill=False)
+        elif self.timeout is not None and worker.elapsed() > self.timeout:
+            worker.release()
+            self._attempt_failed(job, 'timeout',
+                                 'Timeout {}s'.format(self.timeout))
+            self._restart_worker(index, kill=True)
+
+    def run(self):
+        try:
+            while True:
+                for index in range(self.workers_count):
+                    if index < len(self._workers) and \
+                            self._workers[index].job is not None:
+                        continue
+                    job = self._next_job()
+                    if job is None:
+                        break
+                    if index >= len(self._workers):
+                        self._workers.append(self._new_worker(index))
+                    self.journal.record(
+                        job['id'], 'start',
+                        attempt=self.journal.attempts(job['id']) + 1)
+                    self._workers[index].send(job)
+
+                busy = [i for i, worker in enumerate(self._workers)
+                        if worker.job is not None]
+                if len(busy) == 0:  # All workers are free but no jobs left
+                    break
+                for index in busy:
+                    self._check_worker(index)
+                time.sleep(self.poll_interval)
+        finally:
+            for worker in self._workers:
+                worker.stop(kill=worker.job is not None)
+            self._workers = []
+        return self.stats
+
+
+def _load_function(spec):
+    """ 'package.module:function' or '/path/to/file.py:function' """
+    module_name, function_name = spec.rsplit(':', 1)
+    if module_name.endswith('.py'):
+        name = os.path.splitext(os.path.basename(module_name))[0]
+        module_spec = importlib.util.spec_from_file_location(name,
+                                                             module_name)
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(module_name)
+    return getattr(module, function_name)
+
+
+def _reply(stdout, message):
+    stdout.write(_PROTOCOL_PREFIX + json.dumps(message) + '\n')
+    stdout.flush()
+
+
+def worker_loop(function, stdin=None, stdout=None):
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        try:
+            _reply(stdout, {'id': job['id'], 'status': 'ok',
+                            'result': function(job)})
+        except Exception as err:
+            traceback.print_exc(file=stdout)
+            _reply(stdout, {'id': job['id'], 'status': 'error',
+                            'error': '{}: {}'.format(type(err).__name__,
+                                                     str(err))})
+
+
+def worker_main(argv=None):
+    import argparse
+    if argv is None:
+        argv = sys.argv[sys.argv.index('--') + 1:] \
+            if '--' in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description='Head farm worker')
+    parser.add_argument('--function', required=True,
+                        help='module:function or file.py:function')
+    args = parser.parse_args(argv)
+    worker_loop(_load_function(args.function))
+
+
+if __name__ == '__main__':
+    worker_main()
@@ -23,7 +23,8 @@ import tempfile
 __all__ = ['SHADOW_COPIES_DIRECTORY', 'RELATIVE_LIB_DIRECTORY',
            'pkt_installation_dir', 'MINIMUM_VERSION_REQUIRED',
            'is_python_supported',
-           'os_name', 'download_path']
+           'os_name', 'download_path', 'SHARED_LIB_DIRECTORY_ENV',
+           'FORCE_SHADOW_COPY_ENV']
 
 
 SHADOW_COPIES_DIRECTORY = os.path.join(tempfile.gettempdir(),
@@ -33,6 +34,14 @@ SHADOW_COPIES_DIRECTORY = os.path.join(tempfile.gettempdir(),
 RELATIVE_LIB_DIRECTORY = os.path.join('pykeentools_installation', 'pykeentools')
 
 
+# Worker processes get a ready-to-import library directory from a parent
+# process in this variable and skip the shadow copy
+SHARED_LIB_DIRECTORY_ENV = 'PYKEENTOOLS_SHARED_LIB_DIRECTORY'
+
+# Non-empty value except '0' enables shadow copies on any OS
+FORCE_SHADOW_COPY_ENV = 'PYKEENTOOLS_FORCE_SHADOW_COPY'
+
+
 def pkt_installation_dir():
     module_path = inspect.getfile(inspect.currentframe())
     module_dir = os.path.dirname(module_path)
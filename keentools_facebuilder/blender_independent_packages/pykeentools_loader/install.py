@@ -19,6 +19,7 @@
 
 import os
 import sys
+from contextlib import contextmanager
 from threading import Thread, Lock
 
 from .config import *
@@ -26,7 +27,8 @@ from .config import *
 
 __all__ = ['is_installed', 'uninstall', 'installation_status',
            'install_from_download', 'install_from_download_async',
-           'install_from_file', 'loaded', 'module']
+           'install_from_file', 'loaded', 'module', 'lib_directory',
+           'DownloadProgress', 'ExtractionProgress']
 
 
 _unpack_mutex = Lock()
@@ -68,75 +70,455 @@ def uninstall():
         _unpack_mutex.release()
 
 
-def _install_from_stream(file_like_object):
-    _unpack_mutex.acquire()
+class ExtractionProgress(float):
+    """
+    Installation progress value in [0, 1] reported after every
+    extracted archive member, filename is the member name in the archive
+    """
+    def __new__(cls, value, filename='', extracted=0, total=0):
+        obj = super().__new__(cls, value)
+        obj.filename = filename
+        obj.extracted = extracted
+        obj.total = total
+        return obj
+
+
+_EXTRACTION_THREADS = 4
+_STAGING_PREFIX = '.pykeentools_staging_'
+_OLD_INSTALLATION_PREFIX = '.pykeentools_old_'
+_STALE_DIRECTORY_AGE = 24 * 3600
+
+
+def _remove_stale_installation_dirs():
+    """ Leftovers of crashed installations """
+    import shutil
+    import time
+    parent_dir = os.path.dirname(pkt_installation_dir())
+    for name in os.listdir(parent_dir):
+        if not name.startswith((_STAGING_PREFIX, _OLD_INSTALLATION_PREFIX)):
+            continue
+        path = os.path.join(parent_dir, name)
+        try:
+            if time.time() - os.path.getmtime(path) > _STALE_DIRECTORY_AGE:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+_MANIFEST_FILENAME = '.pkt_manifest.json'
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def _member_parts(member):
+    """ Path parts of archive member sanitized the same way as zipfile does """
+    arcname = os.path.splitdrive(member.filename.replace('/', os.path.sep))[1]
+    return [x for x in arcname.split(os.path.sep)
+            if x not in ('', os.path.curdir, os.path.pardir)]
+
+
+def _load_manifest(directory):
+    """
+    :return: {relative posix path: {'size', 'crc32', 'sha256'}} or None
+    for installations made without manifest
+    """
+    import json
     try:
-        _uninstall_not_locked()
+        with open(os.path.join(directory, _MANIFEST_FILENAME), 'r') as f:
+            return json.load(f)['files']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_manifest(directory, files):
+    import json
+    with open(os.path.join(directory, _MANIFEST_FILENAME), 'w') as f:
+        json.dump({'version': 1, 'files': files}, f, indent=1, sort_keys=True)
 
-        target_path = pkt_installation_dir()
-        os.makedirs(target_path, exist_ok=False)
 
-        import zipfile
+def _copy_stream(source, target_path):
+    """ Copy file-like object to a new file
+    :return: size and sha256 of the data
+    """
+    import hashlib
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(target_path, 'wb') as target:
+        for block in iter(lambda: source.read(_HASH_BLOCK_SIZE), b''):
+            sha256.update(block)
+            target.write(block)
+            size += len(block)
+    return size, sha256.hexdigest()
+
+
+def _stream_sha256(source):
+    import hashlib
+    sha256 = hashlib.sha256()
+    for block in iter(lambda: source.read(_HASH_BLOCK_SIZE), b''):
+        sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _link_or_copy(source_path, target_path):
+    """ Unchanged files are hard-linked, so no data is written """
+    import shutil
+    try:
+        os.link(source_path, target_path)
+    except (OSError, AttributeError, NotImplementedError):
+        shutil.copy2(source_path, target_path)
+
+
+def _extract_member(archive, member, relpath, target_path,
+                    previous_dir, previous_manifest):
+    """
+    :return: manifest entry and True if the file has been reused
+    from the previous installation
+    """
+    old = previous_manifest.get(relpath) if previous_manifest else None
+    old_path = os.path.join(previous_dir, *relpath.split('/')) \
+        if old else None
+    # CRC and size are known without decompression, sha256 confirms a match
+    if old is not None and old['size'] == member.file_size and \
+            old['crc32'] == member.CRC and os.path.isfile(old_path) and \
+            os.path.getsize(old_path) == member.file_size:
+        with archive.open(member) as source:
+            if _stream_sha256(source) == old['sha256']:
+                _link_or_copy(old_path, target_path)
+                return old, True
+
+    with archive.open(member) as source:
+        size, sha256 = _copy_stream(source, target_path)
+    return {'size': size, 'crc32': member.CRC, 'sha256': sha256}, False
+
+
+def _extract_to_staging(file_like_object, progress_callback=None):
+    """
+    Extract archive to a new directory next to the installation directory
+    using a thread pool, members are decompressed in parallel.
+    Files unchanged since the current installation (according to its
+    manifest) are hard-linked instead of being written again.
+    Files missing in the archive are not carried over.
+    :return: path to the staging directory and counts of
+    extracted and reused files
+    """
+    import shutil
+    import tempfile
+    import zipfile
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    previous_dir = pkt_installation_dir()
+    previous_manifest = _load_manifest(previous_dir)
+    staging_path = tempfile.mkdtemp(
+        prefix=_STAGING_PREFIX, dir=os.path.dirname(previous_dir))
+    manifest = {}
+    reused = 0
+    try:
         with zipfile.ZipFile(file_like_object) as archive:
-            archive.extractall(target_path)
+            files = []
+            # Directories are created in advance to avoid makedirs races
+            for member in archive.infolist():
+                parts = _member_parts(member)
+                if member.is_dir():
+                    os.makedirs(os.path.join(staging_path, *parts),
+                                exist_ok=True)
+                elif len(parts) > 0:
+                    os.makedirs(os.path.join(staging_path, *parts[:-1]),
+                                exist_ok=True)
+                    files.append((member, '/'.join(parts)))
+
+            with ThreadPoolExecutor(max_workers=_EXTRACTION_THREADS) as pool:
+                futures = {pool.submit(
+                    _extract_member, archive, member, relpath,
+                    os.path.join(staging_path, *relpath.split('/')),
+                    previous_dir, previous_manifest): (member, relpath)
+                    for member, relpath in files}
+                for i, future in enumerate(as_completed(futures)):
+                    member, relpath = futures[future]
+                    manifest[relpath], reused_flag = future.result()
+                    reused += int(reused_flag)
+                    if progress_callback is not None:
+                        progress_callback(ExtractionProgress(
+                            (i + 1) / len(files), member.filename, i + 1,
+                            len(files)))
+        _save_manifest(staging_path, manifest)
+    except Exception:
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise
+    return staging_path, len(manifest) - reused, reused
+
+
+def _swap_installation_not_locked(staging_path):
+    """
+    :return: path to the previous installation to be removed
+    """
+    import tempfile
+    target_path = pkt_installation_dir()
+    old_path = None
+    if _is_installed_not_locked():
+        old_path = tempfile.mkdtemp(prefix=_OLD_INSTALLATION_PREFIX,
+                                    dir=os.path.dirname(target_path))
+        old_path = os.path.join(old_path, 'pykeentools')
+        os.rename(target_path, old_path)
+    try:
+        os.rename(staging_path, target_path)
+    except OSError:
+        if old_path is not None:
+            os.rename(old_path, target_path)
+        raise
+    return old_path
+
+
+def _install_from_stream(file_like_object, progress_callback=None):
+    """
+    The previous installation is kept untouched until the new one is fully
+    extracted, the lock is held only to swap directories
+    """
+    import shutil
+    _remove_stale_installation_dirs()
+    staging_path, _, _ = _extract_to_staging(file_like_object,
+                                             progress_callback)
+
+    _unpack_mutex.acquire()
+    try:
+        old_path = _swap_installation_not_locked(staging_path)
         _reset_cached_installation_status()
     except Exception:
-        _uninstall_not_locked()
+        shutil.rmtree(staging_path, ignore_errors=True)
         raise
     finally:
         _unpack_mutex.release()
 
+    if old_path is not None:
+        shutil.rmtree(os.path.dirname(old_path), ignore_errors=True)
 
-def _download_with_progress_callback(url, progress_callback,
-                                     max_callback_updates_count):
-    import requests
-    import io
-    response = requests.get(url, stream=True)
-    if progress_callback is None:
-        return io.BytesIO(response.content)
-
-    length = response.headers.get('content-length')
-    if length:
-        length = int(length)
-        chunk_size = max(8 * 1024, length // max_callback_updates_count)
-    else:
-        chunk_size = 1024 * 1024
 
-    result = io.BytesIO()
-    downloaded = 0
-    it = 0
+class DownloadProgress(float):
+    """
+    Progress value in [0, 1] passed to progress_callback.
+    It is a float, so existing callbacks keep working,
+    with download details in extra attributes
+    """
+    def __new__(cls, value, downloaded=0, total=None, bytes_per_second=0.0):
+        obj = super().__new__(cls, value)
+        obj.downloaded = downloaded
+        obj.total = total
+        obj.bytes_per_second = bytes_per_second
+        return obj
 
-    for chunk in response.iter_content(chunk_size=chunk_size):
-        result.write(chunk)
-        downloaded += len(chunk)
-        if length:
-            progress_callback(downloaded / length)
-        else:
-            import math
-            # use exponential CDF as fallback
-            # will go from 0 to 1 as it goes from 0 to infinity
-            exp_lambda = 0.2
-            progress_callback(1.0 - math.exp(-exp_lambda * it))
-        it += 1
 
-    progress_callback(1.0)
+_DOWNLOAD_RETRIES = 5
+_DOWNLOAD_TIMEOUT = 30
+_DOWNLOAD_UNKNOWN_SIZE_CHUNK = 1024 * 1024
 
-    return result
+
+class _IncompleteDownload(Exception):
+    pass
+
+
+def _download_dir():
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), 'pykeentools_downloads')
+
+
+def _partial_download_paths(url):
+    import hashlib
+    name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return (os.path.join(_download_dir(), name + '.part'),
+            os.path.join(_download_dir(), name + '.json'))
+
+
+def _remove_partial_download(url):
+    for path in _partial_download_paths(url):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _load_partial_download(url):
+    """
+    :return: size and validator (ETag or Last-Modified) of a previous
+    interrupted download of the same url. Downloads without validator
+    are never resumed between calls
+    """
+    import json
+    part_path, meta_path = _partial_download_paths(url)
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta.get('url') == url and meta.get('validator'):
+            return os.path.getsize(part_path), meta['validator']
+    except (OSError, ValueError):
+        pass
+    _remove_partial_download(url)
+    return 0, None
+
+
+def _save_partial_download_meta(url, validator):
+    import json
+    _, meta_path = _partial_download_paths(url)
+    with open(meta_path, 'w') as f:
+        json.dump({'url': url, 'validator': validator}, f)
+
+
+def _response_total_size(response, offset):
+    content_range = response.headers.get('Content-Range', '')
+    total = content_range.rsplit('/', 1)[-1]  # bytes 100-199/200
+    if content_range and total.isdigit():
+        return int(total)
+    length = response.headers.get('Content-Length', '')
+    if length.isdigit():
+        return offset + int(length)
+    return None
+
+
+def _response_sha256(response):
+    """ Checksum from RFC 3230 header: Digest: SHA-256=<base64> """
+    import base64
+    import binascii
+    for item in response.headers.get('Digest', '').split(','):
+        name, _, value = item.strip().partition('=')
+        if name.lower() == 'sha-256' and value:
+            try:
+                return binascii.hexlify(base64.b64decode(value)).decode()
+            except (ValueError, binascii.Error):
+                return None
+    return None
+
+
+def _file_sha256(path):
+    import hashlib
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _download_to_file(url, progress_callback=None,
+                      max_callback_updates_count=481, sha256=None):
+    """
+    Download url to a temporary file in chunks. Dropped connections
+    are resumed with HTTP Range requests, interrupted downloads are
+    resumed on the next call when the server provides ETag or
+    Last-Modified. The result is checked against sha256 argument
+    or Digest header of the server when one of them is available.
+    :return: path to the downloaded file
+    """
+    import math
+    import time
+    import requests
+
+    os.makedirs(_download_dir(), exist_ok=True)
+    part_path, _ = _partial_download_paths(url)
+    offset, validator = _load_partial_download(url)
+    expected_sha256 = sha256
+    total = None
+    started = time.time()
+    session_bytes = 0
+    attempt = 0
+    it = 0
+
+    def _report(value):
+        if progress_callback is not None:
+            elapsed = max(time.time() - started, 1e-6)
+            progress_callback(DownloadProgress(
+                value, offset, total, session_bytes / elapsed))
+
+    while True:
+        headers = {}
+        if offset > 0:
+            headers['Range'] = 'bytes={}-'.format(offset)
+            if validator is not None:
+                headers['If-Range'] = validator
+        try:
+            with requests.get(url, stream=True, headers=headers,
+                              timeout=_DOWNLOAD_TIMEOUT) as response:
+                if response.status_code == 416:  # Range Not Satisfiable
+                    _remove_partial_download(url)
+                    offset, validator = 0, None
+                    raise _IncompleteDownload('Wrong partial download')
+                response.raise_for_status()
+                if response.status_code != 206:  # Range has been ignored
+                    offset = 0
+                    validator = None
+                total = _response_total_size(response, offset)
+                validator = validator or response.headers.get('ETag') or \
+                    response.headers.get('Last-Modified')
+                expected_sha256 = sha256 or _response_sha256(response)
+                if validator is not None:
+                    _save_partial_download_meta(url, validator)
+
+                if total:
+                    chunk_size = max(8 * 1024,
+                                     total // max_callback_updates_count)
+                else:
+                    chunk_size = _DOWNLOAD_UNKNOWN_SIZE_CHUNK
+
+                with open(part_path, 'ab' if offset > 0 else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        offset += len(chunk)
+                        session_bytes += len(chunk)
+                        if total:
+                            _report(min(offset / total, 1.0))
+                        else:
+                            # use exponential CDF as fallback
+                            # will go from 0 to 1 as it goes from 0 to infinity
+                            exp_lambda = 0.2
+                            _report(1.0 - math.exp(-exp_lambda * it))
+                        it += 1
+
+            if total is not None and offset < total:
+                raise _IncompleteDownload(
+                    'Downloaded {} of {} bytes'.format(offset, total))
+            break
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+                _IncompleteDownload):
+            attempt += 1
+            if attempt > _DOWNLOAD_RETRIES:
+                raise
+            time.sleep(min(0.5 * attempt, 5.0))
+
+    if expected_sha256 is not None and \
+            _file_sha256(part_path) != expected_sha256.lower():
+        _remove_partial_download(url)
+        raise ValueError('Checksum mismatch for {}'.format(url))
+
+    _report(1.0)
+    return part_path
+
+
+@contextmanager
+def _download_with_progress_callback(url, progress_callback,
+                                     max_callback_updates_count, sha256=None):
+    path = _download_to_file(url, progress_callback,
+                             max_callback_updates_count, sha256)
+    try:
+        with open(path, 'rb') as archive_data:
+            yield archive_data
+    finally:
+        _remove_partial_download(url)
 
 
 def install_from_download(version=None, nightly=False, progress_callback=None,
                           final_callback=None, error_callback=None,
-                          max_callback_updates_count=481):
+                          max_callback_updates_count=481,
+                          url=None, sha256=None):
     """
     :param max_callback_updates_count: max progress_callback calls count
-    :param progress_callback: callable getting progress in float [0, 1]
+    :param progress_callback: callable getting progress in float [0, 1]. The value is :class:`DownloadProgress` with downloaded bytes and throughput
     :param version: build to install. KeenTools version (1.5.4 for example) as string. None means latest version
     :param nightly: latest nightly build will be installed if True. version should be None in that case
+    :param url: archive location overriding version and nightly (a mirror for example)
+    :param sha256: expected archive checksum as hex string
     """
     try:
-        url = download_path(version, nightly)
-        with _download_with_progress_callback(url,
-                progress_callback, max_callback_updates_count) as archive_data:
+        if url is None:
+            url = download_path(version, nightly)
+        with _download_with_progress_callback(
+                url, progress_callback, max_callback_updates_count,
+                sha256) as archive_data:
             _install_from_stream(archive_data)
     except Exception as error:
         if error_callback is not None:
@@ -154,13 +536,14 @@ def install_from_download_async(**kwargs):
     t.start()
 
 
-def install_from_file(path):
+def install_from_file(path, progress_callback=None):
     """
     Install pykeentools from selected archive
     :param path: a path to a pykeentools bundle zip archive
+    :param progress_callback: callable getting :class:`ExtractionProgress` after every extracted file
     """
     with open(path, mode='rb') as file:
-        _install_from_stream(file)
+        _install_from_stream(file, progress_callback)
 
 
 def _import_pykeentools():
@@ -222,28 +605,202 @@ def is_installed(force_recheck=False):
     return installation_status(force_recheck)[0]
 
 
-def _do_pkt_shadow_copy():
-    import tempfile
+def _copy_tree_by_manifest(manifest, source_dir, target_dir,
+                           previous_dir=None, previous_manifest=None):
+    """
+    Copy files listed in manifest, files with the same sha256
+    in previous_manifest are hard-linked from previous_dir instead.
+    :return: counts of copied and linked files
+    """
     import shutil
+    copied = 0
+    for relpath, entry in manifest.items():
+        parts = relpath.split('/')
+        target_path = os.path.join(target_dir, *parts)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        old = previous_manifest.get(relpath) if previous_manifest else None
+        previous_path = os.path.join(previous_dir, *parts) \
+            if old is not None else None
+        if old is not None and old['sha256'] == entry['sha256'] and \
+                os.path.isfile(previous_path):
+            _link_or_copy(previous_path, target_path)
+        else:
+            shutil.copy2(os.path.join(source_dir, *parts), target_path)
+            copied += 1
+    _save_manifest(target_dir, manifest)
+    return copied, len(manifest) - copied
+
+
+_SHADOW_COPY_MAX_AGE = 14 * 24 * 3600
+_SHADOW_COPY_LAST_USED = 'last_used'
+_SHADOW_COPY_TMP_PREFIX = '.tmp_'
+
+
+def _shadow_copy_required():
+    return os_name() == 'windows' or \
+        os.environ.get(FORCE_SHADOW_COPY_ENV, '') not in ('', '0')
+
+
+def _build_manifest(directory):
+    """ Manifest for installations made before manifests were introduced """
+    import zlib
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            relpath = os.path.relpath(path, directory).replace(os.path.sep, '/')
+            if relpath == _MANIFEST_FILENAME:
+                continue
+            crc32 = 0
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+                    crc32 = zlib.crc32(block, crc32)
+            with open(path, 'rb') as f:
+                sha256 = _stream_sha256(f)
+            files[relpath] = {'size': os.path.getsize(path),
+                              'crc32': crc32, 'sha256': sha256}
+    return files
+
+
+def _installation_manifest():
+    manifest = _load_manifest(pkt_installation_dir())
+    if manifest is None:
+        manifest = _build_manifest(pkt_installation_dir())
+        try:
+            _save_manifest(pkt_installation_dir(), manifest)
+        except OSError:
+            pass
+    return manifest
+
+
+def _manifest_key(manifest):
+    import hashlib
+    import json
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode(
+        'utf-8')).hexdigest()[:32]
+
+
+def _shadow_copies():
+    """ Complete shadow copies: {key: last used time} """
+    result = {}
+    try:
+        names = os.listdir(SHADOW_COPIES_DIRECTORY)
+    except OSError:
+        return result
+    for name in names:
+        marker = os.path.join(SHADOW_COPIES_DIRECTORY, name,
+                              _SHADOW_COPY_LAST_USED)
+        if not name.startswith(_SHADOW_COPY_TMP_PREFIX) and \
+                os.path.exists(marker):
+            result[name] = os.path.getmtime(marker)
+    return result
+
+
+def _touch_shadow_copy(key):
+    marker = os.path.join(SHADOW_COPIES_DIRECTORY, key,
+                          _SHADOW_COPY_LAST_USED)
+    with open(marker, 'a'):
+        pass
+    os.utime(marker, None)
 
-    shutil.rmtree(SHADOW_COPIES_DIRECTORY, ignore_errors=True)
-    os.makedirs(SHADOW_COPIES_DIRECTORY, exist_ok=True)
 
-    shadow_copy_base_dir = tempfile.mkdtemp(dir=SHADOW_COPIES_DIRECTORY)
-    shadow_copy_dir = os.path.join(shadow_copy_base_dir, 'pykeentools')
+def _collect_shadow_copies_garbage(keep_key, max_age=None):
+    """
+    Remove shadow copies not used for max_age seconds
+    and leftovers of other layouts. Copies used by running
+    Blender sessions cannot be removed on Windows and stay
+    """
+    import shutil
+    import time
+    max_age = _SHADOW_COPY_MAX_AGE if max_age is None else max_age
+    copies = _shadow_copies()
+    now = time.time()
+    for name in os.listdir(SHADOW_COPIES_DIRECTORY):
+        if name == keep_key:
+            continue
+        path = os.path.join(SHADOW_COPIES_DIRECTORY, name)
+        last_used = copies.get(name)
+        if last_used is None:
+            try:
+                last_used = os.path.getmtime(path)
+            except OSError:
+                continue
+        if now - last_used > max_age:
+            shutil.rmtree(path, ignore_errors=True)
 
-    shutil.copytree(pkt_installation_dir(), shadow_copy_dir)
 
-    return shadow_copy_dir
+def _do_pkt_shadow_copy():
+    """
+    Shadow copies are content-addressed by installation manifest,
+    so a copy is made once per installed version and reused
+    by all following Blender sessions
+    :return: directory to import pykeentools from
+    """
+    import shutil
+    import tempfile
+
+    os.makedirs(SHADOW_COPIES_DIRECTORY, exist_ok=True)
+    manifest = _installation_manifest()
+    key = _manifest_key(manifest)
+    copy_dir = os.path.join(SHADOW_COPIES_DIRECTORY, key)
+    copies = _shadow_copies()
+
+    if key not in copies:
+        tmp_dir = tempfile.mkdtemp(prefix=_SHADOW_COPY_TMP_PREFIX,
+                                   dir=SHADOW_COPIES_DIRECTORY)
+        try:
+            # Files unchanged since the last used copy are linked
+            previous_dir = None
+            previous_manifest = None
+            if len(copies) > 0:
+                previous_key = max(copies, key=copies.get)
+                previous_dir = os.path.join(SHADOW_COPIES_DIRECTORY,
+                                            previous_key, 'pykeentools')
+                previous_manifest = _load_manifest(previous_dir)
+            _copy_tree_by_manifest(
+                manifest, pkt_installation_dir(),
+                os.path.join(tmp_dir, 'pykeentools'),
+                previous_dir, previous_manifest)
+            with open(os.path.join(tmp_dir, _SHADOW_COPY_LAST_USED), 'w'):
+                pass
+            os.rename(tmp_dir, copy_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.exists(os.path.join(copy_dir,
+                                               _SHADOW_COPY_LAST_USED)):
+                raise
+            # Another process has made the same copy at the same time
+
+    _touch_shadow_copy(key)
+    _collect_shadow_copies_garbage(key)
+    return os.path.join(copy_dir, 'pykeentools')
+
+
+_LIB_DIRECTORY = None
+
+
+def lib_directory():
+    """
+    :return: directory pykeentools has been imported from
+    or None if it is not loaded by this module
+    """
+    return _LIB_DIRECTORY
 
 
 def _add_pykeentools_to_sys_path():
-    if os_name() == 'windows':
-        pkt_directory = _do_pkt_shadow_copy()
+    global _LIB_DIRECTORY
+    shared_lib_directory = os.environ.get(SHARED_LIB_DIRECTORY_ENV)
+    if shared_lib_directory and os.path.isdir(shared_lib_directory):
+        pkt_lib_directory = shared_lib_directory
     else:
-        pkt_directory = pkt_installation_dir()
+        if _shadow_copy_required():
+            pkt_directory = _do_pkt_shadow_copy()
+        else:
+            pkt_directory = pkt_installation_dir()
+        pkt_lib_directory = os.path.join(pkt_directory,
+                                         RELATIVE_LIB_DIRECTORY)
 
-    pkt_lib_directory = os.path.join(pkt_directory, RELATIVE_LIB_DIRECTORY)
+    _LIB_DIRECTORY = pkt_lib_directory
     if pkt_lib_directory not in sys.path:
         sys.path.append(pkt_lib_directory)
     else:
@@ -0,0 +1,145 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+import json
+import os
+import textwrap
+
+import keentools_facebuilder.blender_independent_packages.head_farm as farm
+
+
+_JOBS_MODULE = '''
+import os
+import time
+
+
+def double(job):
+    with open(job['calls'], 'a') as f:
+        f.write('{}\\n'.format(job['id']))
+    return {'value': job['value'] * 2, 'pid': os.getpid()}
+
+
+def sleep(job):
+    time.sleep(job['seconds'])
+    return 'awake'
+
+
+def fail_once(job):
+    if not os.path.exists(job['marker']):
+        open(job['marker'], 'w').close()
+        raise RuntimeError('first attempt')
+    return 'ok'
+'''
+
+
+def _worker_command(tmp_path, function):
+    module_path = tmp_path / 'farm_jobs.py'
+    if not module_path.exists():
+        module_path.write_text(textwrap.dedent(_JOBS_MODULE))
+    return farm.python_worker_command('{}:{}'.format(module_path, function))
+
+
+def _double_jobs(tmp_path, count):
+    return [{'id': 'job{}'.format(i), 'value': i,
+             'calls': str(tmp_path / 'calls.txt')} for i in range(count)]
+
+
+def _calls(tmp_path):
+    path = tmp_path / 'calls.txt'
+    return path.read_text().split() if path.exists() else []
+
+
+def test_jobs_run_on_long_living_workers(tmp_path):
+    source = farm.ListJobSource(_double_jobs(tmp_path, 6))
+    head_farm = farm.HeadFarm(source, str(tmp_path / 'journal.jsonl'),
+                              _worker_command(tmp_path, 'double'), workers=2)
+    stats = head_farm.run()
+    assert stats['done'] == 6 and stats['failed'] == 0
+    results = {job['id']: result for job, result in source.finished}
+    assert all(results['job{}'.format(i)]['value'] == 2 * i
+               for i in range(6))
+    assert len({x['pid'] for x in results.values()}) <= 2
+
+
+def test_resume_skips_finished_jobs(tmp_path):
+    journal = str(tmp_path / 'journal.jsonl')
+    command = _worker_command(tmp_path, 'double')
+    farm.HeadFarm(farm.ListJobSource(_double_jobs(tmp_path, 3)),
+                  journal, command).run()
+    assert len(_calls(tmp_path)) == 3
+
+    source = farm.ListJobSource(_double_jobs(tmp_path, 5))
+    stats = farm.HeadFarm(source, journal, command).run()
+    assert stats['skipped'] == 3 and stats['done'] == 2
+    assert len(_calls(tmp_path)) == 5
+    assert len(source.finished) == 5
+
+
+def test_broken_journal_line_is_ignored(tmp_path):
+    journal_path = tmp_path / 'journal.jsonl'
+    journal = farm.FarmJournal(str(journal_path))
+    journal.record('a', 'start')
+    journal.record('a', 'done', result=1)
+    with open(str(journal_path), 'a') as f:
+        f.write('{"job": "b", "eve')  # Crash in the middle of a write
+    journal = farm.FarmJournal(str(journal_path))
+    assert journal.is_done('a') and journal.result('a') == 1
+    assert journal.last_event('b') is None
+
+
+def test_timeout_and_retries(tmp_path):
+    source = farm.ListJobSource([{'id': 'slow', 'seconds': 30}])
+    head_farm = farm.HeadFarm(source, str(tmp_path / 'journal.jsonl'),
+                              _worker_command(tmp_path, 'sleep'),
+                              timeout=0.5, retries=1)
+    stats = head_farm.run()
+    assert stats['failed'] == 1 and stats['retried'] == 1
+    assert head_farm.journal.attempts('slow') == 2
+    assert len(source.failed) == 1
+
+
+def test_error_is_retried(tmp_path):
+    source = farm.ListJobSource([{'id': 'flaky',
+                                  'marker': str(tmp_path / 'marker')}])
+    stats = farm.HeadFarm(source, str(tmp_path / 'journal.jsonl'),
+                          _worker_command(tmp_path, 'fail_once'),
+                          retries=1).run()
+    assert stats['done'] == 1 and stats['retried'] == 1
+    assert source.finished[0][1] == 'ok'
+
+
+def test_directory_queue(tmp_path):
+    queue = farm.DirectoryJobQueue(str(tmp_path / 'queue'))
+    for job in _double_jobs(tmp_path, 3):
+        queue.submit(job)
+    assert len(queue.jobs('pending')) == 3
+
+    job = queue.next_job()
+    assert queue.jobs('running') == [job['id']]
+    queue.recover()  # as if the farm has crashed
+    assert len(queue.jobs('pending')) == 3
+
+    stats = farm.HeadFarm(queue, str(tmp_path / 'journal.jsonl'),
+                          _worker_command(tmp_path, 'double'),
+                          workers=2).run()
+    assert stats['done'] == 3
+    assert queue.jobs('pending') == [] and queue.jobs('running') == []
+    for job_id in queue.jobs('done'):
+        with open(os.path.join(queue.root, 'done',
+                               '{}.json'.format(job_id))) as f:
+            job = json.load(f)
+        assert job['result']['value'] == 2 * job['value']
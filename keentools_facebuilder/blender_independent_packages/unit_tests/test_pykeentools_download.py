@@ -0,0 +1,181 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+import base64
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+import keentools_facebuilder.blender_independent_packages.pykeentools_loader.install as pkt_install
+
+
+class _ArchiveServer:
+    """ Local stand-in for the download server with Range support """
+    def __init__(self, data, etag='"v1"', digest=None, drop_after=None):
+        self.data = data
+        self.etag = etag
+        self.digest = digest
+        self.drop_after = drop_after  # bytes sent before the first drop
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append(dict(self.headers))
+                start = 0
+                range_header = self.headers.get('Range')
+                if_range = self.headers.get('If-Range')
+                if range_header and (if_range is None or
+                                     if_range == server.etag):
+                    start = int(range_header.split('=')[1].split('-')[0])
+                if start >= len(server.data):
+                    self.send_response(416)
+                    self.end_headers()
+                    return
+                self.send_response(206 if start > 0 else 200)
+                if start > 0:
+                    self.send_header('Content-Range', 'bytes {}-{}/{}'.format(
+                        start, len(server.data) - 1, len(server.data)))
+                self.send_header('Content-Length',
+                                 str(len(server.data) - start))
+                if server.etag:
+                    self.send_header('ETag', server.etag)
+                if server.digest:
+                    self.send_header('Digest', server.digest)
+                self.end_headers()
+                body = server.data[start:]
+                if server.drop_after is not None:
+                    body = body[:server.drop_after]
+                    server.drop_after = None
+                self.wfile.write(body)
+
+        self._httpd = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/core.zip'.format(
+            self._httpd.server_address[1])
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def _digest_header(data):
+    return 'SHA-256={}'.format(
+        base64.b64encode(hashlib.sha256(data).digest()).decode())
+
+
+@pytest.fixture
+def download_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(pkt_install, '_download_dir', lambda: str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def archive_data():
+    return os.urandom(3 * 1024 * 1024 + 123)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_download_reports_throughput(download_dir, archive_data):
+    server = _ArchiveServer(archive_data, digest=_digest_header(archive_data))
+    progress = []
+    try:
+        path = pkt_install._download_to_file(server.url, progress.append,
+                                             max_callback_updates_count=10)
+    finally:
+        server.close()
+    assert _read(path) == archive_data
+    assert all(a <= b for a, b in zip(progress, progress[1:]))
+    assert progress[-1] == 1.0
+    assert progress[-1].downloaded == len(archive_data)
+    assert progress[-1].total == len(archive_data)
+    assert progress[-1].bytes_per_second > 0
+
+
+def test_dropped_connection_is_resumed(download_dir, archive_data):
+    server = _ArchiveServer(archive_data, drop_after=1024 * 1024)
+    try:
+        path = pkt_install._download_to_file(
+            server.url, sha256=hashlib.sha256(archive_data).hexdigest())
+    finally:
+        server.close()
+    assert _read(path) == archive_data
+    assert len(server.requests) == 2
+    assert server.requests[1]['Range'] == 'bytes={}-'.format(1024 * 1024)
+    assert server.requests[1]['If-Range'] == '"v1"'
+
+
+def test_interrupted_download_is_resumed_next_time(download_dir,
+                                                   archive_data, monkeypatch):
+    monkeypatch.setattr(pkt_install, '_DOWNLOAD_RETRIES', 0)
+    server = _ArchiveServer(archive_data, drop_after=1024 * 1024)
+    try:
+        with pytest.raises(Exception):
+            pkt_install._download_to_file(server.url)
+        path = pkt_install._download_to_file(server.url)
+    finally:
+        server.close()
+    assert _read(path) == archive_data
+    assert 'Range' in server.requests[1]
+
+
+def test_changed_file_is_downloaded_from_start(download_dir, archive_data,
+                                               monkeypatch):
+    monkeypatch.setattr(pkt_install, '_DOWNLOAD_RETRIES', 0)
+    server = _ArchiveServer(archive_data, drop_after=1024 * 1024)
+    try:
+        with pytest.raises(Exception):
+            pkt_install._download_to_file(server.url)
+        server.data = archive_data[::-1]
+        server.etag = '"v2"'
+        path = pkt_install._download_to_file(server.url)
+    finally:
+        server.close()
+    assert _read(path) == archive_data[::-1]
+
+
+def test_checksum_mismatch(download_dir, archive_data):
+    server = _ArchiveServer(archive_data,
+                            digest=_digest_header(b'another data'))
+    try:
+        with pytest.raises(ValueError):
+            pkt_install._download_to_file(server.url)
+    finally:
+        server.close()
+    assert os.listdir(str(download_dir)) == []
+
+
+def test_downloaded_file_is_removed(download_dir, archive_data):
+    server = _ArchiveServer(archive_data)
+    try:
+        with pkt_install._download_with_progress_callback(
+                server.url, None, 10) as archive:
+            assert archive.read() == archive_data
+    finally:
+        server.close()
+    assert os.listdir(str(download_dir)) == []
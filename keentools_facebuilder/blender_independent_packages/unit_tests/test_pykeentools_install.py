@@ -0,0 +1,216 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+import io
+import os
+import zipfile
+
+import pytest
+import keentools_facebuilder.blender_independent_packages.pykeentools_loader.install as pkt_install
+
+
+_FILES_COUNT = 40
+
+
+def _archive(version):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('pykeentools_installation/pykeentools/version.txt',
+                         version)
+        for i in range(_FILES_COUNT - 1):
+            archive.writestr(
+                'pykeentools_installation/pykeentools/lib/{}.bin'.format(i),
+                os.urandom(64 * 1024))
+    data.seek(0)
+    return data
+
+
+def _version(installation_dir):
+    path = os.path.join(installation_dir, 'pykeentools_installation',
+                        'pykeentools', 'version.txt')
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.fixture
+def installation_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / 'pykeentools')
+    monkeypatch.setattr(pkt_install, 'pkt_installation_dir', lambda: path)
+    return path
+
+
+def test_install_and_upgrade(installation_dir):
+    pkt_install._install_from_stream(_archive('1'))
+    assert _version(installation_dir) == '1'
+
+    progress = []
+
+    def _callback(value):
+        # Previous installation is usable until the swap
+        assert _version(installation_dir) == '1'
+        progress.append(value)
+
+    pkt_install._install_from_stream(_archive('2'), _callback)
+    assert _version(installation_dir) == '2'
+    assert len(progress) == _FILES_COUNT
+    assert progress[-1] == 1.0 and progress[-1].extracted == _FILES_COUNT
+    assert all(os.path.isfile(os.path.join(installation_dir, x.filename))
+               for x in progress)
+    # No staging or old installation directories left
+    assert os.listdir(os.path.dirname(installation_dir)) == ['pykeentools']
+
+
+def test_broken_archive_keeps_installation(installation_dir):
+    pkt_install._install_from_stream(_archive('1'))
+    broken = io.BytesIO(_archive('2').getvalue()[:-100])
+    with pytest.raises(Exception):
+        pkt_install._install_from_stream(broken)
+    assert _version(installation_dir) == '1'
+    assert os.listdir(os.path.dirname(installation_dir)) == ['pykeentools']
+
+
+def test_unsafe_member_paths(installation_dir):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        archive.writestr('../outside.txt', 'x')
+        archive.writestr('/absolute/inside.txt', 'y')
+    data.seek(0)
+    pkt_install._install_from_stream(data)
+    parent_dir = os.path.dirname(installation_dir)
+    assert not os.path.exists(os.path.join(parent_dir, 'outside.txt'))
+    assert os.path.isfile(os.path.join(installation_dir, 'outside.txt'))
+    assert os.path.isfile(os.path.join(installation_dir,
+                                       'absolute', 'inside.txt'))
+
+
+def _archive_from_files(files):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    data.seek(0)
+    return data
+
+
+_LIB = 'pykeentools_installation/pykeentools/'
+
+
+def _files_v1():
+    return {_LIB + 'same.bin': b'same' * 10000,
+            _LIB + 'changed.bin': b'old' * 10000,
+            _LIB + 'removed.bin': b'removed'}
+
+
+def _files_v2():
+    return {_LIB + 'same.bin': b'same' * 10000,
+            _LIB + 'changed.bin': b'new' * 10000,
+            _LIB + 'added.bin': b'added'}
+
+
+def _path(directory, name):
+    return os.path.join(directory, *name.split('/'))
+
+
+def test_incremental_update(installation_dir):
+    pkt_install._install_from_stream(_archive_from_files(_files_v1()))
+    same_inode = os.stat(_path(installation_dir, _LIB + 'same.bin')).st_ino
+    staging_path, extracted, reused = pkt_install._extract_to_staging(
+        _archive_from_files(_files_v2()))
+    assert (extracted, reused) == (2, 1)
+    assert os.stat(_path(staging_path, _LIB + 'same.bin')).st_ino == \
+        same_inode
+
+    pkt_install._install_from_stream(_archive_from_files(_files_v2()))
+    for name, content in _files_v2().items():
+        with open(_path(installation_dir, name), 'rb') as f:
+            assert f.read() == content
+    assert not os.path.exists(_path(installation_dir, _LIB + 'removed.bin'))
+    manifest = pkt_install._load_manifest(installation_dir)
+    assert sorted(manifest.keys()) == sorted(_files_v2().keys())
+
+
+def test_incremental_shadow_copy(installation_dir, tmp_path, monkeypatch):
+    shadow_dir = str(tmp_path / 'shadow_copies')
+    monkeypatch.setattr(pkt_install, 'SHADOW_COPIES_DIRECTORY', shadow_dir)
+    pkt_install._install_from_stream(_archive_from_files(_files_v1()))
+    shadow1 = pkt_install._do_pkt_shadow_copy()
+    same_inode = os.stat(_path(shadow1, _LIB + 'same.bin')).st_ino
+
+    pkt_install._install_from_stream(_archive_from_files(_files_v2()))
+    shadow2 = pkt_install._do_pkt_shadow_copy()
+    assert shadow1 != shadow2
+    assert os.stat(_path(shadow2, _LIB + 'same.bin')).st_ino == same_inode
+    for name, content in _files_v2().items():
+        with open(_path(shadow2, name), 'rb') as f:
+            assert f.read() == content
+    assert not os.path.exists(_path(shadow2, _LIB + 'removed.bin'))
+
+
+@pytest.fixture
+def shadow_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / 'shadow_copies')
+    monkeypatch.setattr(pkt_install, 'SHADOW_COPIES_DIRECTORY', path)
+    monkeypatch.setenv(pkt_install.FORCE_SHADOW_COPY_ENV, '1')
+    return path
+
+
+def test_shadow_copy_is_forced_by_env(shadow_dir, monkeypatch):
+    assert pkt_install._shadow_copy_required()
+    monkeypatch.setenv(pkt_install.FORCE_SHADOW_COPY_ENV, '0')
+    assert pkt_install._shadow_copy_required() == (
+        pkt_install.os_name() == 'windows')
+
+
+def test_shadow_copy_is_reused(installation_dir, shadow_dir, monkeypatch):
+    pkt_install._install_from_stream(_archive_from_files(_files_v1()))
+    shadow1 = pkt_install._do_pkt_shadow_copy()
+
+    def _no_copy(*args):
+        raise AssertionError('Shadow copy has to be reused')
+
+    monkeypatch.setattr(pkt_install, '_copy_tree_by_manifest', _no_copy)
+    assert pkt_install._do_pkt_shadow_copy() == shadow1  # Next session
+
+
+def test_shadow_copy_garbage_collection(installation_dir, shadow_dir):
+    pkt_install._install_from_stream(_archive_from_files(_files_v1()))
+    shadow1 = pkt_install._do_pkt_shadow_copy()
+    pkt_install._install_from_stream(_archive_from_files(_files_v2()))
+    shadow2 = pkt_install._do_pkt_shadow_copy()
+    assert os.path.isdir(shadow1)  # Is not old enough
+
+    key1 = os.path.basename(os.path.dirname(shadow1))
+    marker = os.path.join(shadow_dir, key1, 'last_used')
+    os.utime(marker, (0, 0))
+    os.makedirs(os.path.join(shadow_dir, 'tmpold_layout', 'pykeentools'))
+    os.utime(os.path.join(shadow_dir, 'tmpold_layout'), (0, 0))
+
+    assert pkt_install._do_pkt_shadow_copy() == shadow2
+    assert os.listdir(shadow_dir) == [os.path.basename(
+        os.path.dirname(shadow2))]
+
+
+def test_shadow_copy_of_installation_without_manifest(installation_dir,
+                                                      shadow_dir):
+    pkt_install._install_from_stream(_archive_from_files(_files_v1()))
+    os.remove(os.path.join(installation_dir, pkt_install._MANIFEST_FILENAME))
+    shadow = pkt_install._do_pkt_shadow_copy()
+    for name, content in _files_v1().items():
+        with open(_path(shadow, name), 'rb') as f:
+            assert f.read() == content
+    assert pkt_install._load_manifest(installation_dir) == \
+        pkt_install._load_manifest(shadow)
@@ -16,6 +16,7 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 # ##### END GPL LICENSE BLOCK #####
 import logging
+from functools import partial
 import numpy as np
 import bpy
 
@@ -23,6 +24,7 @@ from .config import get_main_settings, get_operator, Config, ErrorType
 from .fbloader import FBLoader
 from .utils import coords
 from .utils.manipulate import get_current_headnum
+from .utils.update_transaction import FBUpdateTransaction
 from .utils.blendshapes import (restore_facs_blendshapes,
                                 disconnect_blendshapes_action)
 from .blender_independent_packages.pykeentools_loader import module as pkt_module
@@ -96,12 +98,19 @@ def update_mesh_with_dialog(self, context):
         warn('INVOKE_DEFAULT', headnum=headnum)
 
 
-def update_mesh_simple(self, context):
-    headnum = self.get_headnum()
+def _reload_mesh(headnum):
     FBLoader.load_model(headnum)
     _update_mesh_now(headnum)
 
 
+def update_mesh_simple(self, context):
+    headnum = self.get_headnum()
+    with FBUpdateTransaction.begin():
+        FBUpdateTransaction.defer(FBUpdateTransaction.STAGE_MESH,
+                                  ('mesh', headnum),
+                                  partial(_reload_mesh, headnum))
+
+
 def _update_mesh_now(headnum):
     logger = logging.getLogger(__name__)
     logger.debug('callbacks.update_mesh')
@@ -227,8 +236,25 @@ def update_pin_size(self, context):
     FBLoader.viewport().update_pin_size()
 
 
+def _save_head(headnum):
+    """ Single serialization per transaction """
+    if not FBUpdateTransaction.is_active():
+        FBLoader.save_only(headnum)
+        return
+    FBUpdateTransaction.defer(FBUpdateTransaction.STAGE_SAVE,
+                              ('save', headnum),
+                              partial(FBLoader.save_only, headnum))
+
+
 def update_model_scale(self, context):
     headnum = self.get_headnum()
+    with FBUpdateTransaction.begin():
+        FBUpdateTransaction.defer(FBUpdateTransaction.STAGE_SCALE,
+                                  ('model_scale', headnum),
+                                  partial(_apply_model_scale, headnum))
+
+
+def _apply_model_scale(headnum):
     FBLoader.load_model(headnum)
 
     settings = get_main_settings()
@@ -241,7 +267,7 @@ def update_model_scale(self, context):
     coords.update_head_mesh(settings, fb, head)
     FBLoader.update_all_camera_positions(headnum)
     FBLoader.update_all_camera_focals(headnum)
-    FBLoader.save_only(headnum)
+    _save_head(headnum)
 
     if settings.pinmode and FBLoader.viewport().wireframer().is_working():
         FBLoader.fb_redraw(settings.current_headnum, settings.current_camnum)
@@ -255,16 +281,32 @@ def update_head_focal(self, context):
     logger = logging.getLogger(__name__)
     logger.debug('UPDATE_HEAD_FOCAL: {}'.format(self.focal))
 
-    for c in self.cameras:
-        c.focal = self.focal
+    with FBUpdateTransaction.begin():
+        for c in self.cameras:
+            c.focal = self.focal
 
 
-def update_camera_focal(self, context):
-    def _check_current_selection_is_not_actual(headnum, camnum):
-        settings = get_main_settings()
-        return headnum < 0 or headnum != settings.current_headnum \
-                or camnum != settings.current_camnum
+def _push_camera_focal(camera):
+    """ Only the current camera focal goes to the builder """
+    settings = get_main_settings()
+    headnum = settings.current_headnum
+    camnum = settings.current_camnum
+    if headnum < 0 or camnum < 0:
+        return
+    current = settings.get_camera(headnum, camnum)
+    if current is None or current.as_pointer() != camera.as_pointer():
+        return
+
+    fb = FBLoader.get_builder()
+    kid = camera.get_keyframe()
+    if fb.is_key_at(kid):
+        fb.set_varying_focal_length_estimation()
+        fb.set_focal_length_at(
+            kid, camera.get_focal_length_in_pixels_coef() * camera.focal)
+        _save_head(headnum)
+
 
+def update_camera_focal(self, context):
     logger = logging.getLogger(__name__)
     kid = self.get_keyframe()
     self.camobj.data.lens = self.focal
@@ -273,16 +315,12 @@ def update_camera_focal(self, context):
     if FBLoader.in_pin_drag():
         return
 
-    headnum, camnum = self.get_headnum_camnum()
-    if _check_current_selection_is_not_actual(headnum, camnum):
+    if not FBUpdateTransaction.is_active():
+        _push_camera_focal(self)
         return
-
-    fb = FBLoader.get_builder()
-    if fb.is_key_at(kid):
-        fb.set_varying_focal_length_estimation()
-        fb.set_focal_length_at(
-            kid, self.get_focal_length_in_pixels_coef() * self.focal)
-        FBLoader.save_only(headnum)
+    FBUpdateTransaction.defer(FBUpdateTransaction.STAGE_FOCAL,
+                              ('camera_focal', self.as_pointer()),
+                              partial(_push_camera_focal, self))
 
 
 def update_blue_camera_button(self, context):
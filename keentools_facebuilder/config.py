@@ -95,6 +95,7 @@ class Config:
     fb_movepin_idname = operators + '.movepin'
     fb_pickmode_idname = operators + '.pickmode'
     fb_pickmode_starter_idname = operators + '.pickmode_starter'
+    fb_auto_pin_all_idname = operators + '.auto_pin_all'
     fb_history_actor_idname = operators + '.history_actor'
     fb_camera_actor_idname = operators + '.camera_actor'
 
@@ -180,6 +181,42 @@ class Config:
     text_scale_y = 0.75
 
     viewport_redraw_interval = 0.1
+    deferred_save_interval = 1.0
+    preferences_save_delay = 1.0
+    # Pin drag solves not more often than once per frame and leaves
+    # the rest of the measured solve time to viewport redraw
+    drag_frame_interval = 1.0 / 60
+    drag_run_time_factor = 1.5
+    drag_run_time_smoothing = 0.3
+    # Wireframe keeps index and UV buffers on GPU between solves
+    wireframe_persistent_buffers = True
+    # Edges with texture color this far from the main one are kept in LOD
+    wireframe_lod_color_tolerance = 0.1
+    # Solves faster than this are not worth a worker thread
+    async_solve_min_time = 0.005
+    # Main thread wakeup interval while the first async solve is measured
+    async_solve_probe_interval = 0.001
+    # Face detection works on images downscaled to this size (0 - no limit)
+    face_detection_max_image_size = 1280
+    face_detection_threads = 4
+
+    batch_image_extensions = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp')
+    batch_manifest_filename = 'manifest.json'
+    batch_journal_filename = 'farm_journal.jsonl'
+    batch_job_timeout = 1800.0
+    batch_job_retries = 1
+
+    # Tracing ring buffer size and samples kept per span for percentiles
+    tracing_max_events = 100000
+    tracing_max_samples = 10000
+
+    pin_session_format = 'facebuilder_pin_session'
+    pin_session_version = 1
+
+    # Serial strings are stored zlib-compressed when True.
+    # Uncompressed legacy strings are always readable
+    compress_serial_str = True
+    serial_str_compression_level = 6
     unknown_mod_ver = -1
 
     default_focal_length = 50.0
@@ -227,6 +264,8 @@ class Config:
         'pin_size': {'value': 7.0, 'type': 'float'},
         'pin_sensitivity': {'value': 16.0, 'type': 'float'},
         'prevent_view_rotation': {'value': True, 'type': 'bool'},
+        'async_solve': {'value': True, 'type': 'bool'},
+        'wireframe_lod_ratio': {'value': 0.3, 'type': 'float'},
         'wireframe_color': {'value': color_schemes['default'][0], 'type': 'color'},
         'wireframe_special_color': {'value': color_schemes['default'][1], 'type': 'color'},
         'wireframe_midline_color': {'value': midline_color, 'type': 'color'},
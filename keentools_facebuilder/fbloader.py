@@ -19,6 +19,7 @@
 import logging
 
 import bpy
+from bpy.app.handlers import persistent
 import numpy as np
 
 from .config import Config, get_main_settings
@@ -26,16 +27,43 @@ from .utils.coords import xy_to_xz_rotation_matrix_3x3
 from .utils.focal_length import (configure_focal_mode_and_fixes,
                                  update_camera_focal)
 from .utils import attrs, coords, cameras
-from .utils.exif_reader import reload_all_camera_exif
-from .utils.other import FBStopShaderTimer, restore_ui_elements
+from .utils.exif_reader import (reload_all_camera_exif, read_exif_to_camera,
+                                auto_setup_camera_from_exif)
+from .utils.other import (FBStopShaderTimer, FBDeferredSaveTimer,
+                          restore_ui_elements)
 from .viewport import FBViewport
+from .utils.tracing import FBTracer, traced
+from .utils.update_transaction import FBUpdateTransaction
 from .blender_independent_packages.pykeentools_loader import module as pkt_module
 
 
+@persistent
+def deferred_save_pre_handler(*args):
+    # Save As may change bpy.data.filepath before the handler is called
+    FBLoader.flush_deferred_save(check_filepath=False)
+
+
+@persistent
+def deferred_save_load_pre_handler(*args):
+    """ Pending save belongs to the file being closed """
+    FBLoader.flush_deferred_save()
+    FBLoader.clear_deferred_save()
+
+
+def _deferred_save_timer_callback():
+    FBLoader.flush_deferred_save()
+    return None  # One-shot timer
+
+
 class FBLoader:
     _camera_input = None
     _builder_instance = None
     _viewport = FBViewport()
+    # (head object pointer, blend filepath) of the head which
+    # serial string is behind the builder state
+    _deferred_save_key = None
+    # Solver setup last pushed to the builder, see configure_solver
+    _solver_config = None
 
     @classmethod
     def viewport(cls):
@@ -43,9 +71,11 @@ class FBLoader:
 
     @classmethod
     def new_builder(cls):
+        cls.flush_deferred_save()
         from .camera_input import FaceBuilderCameraInput
         cls._camera_input = FaceBuilderCameraInput()
         cls._builder_instance = pkt_module().FaceBuilder(cls._camera_input)
+        cls.invalidate_solver_config()
         return cls._builder_instance
 
     @classmethod
@@ -136,7 +166,68 @@ class FBLoader:
         settings = get_main_settings()
         head = settings.get_head(headnum)
         # Save block
-        head.set_serial_str(fb.serialize())
+        with FBTracer.span('serialize'):
+            head.set_serial_str(fb.serialize())
+        cls._reset_deferred_save(head)
+
+    @classmethod
+    def save_deferred(cls, headnum):
+        """ Write-behind analog of save_only. Head is marked as dirty and
+            serialization is performed once by flush_deferred_save """
+        settings = get_main_settings()
+        head = settings.get_head(headnum)
+        if head is None or head.headobj is None:
+            return
+        key = cls._deferred_save_key_of(head)
+        if cls._deferred_save_key not in {None, key}:
+            cls.flush_deferred_save()
+        cls._deferred_save_key = key
+        FBDeferredSaveTimer.start(_deferred_save_timer_callback,
+                                  Config.deferred_save_interval)
+
+    @classmethod
+    def has_deferred_save(cls):
+        return cls._deferred_save_key is not None
+
+    @staticmethod
+    def _deferred_save_key_of(head):
+        return head.headobj.as_pointer(), bpy.data.filepath
+
+    @classmethod
+    def clear_deferred_save(cls):
+        cls._deferred_save_key = None
+        FBDeferredSaveTimer.stop()
+
+    @classmethod
+    def _reset_deferred_save(cls, head):
+        if head is not None and head.headobj is not None and \
+                cls._deferred_save_key_of(head) == cls._deferred_save_key:
+            cls.clear_deferred_save()
+
+    @classmethod
+    def flush_deferred_save(cls, check_filepath=True):
+        """ Should be called before anything that reads serial string:
+            model loading, undo push, file save """
+        key = cls._deferred_save_key
+        if key is None:
+            return False
+        cls.clear_deferred_save()
+
+        pointer, filepath = key
+        if cls._builder_instance is None or \
+                (check_filepath and filepath != bpy.data.filepath):
+            return False
+        settings = get_main_settings()
+        for head in settings.heads:
+            if head.headobj is not None and \
+                    head.headobj.as_pointer() == pointer:
+                with FBTracer.span('serialize'):
+                    head.set_serial_str(cls._builder_instance.serialize())
+                logger = logging.getLogger(__name__)
+                logger.debug('DEFERRED SAVE FLUSHED: {}'.format(
+                    head.headobj.name))
+                return True
+        return False
 
     @classmethod
     def save_fb_on_headobj(cls, headnum):
@@ -144,7 +235,9 @@ class FBLoader:
         settings = get_main_settings()
         head = settings.get_head(headnum)
         if head:
-            head.set_serial_str(fb.serialize())
+            with FBTracer.span('serialize'):
+                head.set_serial_str(fb.serialize())
+            cls._reset_deferred_save(head)
             head.save_images_src()
             if head.headobj:
                 cls.set_keentools_attributes(head.headobj)
@@ -200,6 +293,29 @@ class FBLoader:
         fb.set_shape_rigidity(settings.shape_rigidity)
         fb.set_expressions_rigidity(settings.expression_rigidity)
 
+    @classmethod
+    def invalidate_solver_config(cls):
+        cls._solver_config = None
+
+    @classmethod
+    def configure_solver(cls, head):
+        """ Rigidity, emotions and focal fixes are pushed to the builder
+            only if they differ from the last applied ones.
+            Returns True if the builder has been reconfigured """
+        fb = cls.get_builder()
+        settings = get_main_settings()
+        config = (settings.shape_rigidity, settings.expression_rigidity,
+                  head.should_use_emotions(),
+                  tuple((cam.get_keyframe(), cam.auto_focal_estimation)
+                        for cam in head.cameras))
+        if config == cls._solver_config:
+            return False
+        cls.rigidity_setup()
+        fb.set_use_emotions(head.should_use_emotions())
+        configure_focal_mode_and_fixes(fb, head)
+        cls._solver_config = config
+        return True
+
     @classmethod
     def update_one_camera_position(cls, headnum, camnum):
         fb = cls.get_builder()
@@ -212,15 +328,30 @@ class FBLoader:
 
     @classmethod
     def update_all_camera_positions(cls, headnum):
+        """ Poses of all cameras with pins in one batch.
+            Only changed matrices are written back to scene """
         fb = cls.get_builder()
         settings = get_main_settings()
         head = settings.get_head(headnum)
 
-        for camnum, camera in enumerate(head.cameras):
-            if camera.has_pins():
-                cls.place_camera(headnum, camnum)
-                keyframe = camera.get_keyframe()
-                camera.set_model_mat(fb.model_mat(keyframe))
+        cameras = [camera for camera in head.cameras if camera.has_pins()]
+        if len(cameras) == 0:
+            return
+        with FBTracer.span('update_all_camera_positions',
+                           cameras=len(cameras)):
+            model_mats = np.array([fb.model_mat(camera.get_keyframe())
+                                   for camera in cameras])
+            poses = coords.calc_model_mats(model_mats,
+                                           head.headobj.matrix_world)
+            for camera, model_mat, pose in zip(cameras, model_mats, poses):
+                camobj = camera.camobj
+                if pose is not None and camobj is not None and \
+                        not np.allclose(np.array(camobj.matrix_world), pose,
+                                        rtol=0.0, atol=1e-6):
+                    camobj.matrix_world = pose
+                model_mat = model_mat.astype(np.float32)
+                if not np.array_equal(camera.get_model_mat(), model_mat):
+                    camera.set_model_mat(model_mat)
 
     @classmethod
     def update_one_camera_focal(cls, camera):
@@ -241,9 +372,10 @@ class FBLoader:
         if not head:
             return
 
-        for i, cam in enumerate(head.cameras):
-            cls.update_one_camera_focal(cam)
-            logger.debug('cam.focal: {} {}'.format(i, cam.focal))
+        with FBUpdateTransaction.begin():
+            for i, cam in enumerate(head.cameras):
+                cls.update_one_camera_focal(cam)
+                logger.debug('cam.focal: {} {}'.format(i, cam.focal))
 
     @classmethod
     def center_geo_camera_projection(cls, headnum, camnum):
@@ -255,6 +387,7 @@ class FBLoader:
         keyframe = camera.get_keyframe()
         if not fb.is_key_at(keyframe):
             fb.set_centered_geo_keyframe(keyframe)
+            cls.invalidate_solver_config()
         else:
             fb.center_geo(keyframe)
 
@@ -378,8 +511,12 @@ class FBLoader:
 
     @classmethod
     def load_model_from_head(cls, head):
+        cls.flush_deferred_save()
         fb = cls.get_builder()
-        if not fb.deserialize(head.get_serial_str()):
+        with FBTracer.span('deserialize'):
+            loaded = fb.deserialize(head.get_serial_str())
+        cls.invalidate_solver_config()
+        if not loaded:
             logger = logging.getLogger(__name__)
             logger.warning('DESERIALIZE ERROR: {}'.format(
                 head.get_serial_str()))
@@ -413,6 +550,7 @@ class FBLoader:
         logger.debug("LOAD MODEL END")
 
     @classmethod
+    @traced('place_camera')
     def place_camera(cls, headnum, camnum):
         settings = get_main_settings()
         head = settings.get_head(headnum)
@@ -440,43 +578,46 @@ class FBLoader:
         vp.pins().reset_current_pin()
 
     @classmethod
-    def solve(cls, headnum, camnum):
-        def _exception_handling(headnum, msg, license_err=True):
-            logger = logging.getLogger(__name__)
-            logger.error(msg)
-            if settings.pinmode:
-                settings.force_out_pinmode = True
-                settings.license_error = license_err
-                cls.out_pinmode(headnum)
-
-        logger = logging.getLogger(__name__)
-        logger.debug('FBloader.solve called')
+    def prepare_solve(cls, headnum, camnum):
+        """ Builder setup before solve_for_current_pins.
+            Returns (camera, keyframe) """
         settings = get_main_settings()
         head = settings.get_head(headnum)
         camera = head.get_camera(camnum)
-        kid = camera.get_keyframe()
-        fb = cls.get_builder()
+        cls.configure_solver(head)
+        return camera, camera.get_keyframe()
 
-        cls.rigidity_setup()
-        fb.set_use_emotions(head.should_use_emotions())
+    @classmethod
+    def solve_error(cls, headnum, err):
+        """ Reports solve exception and leaves pinmode if needed """
+        if isinstance(err, pkt_module().UnlicensedException):
+            msg, license_err = 'SOLVE LICENSE EXCEPTION', True
+        elif isinstance(err, pkt_module().InvalidArgumentException):
+            msg, license_err = 'SOLVE NO KEYFRAME EXCEPTION', False
+        else:
+            msg, license_err = \
+                'SOLVE UNKNOWN EXCEPTION: {}'.format(str(err)), False
 
-        configure_focal_mode_and_fixes(fb, head)
+        logger = logging.getLogger(__name__)
+        logger.error(msg)
+        settings = get_main_settings()
+        if settings.pinmode:
+            settings.force_out_pinmode = True
+            settings.license_error = license_err
+            cls.out_pinmode(headnum)
+
+    @classmethod
+    @traced('solve')
+    def solve(cls, headnum, camnum):
+        logger = logging.getLogger(__name__)
+        logger.debug('FBloader.solve called')
+        camera, kid = cls.prepare_solve(headnum, camnum)
+        fb = cls.get_builder()
         try:
             fb.solve_for_current_pins(kid)
             update_camera_focal(camera, fb)
-        except pkt_module().UnlicensedException:
-            _exception_handling(headnum, 'SOLVE LICENSE EXCEPTION')
-            return False
-        except pkt_module().InvalidArgumentException:
-            _exception_handling(headnum, 'SOLVE NO KEYFRAME EXCEPTION',
-                                license_err=False)
-            return False
         except Exception as err:
-            _exception_handling(
-                headnum,
-                'SOLVE UNKNOWN EXCEPTION: {}'.format(str(err)),
-                license_err=False
-            )
+            cls.solve_error(headnum, err)
             return False
         return True
 
@@ -519,10 +660,11 @@ class FBLoader:
 
         focal = head.focal * Config.default_sensor_width / sensor_width
         head.reset_sensor_size()
-        for cam in head.cameras:
-            cam.focal = focal
-            cam.auto_focal_estimation = head.auto_focal_estimation
-            cam.reset_camera_sensor()
+        with FBUpdateTransaction.begin():
+            for cam in head.cameras:
+                cam.focal = focal
+                cam.auto_focal_estimation = head.auto_focal_estimation
+                cam.reset_camera_sensor()
 
         reload_all_camera_exif(headnum)
 
@@ -604,6 +746,7 @@ class FBLoader:
         camera.set_keyframe(kid)
 
         fb.set_centered_geo_keyframe(kid)
+        cls.invalidate_solver_config()
 
         logger.debug("KEYFRAMES {}".format(str(fb.keyframes())))
 
@@ -614,3 +757,26 @@ class FBLoader:
     def add_new_camera_with_image(cls, headnum, img_path):
         img = bpy.data.images.load(img_path)
         return cls.add_new_camera(headnum, img)
+
+    @classmethod
+    def load_images_as_cameras(cls, headnum, filepaths):
+        """ Create new cameras with EXIF setup, returns their numbers """
+        logger = logging.getLogger(__name__)
+        settings = get_main_settings()
+        head = settings.get_head(headnum)
+        last_camnum = head.get_last_camnum()
+
+        for filepath in filepaths:
+            try:
+                logger.debug("IMAGE FILE: {}".format(filepath))
+                camera = cls.add_new_camera_with_image(headnum, filepath)
+                read_exif_to_camera(headnum, head.get_last_camnum(), filepath)
+                camera.orientation = camera.exif.orientation
+            except RuntimeError:
+                logger.error("FILE READ ERROR: {}".format(filepath))
+
+        camnums = list(range(last_camnum + 1, len(head.cameras)))
+        for camnum in camnums:
+            auto_setup_camera_from_exif(head.get_camera(camnum))
+            cls.center_geo_camera_projection(headnum, camnum)
+        return camnums
@@ -246,27 +246,9 @@ class FB_OT_MultipleFilebrowser(Operator, ImportHelper):
 
         FBLoader.load_model(self.headnum)
 
-        head = settings.get_head(self.headnum)
-        last_camnum = head.get_last_camnum()
-
-        for f in self.files:
-            try:
-                filepath = os.path.join(self.directory, f.name)
-                logger.debug("IMAGE FILE: {}".format(filepath))
-
-                camera = FBLoader.add_new_camera_with_image(self.headnum,
-                                                            filepath)
-                read_exif_to_camera(
-                    self.headnum, head.get_last_camnum(), filepath)
-                camera.orientation = camera.exif.orientation
-
-            except RuntimeError as ex:
-                logger.error("FILE READ ERROR: {}".format(f.name))
-
-        for i, camera in enumerate(head.cameras):
-            if i > last_camnum:
-                auto_setup_camera_from_exif(camera)
-                FBLoader.center_geo_camera_projection(self.headnum, i)
+        FBLoader.load_images_as_cameras(
+            self.headnum,
+            [os.path.join(self.directory, f.name) for f in self.files])
 
         FBLoader.save_only(self.headnum)
         return {'FINISHED'}
@@ -335,6 +335,11 @@ class FB_PT_ViewsPanel(AllVisible, Panel):
             op.headnum = settings.current_headnum
             op.camnum = settings.current_camnum
 
+        if len(head.cameras) > 1:
+            op = box.operator(Config.fb_auto_pin_all_idname,
+                              text='Align all views', icon='USER')
+            op.headnum = headnum
+
         box = layout.box()
         for i, camera in enumerate(head.cameras):
             row = box.row()
@@ -28,11 +28,13 @@ from bpy.types import Operator
 
 from .config import get_main_settings, get_operator, Config
 from .fbloader import FBLoader
+from .settings import FBObjectIndex
 from .utils import cameras, manipulate, materials, coords, images
 from .utils.attrs import get_obj_collection, safe_delete_collection
 from .utils.exif_reader import (update_exif_sizes_message,
                                 copy_exif_parameters_from_camera_to_head)
 from .utils.manipulate import check_settings
+from .utils.enum_items import FBEnumItemsCache
 from .utils.operator_action import (create_blendshapes,
                                     delete_blendshapes,
                                     load_animation_from_csv,
@@ -111,6 +113,7 @@ class FB_OT_DeleteHead(Operator):
         except Exception:
             pass
         settings.heads.remove(self.headnum)
+        FBObjectIndex.invalidate()
         return {'FINISHED'}
 
 
@@ -358,11 +361,13 @@ class FB_OT_DeleteCamera(Operator):
         kid = camera.get_keyframe()
         fb = FBLoader.get_builder()
         fb.remove_keyframe(kid)
+        FBLoader.invalidate_solver_config()
 
         head = settings.get_head(headnum)
         camera.delete_cam_image()
         camera.delete_camobj()
         head.cameras.remove(camnum)
+        FBObjectIndex.invalidate()
 
         if settings.current_camnum > camnum:
             settings.current_camnum -= 1
@@ -657,6 +662,7 @@ class FB_OT_UninstallCore(bpy.types.Operator):
         from .blender_independent_packages.pykeentools_loader import uninstall as pkt_uninstall
         logger.debug("START CORE UNINSTALL")
         pkt_uninstall()
+        FBEnumItemsCache.invalidate()
         logger.debug("FINISH CORE UNINSTALL")
         return {'FINISHED'}
 
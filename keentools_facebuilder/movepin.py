@@ -23,24 +23,10 @@ import bpy
 from .utils import manipulate, coords
 from .fbloader import FBLoader
 from .config import Config, get_main_settings
-
-from functools import wraps
-
-
-# Decorator for profiling
-def profile_this(fn):
-    @wraps(fn)
-    def wrapped(arg1, arg2, arg3):
-        if FBLoader.viewport().profiling:
-            pr = FBLoader.viewport().pr
-            pr.enable()
-            ret = fn(arg1, arg2, arg3)
-            pr.disable()
-            return ret
-        else:
-            ret = fn(arg1, arg2, arg3)
-            return ret
-    return wrapped
+from .utils.tracing import traced_operator_method
+from .utils.pin_session import FBPinSessionRecorder
+from .utils.drag_scheduler import FBDragScheduler
+from .async_solver import FBAsyncSolver
 
 
 class FB_OT_MovePin(bpy.types.Operator):
@@ -115,6 +101,8 @@ class FB_OT_MovePin(bpy.types.Operator):
         vp.create_batch_2d(context)
         vp.register_handlers(args, context)
 
+        FBPinSessionRecorder.record(FBPinSessionRecorder.ADD_PIN, head,
+                                    camnum, mouse_x, mouse_y, context)
         x, y = coords.get_image_space_coord(mouse_x, mouse_y, context)
         vp.pins().set_current_pin((x, y))
 
@@ -132,6 +120,8 @@ class FB_OT_MovePin(bpy.types.Operator):
         head = settings.get_head(headnum)
         kid = settings.get_keyframe(headnum, camnum)
 
+        FBPinSessionRecorder.record(FBPinSessionRecorder.MOUSE_RELEASE, head,
+                                    camnum, mouse_x, mouse_y, context)
         x, y = coords.get_image_space_coord(mouse_x, mouse_y, context)
         vp = FBLoader.viewport()
         pins = vp.pins()
@@ -145,12 +135,12 @@ class FB_OT_MovePin(bpy.types.Operator):
 
         if head.should_reduce_pins():
             fb.reduce_pins()
-            FBLoader.save_only(headnum)
             pins.set_pins(vp.img_points(fb, kid))
 
         FBLoader.update_all_camera_positions(headnum)
         FBLoader.update_all_camera_focals(headnum)
-        FBLoader.fb_save(headnum, camnum)
+        # Serialization is performed once for the whole burst of pin moves
+        FBLoader.save_deferred(headnum)
         # ---------
         # PUSH Last
         manipulate.push_neutral_head_in_undo_history(head, kid, 'Pin Move')
@@ -162,6 +152,7 @@ class FB_OT_MovePin(bpy.types.Operator):
         head.mark_model_changed_by_pinmode()
 
         pins.reset_current_pin()
+        vp.update_wireframe_lod()
         return {'FINISHED'}
 
     @staticmethod
@@ -174,6 +165,21 @@ class FB_OT_MovePin(bpy.types.Operator):
         pins.arr()[pin_idx] = (x, y)
         fb.move_pin(kid, pin_idx, coords.image_space_to_frame(x, y))
 
+    @staticmethod
+    def _pin_drag_async(kid, context, mouse_x, mouse_y):
+        """ Only 2D pins are updated here, the builder belongs
+            to the solver thread until the drag is finished """
+        x, y = coords.get_image_space_coord(mouse_x, mouse_y, context)
+        vp = FBLoader.viewport()
+        pins = vp.pins()
+        pins.set_current_pin((x, y))
+        pin_idx = pins.current_pin_num()
+        pins.arr()[pin_idx] = (x, y)
+        FBAsyncSolver.submit(kid, pin_idx, coords.image_space_to_frame(x, y))
+        vp.create_batch_2d(context)
+        if not bpy.app.background:
+            context.area.tag_redraw()
+
     def on_mouse_move(self, context, mouse_x, mouse_y):
         settings = get_main_settings()
         headnum = self.get_headnum()
@@ -182,6 +188,12 @@ class FB_OT_MovePin(bpy.types.Operator):
         headobj = head.headobj
         kid = head.get_keyframe(camnum)
 
+        FBPinSessionRecorder.record(FBPinSessionRecorder.MOUSE_MOVE, head,
+                                    camnum, mouse_x, mouse_y, context)
+        if FBAsyncSolver.is_running():
+            self._pin_drag_async(kid, context, mouse_x, mouse_y)
+            return self.on_default_modal()
+
         self._pin_drag(kid, context, mouse_x, mouse_y)
 
         if not FBLoader.solve(headnum, camnum):
@@ -194,6 +206,7 @@ class FB_OT_MovePin(bpy.types.Operator):
         FBLoader.place_camera(headnum, camnum)
 
         vp = FBLoader.viewport()
+        vp.update_wireframe_lod()
         vp.wireframer().init_geom_data_from_fb(headobj, fb, kid)
         vp.wireframer().update_edges_vertices()
         vp.wireframer().create_batches()
@@ -216,6 +229,7 @@ class FB_OT_MovePin(bpy.types.Operator):
             return {'FINISHED'}
 
     # Integration testing purpose only
+    @traced_operator_method(Config.fb_movepin_idname + '.execute')
     def execute(self, context):
         logger = logging.getLogger(__name__)
 
@@ -230,7 +244,26 @@ class FB_OT_MovePin(bpy.types.Operator):
             self.on_left_mouse_release(context, self.pinx, self.piny)
         return {"FINISHED"}
 
-    @profile_this
+    def _start_drag_timer(self, context):
+        # Wakes modal up when the mouse stops with a coalesced move pending
+        self._drag_timer = context.window_manager.event_timer_add(
+            time_step=Config.drag_frame_interval, window=context.window)
+
+    def _stop_drag_timer(self, context):
+        timer = getattr(self, '_drag_timer', None)
+        if timer is not None:
+            context.window_manager.event_timer_remove(timer)
+        self._drag_timer = None
+
+    def _run_mouse_move(self, context):
+        mouse_x, mouse_y = FBDragScheduler.pop()
+        FBDragScheduler.run_started()
+        try:
+            return self.on_mouse_move(context, mouse_x, mouse_y)
+        finally:
+            FBDragScheduler.run_finished()
+
+    @traced_operator_method(Config.fb_movepin_idname + '.invoke')
     def invoke(self, context, event):
         logger = logging.getLogger(__name__)
         ret = self.init_action(
@@ -238,23 +271,45 @@ class FB_OT_MovePin(bpy.types.Operator):
         if ret in {'CANCELLED', 'FINISHED'}:
             return ret
         FBLoader.viewport().create_batch_2d(context)
+        FBDragScheduler.reset()
+        FBAsyncSolver.start(self.get_headnum(), self.get_camnum())
+        self._start_drag_timer(context)
         context.window_manager.modal_handler_add(self)
         logger.debug("START PIN MOVING")
         return {"RUNNING_MODAL"}
 
-    @profile_this
-    def modal(self, context, event):
+    def _modal(self, context, event):
         logger = logging.getLogger(__name__)
         mouse_x = event.mouse_region_x
         mouse_y = event.mouse_region_y
 
         if event.value == "RELEASE" and event.type == "LEFTMOUSE":
             logger.debug("LEFT MOUSE RELEASE")
+            # The final position is always solved synchronously
+            FBAsyncSolver.finish()
+            FBDragScheduler.push(mouse_x, mouse_y)
+            if FBDragScheduler.has_pending():
+                ret = self._run_mouse_move(context)
+                if ret != {"RUNNING_MODAL"}:
+                    return ret
+            logger.debug("DRAG: {}".format(FBDragScheduler.stats()))
             return self.on_left_mouse_release(context, mouse_x, mouse_y)
 
         if event.type == "MOUSEMOVE" \
                 and FBLoader.viewport().pins().current_pin() is not None:
             logger.debug("MOUSEMOVE {} {}".format(mouse_x, mouse_y))
-            return self.on_mouse_move(context, mouse_x, mouse_y)
+            FBDragScheduler.push(mouse_x, mouse_y)
+
+        if FBDragScheduler.is_due():
+            return self._run_mouse_move(context)
 
         return self.on_default_modal()
+
+    @traced_operator_method(Config.fb_movepin_idname + '.modal')
+    def modal(self, context, event):
+        ret = self._modal(context, event)
+        if ret != {"RUNNING_MODAL"}:
+            FBAsyncSolver.finish()
+            self._stop_drag_timer(context)
+            FBLoader.viewport().update_wireframe_lod(False)
+        return ret
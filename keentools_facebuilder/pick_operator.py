@@ -22,8 +22,9 @@ import bpy
 from .config import Config, ErrorType, get_main_settings, get_operator
 from .fbloader import FBLoader
 from .utils import coords
-from .utils.focal_length import configure_focal_mode_and_fixes
+from .utils.face_detection import detect_faces, prepare_working_images
 from .utils.manipulate import push_neutral_head_in_undo_history
+from .utils.tracing import traced_operator_method
 from .blender_independent_packages.pykeentools_loader import module as pkt_module
 
 
@@ -71,14 +72,15 @@ def init_detected_faces(fb, headnum, camnum):
     camera = head.get_camera(camnum)
     if camera is None:
         return None
-    img = camera.np_image()
-    if img is None:
-        return None
 
-    fb.set_use_emotions(head.should_use_emotions())
-    _set_detected_faces(fb.detect_faces(img))
+    FBLoader.configure_solver(head)
+    faces = detect_faces(fb, camera)
+    if faces is None:
+        return None
+    _set_detected_faces(faces)
 
-    return img
+    camera.update_image_size()
+    return camera.get_oriented_image_size()
 
 
 def sort_detected_faces():
@@ -102,8 +104,7 @@ def _add_pins_to_face(headnum, camnum, rectangle_index):
     camera = head.get_camera(camnum)
     kid = camera.get_keyframe()
 
-    fb.set_use_emotions(head.should_use_emotions())
-    configure_focal_mode_and_fixes(fb, head)
+    FBLoader.configure_solver(head)
 
     try:
         result_flag = fb.detect_face_pose(kid, faces[rectangle_index])
@@ -135,6 +136,92 @@ def _add_pins_to_face(headnum, camnum, rectangle_index):
     return result_flag
 
 
+def _largest_face(faces):
+    def _area(face):
+        x1, y1 = face.xy_min
+        x2, y2 = face.xy_max
+        return abs((x2 - x1) * (y2 - y1))
+    return max(faces, key=_area)
+
+
+class AutoPinStatus:
+    Ok = 0
+    NoLicense = 1
+    NoHead = 2
+    NoFaceDetector = 3
+
+
+def auto_pin_cameras(headnum, camnums=None, only_unpinned=False):
+    """ Detect faces and add auto-pins on many cameras of a head at once.
+        Cameras positions, focals and serialization are updated only once
+        at the end. Returns (AutoPinStatus, {camnum: result_flag}),
+        result_flag is None when no face has been found on the image.
+        Results are empty when status is not AutoPinStatus.Ok """
+    logger = logging.getLogger(__name__)
+    settings = get_main_settings()
+    head = settings.get_head(headnum)
+    if head is None or not FBLoader.load_model(headnum):
+        logger.error('Cannot load head: {}'.format(headnum))
+        return AutoPinStatus.NoHead, {}
+    fb = FBLoader.get_builder()
+    if not fb.is_face_detector_available():
+        logger.error('Face detector is not available')
+        return AutoPinStatus.NoFaceDetector, {}
+
+    if camnums is None:
+        camnums = range(len(head.cameras))
+    cameras = [(i, head.get_camera(i)) for i in camnums]
+    cameras = [(i, camera) for i, camera in cameras
+               if camera is not None and camera.cam_image is not None and
+               not (only_unpinned and camera.has_pins())]
+
+    FBLoader.configure_solver(head)
+
+    results = {}
+    chunk_size = max(1, Config.face_detection_threads)
+    for start in range(0, len(cameras), chunk_size):
+        chunk = cameras[start:start + chunk_size]
+        working_images = prepare_working_images(
+            [camera.cam_image for _, camera in chunk])
+
+        for (camnum, camera), working_image in zip(chunk, working_images):
+            if working_image is None:
+                logger.error('Bad image on camera: {}'.format(camnum))
+                results[camnum] = None
+                continue
+            faces = detect_faces(fb, camera, working_image)
+            if len(faces) == 0:
+                logger.debug('No faces on camera: {}'.format(camnum))
+                results[camnum] = None
+                continue
+
+            kid = camera.get_keyframe()
+            try:
+                result_flag = fb.detect_face_pose(kid, _largest_face(faces))
+            except pkt_module().UnlicensedException:
+                logger.error('UnlicensedException auto_pin_cameras')
+                return AutoPinStatus.NoLicense, {}
+            except Exception as err:
+                logger.error('UNKNOWN EXCEPTION detect_face_pose '
+                             'in auto_pin_cameras')
+                logger.error('Exception info: {}'.format(str(err)))
+                result_flag = False
+
+            if result_flag:
+                fb.remove_pins(kid)
+                fb.add_preset_pins(kid)
+            FBLoader.update_pins_count(headnum, camnum)
+            results[camnum] = result_flag
+            logger.debug('auto_pin camera: {} kid: {} result: {}'.format(
+                camnum, kid, result_flag))
+
+    if any(results.values()):
+        FBLoader.update_all_camera_positions(headnum)
+        FBLoader.update_all_camera_focals(headnum)
+        FBLoader.save_only(headnum)
+    return AutoPinStatus.Ok, results
+
+
 def _not_enough_face_features_warning():
     error_message = 'Sorry, could not find enough facial features \n' \
                     'to pin the model! Please try pinning the model manually.'
@@ -237,6 +324,7 @@ class FB_OT_PickMode(bpy.types.Operator):
 
         return {'FINISHED'}
 
+    @traced_operator_method(Config.fb_pickmode_idname + '.modal')
     def modal(self, context, event):
         logger = logging.getLogger(__name__)
         vp = FBLoader.viewport()
@@ -325,14 +413,14 @@ class FB_OT_PickModeStarter(bpy.types.Operator):
             logger.error(message)
             return {'CANCELLED'}
 
-        img = init_detected_faces(fb, self.headnum, self.camnum)
-        if img is None:
+        image_size = init_detected_faces(fb, self.headnum, self.camnum)
+        if image_size is None:
             message = 'Face detection failed because of a corrupted image'
             self.report({'ERROR'}, message)
             logger.error(message)
             return {'CANCELLED'}
 
-        h, w, _ = img.shape
+        w, h = image_size
         rects = sort_detected_faces()
 
         vp = FBLoader.viewport()
@@ -369,6 +457,7 @@ class FB_OT_PickModeStarter(bpy.types.Operator):
 
         return {'FINISHED'}
 
+    @traced_operator_method(Config.fb_pickmode_starter_idname + '.invoke')
     def invoke(self, context, event):
         logger = logging.getLogger(__name__)
         logger.debug('PickModeStarter invoke call')
@@ -384,3 +473,49 @@ class FB_OT_PickModeStarter(bpy.types.Operator):
         logger = logging.getLogger(__name__)
         logger.debug('PickModeStarter execute call')
         return self._action(context, event=None, invoked=False)
+
+
+class FB_OT_AutoPinAll(bpy.types.Operator):
+    bl_idname = Config.fb_auto_pin_all_idname
+    bl_label = 'Auto-pin all views'
+    bl_description = 'Detect faces on all views of the head ' \
+                     'and pin the model to the largest face on each of them'
+    bl_options = {'REGISTER', 'INTERNAL'}
+
+    headnum: bpy.props.IntProperty(default=0)
+    only_unpinned: bpy.props.BoolProperty(default=True)
+
+    @traced_operator_method(Config.fb_auto_pin_all_idname + '.execute')
+    def execute(self, context):
+        logger = logging.getLogger(__name__)
+        logger.debug('AutoPinAll execute call')
+        settings = get_main_settings()
+        head = settings.get_head(self.headnum)
+        if head is None:
+            return {'CANCELLED'}
+
+        status, results = auto_pin_cameras(self.headnum,
+                                           only_unpinned=self.only_unpinned)
+        if status == AutoPinStatus.NoLicense:
+            warn = get_operator(Config.fb_warning_idname)
+            warn('INVOKE_DEFAULT', msg=ErrorType.NoLicense)
+            return {'CANCELLED'}
+        if status == AutoPinStatus.NoFaceDetector:
+            self.report({'WARNING'}, 'Face detector is not available')
+            return {'CANCELLED'}
+        if status != AutoPinStatus.Ok:
+            self.report({'WARNING'}, 'Cannot load the head model')
+            return {'CANCELLED'}
+
+        pinned = len([x for x in results.values() if x])
+        if pinned > 0:
+            head.mark_model_changed_by_pinmode()
+            if settings.pinmode and settings.current_headnum == self.headnum:
+                FBLoader.fb_redraw(self.headnum, settings.current_camnum)
+            push_neutral_head_in_undo_history(head, -1,
+                                              'Auto-pin all views')
+
+        message = 'Auto-pinned views: {} of {}'.format(pinned, len(results))
+        self.report({'INFO'}, message)
+        logger.debug(message)
+        return {'FINISHED'}
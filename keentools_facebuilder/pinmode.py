@@ -26,6 +26,7 @@ from .config import Config, get_main_settings, get_operator, ErrorType
 from .fbloader import FBLoader
 from .utils.focal_length import update_camera_focal
 from .utils.other import FBStopShaderTimer, force_ui_redraw, hide_ui_elements
+from .utils.tracing import traced_operator_method
 
 
 class FB_OT_PinMode(bpy.types.Operator):
@@ -179,6 +180,7 @@ class FB_OT_PinMode(bpy.types.Operator):
                 return False
         return True
 
+    @traced_operator_method(Config.fb_pinmode_idname + '.invoke')
     def invoke(self, context, event):
         logger = logging.getLogger(__name__)
         args = (self, context)
@@ -248,6 +250,7 @@ class FB_OT_PinMode(bpy.types.Operator):
                 logger.debug("UPDATE KEYFRAME: {}".format(kfnum))
                 if not fb.is_key_at(kfnum):
                     fb.set_keyframe(kfnum, cam.get_model_mat())
+                    FBLoader.invalidate_solver_config()
         try:
             FBLoader.place_camera(settings.current_headnum,
                                   settings.current_camnum)
@@ -350,16 +353,12 @@ class FB_OT_PinMode(bpy.types.Operator):
 
         if event.type == 'ESC':
             FBLoader.out_pinmode(headnum)
-            # --- PROFILING ---
-            if FBLoader.viewport().profiling:
-                pr = FBLoader.viewport().pr
-                pr.dump_stats('facebuilder.pstat')
-            # --- PROFILING ---
             bpy.ops.view3d.view_camera()
             return True
 
         return False
 
+    @traced_operator_method(Config.fb_pinmode_idname + '.modal')
     def modal(self, context, event):
         logger = logging.getLogger(__name__)
         settings = get_main_settings()
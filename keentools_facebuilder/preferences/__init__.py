@@ -37,6 +37,9 @@ CLASSES_TO_REGISTER = (
     PREF_OT_OpenURL,
     PREF_OT_DownloadsURL,
     PREF_OT_ShowWhy,
+    PREF_OT_ExportTrace,
+    PREF_OT_ClearTrace,
+    PREF_OT_SavePinSession,
     FB_OT_UserPreferencesChanger,
     FBAddonPreferences
 )
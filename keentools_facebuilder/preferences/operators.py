@@ -25,6 +25,8 @@ from ..blender_independent_packages.pykeentools_loader import (
 from ..config import Config, get_operator
 from .formatting import replace_newlines_with_spaces
 from ..preferences.progress import InstallationProgress
+from ..utils.tracing import FBTracer
+from ..utils.pin_session import FBPinSessionRecorder
 
 
 _ID_NAME_PREFIX = 'preferences.' + Config.prefix
@@ -336,3 +338,94 @@ class PREF_OT_ShowWhy(bpy.types.Operator):
 
     def execute(self, context):
         return {'FINISHED'}
+
+
+class PREF_OT_ExportTrace(bpy.types.Operator):
+    bl_idname = _ID_NAME_PREFIX + '_export_trace'
+    bl_label = 'Export trace'
+    bl_options = {'REGISTER', 'INTERNAL'}
+    bl_description = 'Save recorded spans to a JSON file. ' \
+                     'Chrome trace files open in chrome://tracing or Perfetto'
+
+    filter_glob: bpy.props.StringProperty(
+        default='*.json',
+        options={'HIDDEN'}
+    )
+
+    filepath: bpy.props.StringProperty(
+            name='',
+            description='absolute path to trace file',
+            default='facebuilder_trace.json',
+            subtype='FILE_PATH'
+    )
+
+    trace_format: bpy.props.EnumProperty(name='Format', items=[
+        ('CHROME', 'Chrome trace', 'Trace Event Format', 0),
+        ('JSON', 'JSON', 'Raw events and latency percentiles', 1),
+    ], default='CHROME')
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, 'trace_format', expand=True)
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        filepath = bpy.path.ensure_ext(self.filepath, '.json')
+        try:
+            FBTracer.export(filepath, self.trace_format)
+        except OSError as err:
+            self.report({'ERROR'}, 'Cannot save trace: {}'.format(str(err)))
+            return {'CANCELLED'}
+        self.report({'INFO'}, 'Trace saved to {}'.format(filepath))
+        return {'FINISHED'}
+
+
+class PREF_OT_ClearTrace(bpy.types.Operator):
+    bl_idname = _ID_NAME_PREFIX + '_clear_trace'
+    bl_label = 'Clear'
+    bl_options = {'REGISTER', 'INTERNAL'}
+    bl_description = 'Remove all recorded spans'
+
+    def execute(self, context):
+        FBTracer.clear()
+        return {'FINISHED'}
+
+
+class PREF_OT_SavePinSession(bpy.types.Operator):
+    bl_idname = _ID_NAME_PREFIX + '_save_pin_session'
+    bl_label = 'Save session'
+    bl_options = {'REGISTER', 'INTERNAL'}
+    bl_description = 'Save the recorded pin session for replaying it ' \
+                     'with the benchmark script'
+
+    filter_glob: bpy.props.StringProperty(
+        default='*.json',
+        options={'HIDDEN'}
+    )
+
+    filepath: bpy.props.StringProperty(
+            name='',
+            description='absolute path to pin session file',
+            default='pin_session.json',
+            subtype='FILE_PATH'
+    )
+
+    def invoke(self, context, event):
+        if FBPinSessionRecorder.session() is None:
+            self.report({'ERROR'}, 'No pin session has been recorded')
+            return {'CANCELLED'}
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        filepath = bpy.path.ensure_ext(self.filepath, '.json')
+        try:
+            FBPinSessionRecorder.save(filepath)
+        except (OSError, ValueError) as err:
+            self.report({'ERROR'}, 'Cannot save session: {}'.format(str(err)))
+            return {'CANCELLED'}
+        self.report({'INFO'}, 'Pin session saved to {}'.format(filepath))
+        return {'FINISHED'}
@@ -24,6 +24,7 @@ from ..blender_independent_packages.pykeentools_loader import (
     install_from_file as pkt_install_from_file,
     MINIMUM_VERSION_REQUIRED as pkt_MINIMUM_VERSION_REQUIRED)
 from ..utils.other import FBTimer, force_ui_redraw
+from ..utils.enum_items import FBEnumItemsCache
 
 
 class FBUpdateProgressTimer(FBTimer):
@@ -78,12 +79,13 @@ class InstallationProgress:
             cls._state_mutex.release()
 
     @classmethod
-    def _update_progress(cls, value):
+    def _update_progress(cls, value, bytes_per_second=None):
         cls._state_mutex.acquire()
         try:
             assert(value <= 1.0)
             assert(cls.state['active'])
             cls.state['progress'] = value
+            cls.state['bytes_per_second'] = bytes_per_second
         finally:
             cls._state_mutex.release()
 
@@ -117,10 +119,12 @@ class InstallationProgress:
 
     @classmethod
     def _progress_callback(cls, value):
-        cls._update_progress(value)
+        cls._update_progress(float(value),
+                             getattr(value, 'bytes_per_second', None))
 
     @classmethod
     def _final_callback(cls):
+        FBEnumItemsCache.invalidate()
         cls._on_finish_download(
             'The core library has been downloaded and installed successfully.')
 
@@ -162,6 +166,7 @@ class InstallationProgress:
                 'Failed to install Core library from file. ' + str(error))
             logger.error("UNPACK CORE ERROR" + str(error))
         else:
+            FBEnumItemsCache.invalidate()
             cls._on_finish_download(
                 'The core library has been installed successfully.')
             logger.info("UNPACK CORE FINISH")
@@ -29,7 +29,10 @@ from ..preferences.operators import (
     PREF_OT_InstallLicenseOffline,
     PREF_OT_DownloadsURL,
     PREF_OT_FloatingConnect,
-    PREF_OT_OpenPktLicensePage)
+    PREF_OT_OpenPktLicensePage,
+    PREF_OT_ExportTrace,
+    PREF_OT_ClearTrace,
+    PREF_OT_SavePinSession)
 from ..blender_independent_packages.pykeentools_loader import (
     module as pkt_module,
     is_installed as pkt_is_installed,
@@ -42,6 +45,8 @@ from ..preferences.progress import InstallationProgress
 from ..messages import (ERROR_MESSAGES, USER_MESSAGES, draw_system_info,
                         draw_warning_labels, draw_long_labels)
 from ..preferences.user_preferences import UserPreferences
+from ..utils.tracing import FBTracer
+from ..utils.pin_session import FBPinSessionRecorder
 
 
 def _multi_line_text_to_output_labels(layout, txt):
@@ -133,6 +138,25 @@ def _universal_setter(name):
     return _setter
 
 
+def _tracing_getter(self):
+    return FBTracer.is_enabled()
+
+
+def _tracing_setter(self, value):
+    FBTracer.enable(value)
+
+
+def _pin_session_recording_getter(self):
+    return FBPinSessionRecorder.is_active()
+
+
+def _pin_session_recording_setter(self, value):
+    if value:
+        FBPinSessionRecorder.start()
+    else:
+        FBPinSessionRecorder.stop()
+
+
 class FBAddonPreferences(bpy.types.AddonPreferences):
     bl_idname = Config.addon_name
 
@@ -220,6 +244,21 @@ class FBAddonPreferences(bpy.types.AddonPreferences):
         get=_universal_getter('prevent_view_rotation', 'bool'),
         set=_universal_setter('prevent_view_rotation'),
     )
+    async_solve: bpy.props.BoolProperty(
+        name='Solve in background thread while dragging pins',
+        description='Keeps viewport responsive on slow solves. '
+                    'Not used if the core library blocks other threads',
+        get=_universal_getter('async_solve', 'bool'),
+        set=_universal_setter('async_solve'),
+    )
+    wireframe_lod_ratio: bpy.props.FloatProperty(
+        name='Wireframe detail while dragging pins',
+        description='Part of wireframe edges drawn while a pin is dragged. '
+                    'Full wireframe is restored on mouse release',
+        min=0.05, max=1.0, precision=2,
+        get=_universal_getter('wireframe_lod_ratio', 'float'),
+        set=_universal_setter('wireframe_lod_ratio'),
+    )
     wireframe_opacity: bpy.props.FloatProperty(
         description="From 0.0 to 1.0",
         name="Wireframe opacity",
@@ -241,6 +280,18 @@ class FBAddonPreferences(bpy.types.AddonPreferences):
         get=_universal_getter('wireframe_special_color', 'color'),
         set=_universal_setter('wireframe_special_color')
     )
+    tracing_enabled: bpy.props.BoolProperty(
+        name='Trace operator latency',
+        description='Record timings of solving, drawing and other '
+                    'operations. Tracing is off after Blender restart',
+        get=_tracing_getter,
+        set=_tracing_setter)
+    pin_session_recording: bpy.props.BoolProperty(
+        name='Record pin session',
+        description='Record pin drags of one head to replay them '
+                    'in background Blender with benchmark.py',
+        get=_pin_session_recording_getter,
+        set=_pin_session_recording_setter)
     wireframe_midline_color: bpy.props.FloatVectorProperty(
         description="Color of midline in pin-mode",
         name="Wireframe Midline Color", subtype='COLOR',
@@ -389,8 +440,13 @@ class FBAddonPreferences(bpy.types.AddonPreferences):
         col.scale_y = Config.text_scale_y
         download_state = InstallationProgress.get_state()
         if download_state['active']:
-            col.label(text="Downloading: {:.1f}%".format(
-                100 * download_state['progress']))
+            speed = download_state.get('bytes_per_second')
+            if speed:
+                col.label(text="Downloading: {:.1f}% ({:.1f} MB/s)".format(
+                    100 * download_state['progress'], speed / (1024 * 1024)))
+            else:
+                col.label(text="Downloading: {:.1f}%".format(
+                    100 * download_state['progress']))
         if download_state['status'] is not None:
             col.label(text="{}".format(download_state['status']))
 
@@ -481,6 +537,8 @@ class FBAddonPreferences(bpy.types.AddonPreferences):
 
         box = main_box.box()
         box.prop(self, 'prevent_view_rotation')
+        box.prop(self, 'async_solve')
+        box.prop(self, 'wireframe_lod_ratio', slider=True)
 
         box = main_box.box()
         box.label(text='Pin size and sensitivity')
@@ -518,6 +576,34 @@ class FBAddonPreferences(bpy.types.AddonPreferences):
                                text='Reset All to Defaults')
         op.action = 'reset_all_to_default'
 
+        self._draw_tracing(main_box)
+
+    def _draw_tracing(self, layout):
+        box = layout.box()
+        row = box.split(factor=0.7)
+        row.prop(self, 'tracing_enabled')
+        row = row.row(align=True)
+        row.operator(PREF_OT_ExportTrace.bl_idname, text='Export')
+        row.operator(PREF_OT_ClearTrace.bl_idname, text='Clear')
+
+        row = box.split(factor=0.7)
+        row.prop(self, 'pin_session_recording')
+        row.operator(PREF_OT_SavePinSession.bl_idname,
+                     text='Save ({})'.format(
+                         FBPinSessionRecorder.events_count()))
+
+        stats = FBTracer.stats()
+        if len(stats) == 0:
+            return
+        col = box.column()
+        col.scale_y = Config.text_scale_y
+        col.label(text='name: count / p50 / p95 / max (ms)')
+        for name in sorted(stats.keys()):
+            item = stats[name]
+            col.label(text='{}: {} / {:.1f} / {:.1f} / {:.1f}'.format(
+                name, item['count'], item['p50'] * 1000,
+                item['p95'] * 1000, item['max'] * 1000))
+
     def draw(self, context):
         layout = self.layout
 
@@ -18,12 +18,16 @@
 
 import logging
 
+import bpy
+
 from ..config import Config
 from ..blender_independent_packages.pykeentools_loader import (
     module as pkt_module, is_installed as pkt_is_installed)
 
 
 class UserPreferences:
+    """ Settings are read from disk once and kept in memory.
+        Changes are written back by a debounced timer or by flush() """
     _DICT_NAME = Config.user_preferences_dict_name
     _defaults = Config.default_user_preferences
     type_float = 'float'
@@ -32,17 +36,39 @@ class UserPreferences:
     type_bool = 'bool'
     type_color = 'color'
 
+    _cache = None
+    _dirty = False
+
+    @classmethod
+    def _load_settings(cls):
+        return pkt_module().utils.load_settings(cls._DICT_NAME)
+
+    @classmethod
+    def _save_settings(cls, dict_to_save):
+        pkt_module().utils.save_settings(cls._DICT_NAME, dict_to_save)
+
     @classmethod
     def get_dict(cls):
+        if cls._cache is not None:
+            return cls._cache
         if pkt_is_installed():
-            _dict = pkt_module().utils.load_settings(cls._DICT_NAME)
-        else:
-            _dict = cls._defaults
-        return _dict
+            cls._cache = dict(cls._load_settings())
+            return cls._cache
+        return cls._defaults
+
+    @classmethod
+    def invalidate(cls):
+        """ Drop in-memory state. Unsaved changes are written first """
+        cls.flush()
+        cls._cache = None
+
+    @classmethod
+    def is_dirty(cls):
+        return cls._dirty
 
     @classmethod
     def print_dict(cls):
-        d = pkt_module().utils.load_settings(cls._DICT_NAME)
+        d = cls._load_settings()
         logger = logging.getLogger(__name__)
         logger.debug('UserPreferences: {}'.format(d))
 
@@ -72,17 +98,43 @@ class UserPreferences:
     @classmethod
     def set_value(cls, name, value):
         _dict = cls.get_dict()
-        _dict[name] = str(value)
-        cls.save_dict(_dict)
+        str_value = str(value)
+        if _dict is cls._defaults or _dict.get(name) == str_value:
+            return
+        _dict[name] = str_value
+        cls._mark_dirty()
+
+    @classmethod
+    def _mark_dirty(cls):
+        cls._dirty = True
+        if bpy.app.timers.is_registered(_flush_timer_callback):
+            bpy.app.timers.unregister(_flush_timer_callback)
+        bpy.app.timers.register(_flush_timer_callback,
+                                first_interval=Config.preferences_save_delay,
+                                persistent=True)
+
+    @classmethod
+    def flush(cls):
+        if bpy.app.timers.is_registered(_flush_timer_callback):
+            bpy.app.timers.unregister(_flush_timer_callback)
+        if not cls._dirty or cls._cache is None:
+            return False
+        cls._dirty = False
+        cls._save_settings(cls._cache)
+        # cls.print_dict()  # Debug only call
+        return True
 
     @classmethod
     def clear_dict(cls):
         pkt_module().utils.reset_settings(cls._DICT_NAME)
+        cls._cache = None
+        cls._dirty = False
 
     @classmethod
     def save_dict(cls, dict_to_save):
-        pkt_module().utils.save_settings(cls._DICT_NAME, dict_to_save)
-        # cls.print_dict()  # Debug only call
+        cls._cache = dict(dict_to_save)
+        cls._dirty = True
+        cls.flush()
 
     @classmethod
     def reset_parameter_to_default(cls, name):
@@ -95,3 +147,9 @@ class UserPreferences:
         cls.clear_dict()
         for name in cls._defaults.keys():
             cls.set_value(name, cls._defaults[name]['value'])
+        cls.flush()
+
+
+def _flush_timer_callback():
+    UserPreferences.flush()
+    return None  # One-shot timer
@@ -18,8 +18,10 @@
 
 
 import math
+import random
 
 import bpy
+from bpy.app.handlers import persistent
 import numpy as np
 from bpy.props import (
     BoolProperty,
@@ -37,6 +39,8 @@ from bpy.types import PropertyGroup
 from .config import Config, get_main_settings
 from .fbloader import FBLoader
 from .utils import coords
+from .utils.serialization import encode_serial_str, decompress_serial_str
+from .utils.enum_items import FBEnumItemsCache
 from .callbacks import (update_mesh_with_dialog,
                         update_mesh_simple,
                         update_expressions,
@@ -52,6 +56,7 @@ from .callbacks import (update_mesh_with_dialog,
                         update_blue_head_button,
                         universal_getter, universal_setter)
 from .utils.manipulate import get_current_head
+from .blender_independent_packages.pykeentools_loader import module as pkt_module
 
 
 class FBExifItem(PropertyGroup):
@@ -90,6 +95,130 @@ class FBExifItem(PropertyGroup):
         return w, h
 
 
+class FBModelMatCache:
+    """ Decoded camera model matrices by their write token.
+        Every set_model_mat generates a new token, so cached matrices
+        never become stale and no invalidation is needed on undo """
+    _max_size = 4096
+    _cache = {}
+
+    @classmethod
+    def get(cls, token):
+        return cls._cache.get(token)
+
+    @classmethod
+    def put(cls, token, mat):
+        if len(cls._cache) >= cls._max_size:
+            cls._cache = {}
+        mat.setflags(write=False)
+        cls._cache[token] = mat
+
+    @classmethod
+    def clear(cls):
+        cls._cache = {}
+
+
+@persistent
+def migrate_model_matrices_handler(*args):
+    """ Convert hex-string matrices from old scenes to the typed storage """
+    for scene in bpy.data.scenes:
+        settings = getattr(scene, Config.addon_global_var_name, None)
+        if settings is None:
+            continue
+        for head in settings.heads:
+            for camera in head.cameras:
+                camera.migrate_model_mat()
+
+
+class FBObjectIndex:
+    """ Cached object -> (headnum, camnum) lookup for FBSceneSettings.
+        Entries are verified on every hit, the index is rebuilt when
+        a verification fails or after invalidate. It is invalidated by
+        headobj/camobj updates, by removals from heads/cameras
+        collections and on file load, undo and redo """
+    _settings_pointer = None
+    _valid = False
+    _objects = {}  # object pointer -> (headnum, camnum)
+    _items = {}  # head or camera item pointer -> (headnum, camnum)
+
+    @classmethod
+    def invalidate(cls):
+        cls._valid = False
+
+    @classmethod
+    def reset(cls):
+        cls._valid = False
+        cls._settings_pointer = None
+        cls._objects = {}
+        cls._items = {}
+
+    @classmethod
+    def _rebuild(cls, settings):
+        objects = {}
+        items = {}
+        for i, head in enumerate(settings.heads):
+            items[head.as_pointer()] = (i, -1)
+            if head.headobj is not None:
+                objects.setdefault(head.headobj.as_pointer(), (i, -1))
+            for j, camera in enumerate(head.cameras):
+                items[camera.as_pointer()] = (i, j)
+                if camera.camobj is not None:
+                    objects.setdefault(camera.camobj.as_pointer(), (i, j))
+        cls._objects = objects
+        cls._items = items
+        cls._settings_pointer = settings.as_pointer()
+        cls._valid = True
+
+    @classmethod
+    def _find(cls, settings, storage_name, pointer, check):
+        entry = getattr(cls, storage_name).get(pointer)
+        if entry is not None and check(entry):
+            return entry
+        if entry is None and cls._valid and \
+                cls._settings_pointer == settings.as_pointer():
+            return None
+        cls._rebuild(settings)
+        return getattr(cls, storage_name).get(pointer)
+
+    @classmethod
+    def find_object(cls, settings, obj):
+        def _check(entry):
+            head = settings.get_head(entry[0])
+            if head is None:
+                return False
+            if entry[1] < 0:
+                return head.headobj == obj
+            camera = head.get_camera(entry[1])
+            return camera is not None and camera.camobj == obj
+
+        if obj is None:
+            return None
+        return cls._find(settings, '_objects', obj.as_pointer(), _check)
+
+    @classmethod
+    def find_item(cls, settings, item):
+        def _check(entry):
+            head = settings.get_head(entry[0])
+            if head is None:
+                return False
+            if entry[1] < 0:
+                return head.as_pointer() == pointer
+            camera = head.get_camera(entry[1])
+            return camera is not None and camera.as_pointer() == pointer
+
+        pointer = item.as_pointer()
+        return cls._find(settings, '_items', pointer, _check)
+
+
+def _invalidate_object_index(self, context):
+    FBObjectIndex.invalidate()
+
+
+@persistent
+def object_index_reset_handler(*args):
+    FBObjectIndex.reset()
+
+
 class FBCameraItem(PropertyGroup):
     keyframe_id: IntProperty(default=0)
     cam_image: PointerProperty(
@@ -99,11 +228,22 @@ class FBCameraItem(PropertyGroup):
     image_height: IntProperty(default=-1)
 
     camobj: PointerProperty(
-        name="Camera", type=bpy.types.Object
+        name="Camera", type=bpy.types.Object,
+        update=_invalidate_object_index
     )
+    # Legacy hex-encoded storage. Used only for migration from old scenes
     model_mat: StringProperty(
         name="Model Matrix", default=""
     )
+    model_mat_array: FloatVectorProperty(
+        name="Model Matrix", size=16,
+        default=(1.0, 0.0, 0.0, 0.0,
+                 0.0, 1.0, 0.0, 0.0,
+                 0.0, 0.0, 1.0, 0.0,
+                 0.0, 0.0, 0.0, 1.0)
+    )
+    # Zero means that model_mat_array has never been written
+    model_mat_token: IntProperty(default=0)
     pins_count: IntProperty(
         name="Pins in Camera", default=0)
 
@@ -231,10 +371,28 @@ class FBCameraItem(PropertyGroup):
         return np.frombuffer(b, dtype=np.float32).reshape((4, 4))
 
     def set_model_mat(self, arr):
-        self.model_mat = self.convert_matrix_to_str(arr)
+        mat = np.array(arr, dtype=np.float32).reshape((4, 4))
+        token = random.randint(1, 2 ** 31 - 1)
+        self.model_mat_array = mat.ravel()
+        self.model_mat_token = token
+        if self.model_mat != '':
+            self.model_mat = ''
+        FBModelMatCache.put(token, mat)
 
     def get_model_mat(self):
-        return self.convert_str_to_matrix(self.model_mat)
+        token = self.model_mat_token
+        if token == 0:
+            return self.convert_str_to_matrix(self.model_mat)
+        mat = FBModelMatCache.get(token)
+        if mat is None:
+            mat = np.array(self.model_mat_array,
+                           dtype=np.float32).reshape((4, 4))
+            FBModelMatCache.put(token, mat)
+        return mat
+
+    def migrate_model_mat(self):
+        if self.model_mat_token == 0 and self.model_mat != '':
+            self.set_model_mat(self.convert_str_to_matrix(self.model_mat))
 
     # Simple getters/setters
     def get_image_width(self):
@@ -270,7 +428,7 @@ class FBCameraItem(PropertyGroup):
         self.set_image_height(h)
 
     def is_model_mat_empty(self):
-        return self.model_mat == ''
+        return self.model_mat_token == 0 and self.model_mat == ''
 
     def is_deleted(self):
         """ Checks that the list item references a non-existent object """
@@ -364,11 +522,10 @@ class FBCameraItem(PropertyGroup):
 
     def get_headnum_camnum(self):
         settings = get_main_settings()
-        for i, head in enumerate(settings.heads):
-            for j, camera in enumerate(head.cameras):
-                if camera == self:
-                    return i, j
-        return -1, -1
+        entry = FBObjectIndex.find_item(settings, self)
+        if entry is None or entry[1] < 0:
+            return -1, -1
+        return entry
 
     def get_focal_length_in_pixels_coef(self):
         w, _ = self.get_oriented_image_size()
@@ -376,12 +533,21 @@ class FBCameraItem(PropertyGroup):
         return sc * w / Config.default_sensor_width
 
 
+def _builder_items_key(fb):
+    return pkt_module().__version__, id(fb)
+
+
+def _build_uv_items(fb):
+    return [('uv{}'.format(i), name, '', 'UV', i)
+            for i, name in enumerate(fb.uv_sets_list())]
+
+
 def uv_items_callback(self, context):
     fb = FBLoader.get_builder()
-    res = []
-    for i, name in enumerate(fb.uv_sets_list()):
-        res.append(('uv{}'.format(i), name, '', 'UV', i))
-    return res
+    # UV sets belong to the topology, so the head model is part of the key
+    key = _builder_items_key(fb) + (getattr(self, 'model_type', ''),)
+    return FBEnumItemsCache.get('uv_items', key,
+                                lambda: _build_uv_items(fb))
 
 
 def _get_icon_by_lod(level_of_detail):
@@ -393,21 +559,28 @@ def _get_icon_by_lod(level_of_detail):
     return 'BLANK1'
 
 
-def model_type_callback(self, context):
+def _build_model_type_items(fb):
     res = [(x.name, x.name, '', _get_icon_by_lod(x.level_of_detail), i)
-           for i, x in enumerate(FBLoader.get_builder().models_list())]
+           for i, x in enumerate(fb.models_list())]
     if len(res) == 0 or (len(res) == 1 and res[0][0] == ''):
         return [('', 'old topology', '', _get_icon_by_lod('HIGH_POLY'), 0)]
     return res
 
 
+def model_type_callback(self, context):
+    fb = FBLoader.get_builder()
+    return FBEnumItemsCache.get('model_type', _builder_items_key(fb),
+                                lambda: _build_model_type_items(fb))
+
+
 class FBHeadItem(PropertyGroup):
     use_emotions: bpy.props.BoolProperty(name="Allow facial expressions",
                                          default=False,
                                          update=update_expressions)
     reduce_pins: bpy.props.BoolProperty(name="Reduce pins",
                                         default=True)
-    headobj: PointerProperty(name="Head", type=bpy.types.Object)
+    headobj: PointerProperty(name="Head", type=bpy.types.Object,
+                             update=_invalidate_object_index)
     blendshapes_control_panel: PointerProperty(name="Blendshapes Control Panel",
                                                type=bpy.types.Object)
     cameras: CollectionProperty(name="Cameras", type=FBCameraItem)
@@ -528,11 +701,12 @@ class FBHeadItem(PropertyGroup):
         return self.get_camera(self.get_last_camnum())
 
     def set_serial_str(self, value):
-        self.serial_str = value
-        self.headobj[Config.fb_serial_prop_name[0]] = value
+        encoded = encode_serial_str(value)
+        self.serial_str = encoded
+        self.headobj[Config.fb_serial_prop_name[0]] = encoded
 
     def get_serial_str(self):
-        return self.serial_str
+        return decompress_serial_str(self.serial_str)
 
     def is_deleted(self):
         """ Checks that the list item references a non-existent object """
@@ -607,10 +781,10 @@ class FBHeadItem(PropertyGroup):
 
     def get_headnum(self):
         settings = get_main_settings()
-        for i, head in enumerate(settings.heads):
-            if head == self:
-                return i
-        return -1
+        entry = FBObjectIndex.find_item(settings, self)
+        if entry is None or entry[1] >= 0:
+            return -1
+        return entry[0]
 
 
 class FBSceneSettings(PropertyGroup):
@@ -810,18 +984,17 @@ class FBSceneSettings(PropertyGroup):
     # Find Head by Blender object (Head Mesh)
     def find_head_index(self, obj):
         """ Find head index by blender object """
-        for i, h in enumerate(self.heads):
-            if h.headobj is obj:
-                return i  # Found Head index
-        return -1  # head object not found
+        entry = FBObjectIndex.find_object(self, obj)
+        if entry is None or entry[1] >= 0:
+            return -1  # head object not found
+        return entry[0]  # Found Head index
 
     # Find Camera by Blender object
     def find_cam_index(self, obj):
-        for i, h in enumerate(self.heads):
-            for j, c in enumerate(h.cameras):
-                if c.camobj is obj:
-                    return i, j  # Head & Camera indices
-        return -1, -1  # camera not found
+        entry = FBObjectIndex.find_object(self, obj)
+        if entry is None or entry[1] < 0:
+            return -1, -1  # camera not found
+        return entry  # Head & Camera indices
 
     # Verify the existence of all this head cameras
     @staticmethod
@@ -858,6 +1031,8 @@ class FBSceneSettings(PropertyGroup):
                 err.append(i)  # Wrong camera in list
         for i in reversed(err):  # Delete in backward order
             head.cameras.remove(i)
+        if status:
+            FBObjectIndex.invalidate()
         return status  # True if there was any changes
 
     def fix_heads(self):
@@ -881,12 +1056,15 @@ class FBSceneSettings(PropertyGroup):
                     cams_deleted += 1  # At least one camera is deleted
         for i in reversed(err):
             self.heads.remove(i)
+        if len(err) > 0:
+            FBObjectIndex.invalidate()
         return heads_deleted, cams_deleted
 
     def head_by_obj(self, obj):
-        i = self.find_head_index(obj)
-        j, _ = self.find_cam_index(obj)
-        return max(i, j)
+        entry = FBObjectIndex.find_object(self, obj)
+        if entry is None:
+            return -1
+        return entry[0]
 
     def get_last_headnum(self):
         return len(self.heads) - 1
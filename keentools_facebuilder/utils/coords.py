@@ -188,6 +188,18 @@ def calc_model_mat(model_mat, head_mat):
         return None
 
 
+def calc_model_mats(model_mats, head_mat):
+    """ Batched calc_model_mat for (n, 4, 4) model matrices.
+        Falls back to one by one conversion if any matrix is singular """
+    rot_mat = xy_to_xz_rotation_matrix_4x4()
+    model_mats = np.asarray(model_mats)
+    try:
+        nm = (model_mats @ rot_mat) @ np.linalg.inv(head_mat)
+        return np.transpose(np.linalg.inv(nm), (0, 2, 1))
+    except Exception:
+        return [calc_model_mat(mat, head_mat) for mat in model_mats]
+
+
 def get_raw_camera_2d_data(context):
     """ Area coordinates and view parameters for debug logging """
     if bpy.app.background:
@@ -203,18 +215,17 @@ def get_raw_camera_2d_data(context):
     return res
 
 
-def get_camera_border(context):
-    """ Camera corners detection via context and parameters """
-    if bpy.app.background:
-        context = get_fake_context()
+def _zoom_scale_factor(z):
+    # Blender Zoom formula
+    return (z * 0.01 + math.sqrt(0.5)) ** 2  # f - scale factor
+
 
+def _calc_camera_border(context):
     reg = context.region
     w = reg.width
     h = reg.height
     rv3d = context.space_data.region_3d
-    z = rv3d.view_camera_zoom
-    # Blender Zoom formula
-    f = (z * 0.01 + math.sqrt(0.5)) ** 2  # f - scale factor
+    f = _zoom_scale_factor(rv3d.view_camera_zoom)
 
     scene = context.scene
     rx = scene.render.resolution_x
@@ -252,44 +263,145 @@ def get_camera_border(context):
     return x1, y1, x2, y2
 
 
+class FBViewGeometry:
+    """ Camera border and region geometry cached by view parameters:
+        area and region sizes, camera zoom & offset, render resolution """
+    _fake_context = None
+    _key = None
+    _border = (0.0, 0.0, 1.0, 1.0)
+    _pixel_size = 1.0
+    _area_size = (1, 1)
+    _side_regions = ()  # Not WINDOW regions as (x1, y1, x2, y2) in area
+    _hits = 0
+    _misses = 0
+
+    @classmethod
+    def _get_context(cls, context):
+        if not bpy.app.background:
+            return context
+        fake = cls._fake_context
+        if fake is None or fake.area is None or \
+                fake.scene != bpy.context.scene:
+            fake = get_fake_context()
+            cls._fake_context = fake
+        return fake
+
+    @staticmethod
+    def _view_key(context):
+        a = context.area
+        reg = context.region
+        rv3d = context.space_data.region_3d
+        render = context.scene.render
+        return (a.x, a.y, a.width, a.height, reg.width, reg.height,
+                rv3d.view_camera_zoom, *rv3d.view_camera_offset,
+                render.resolution_x, render.resolution_y,
+                tuple((r.width, r.height) for r in a.regions
+                      if r.type != 'WINDOW'))
+
+    @classmethod
+    def _calc(cls, context, key):
+        a = context.area
+        cls._border = _calc_camera_border(context)
+        w = a.width if a.width > 0 else 1.0
+        cls._pixel_size = 1.0 / (w * _zoom_scale_factor(
+            context.space_data.region_3d.view_camera_zoom))
+        cls._area_size = (a.width, a.height)
+        cls._side_regions = tuple(
+            (r.x - a.x, r.y - a.y, r.x - a.x + r.width, r.y - a.y + r.height)
+            for r in a.regions if r.type != 'WINDOW')
+        cls._key = key
+
+    @classmethod
+    def update(cls, context):
+        view_context = cls._get_context(context)
+        try:
+            key = cls._view_key(view_context)
+        except ReferenceError:  # Screen has been changed
+            cls._fake_context = None
+            view_context = cls._get_context(context)
+            key = cls._view_key(view_context)
+        if key == cls._key:
+            cls._hits += 1
+            return
+        cls._misses += 1
+        cls._calc(view_context, key)
+
+    @classmethod
+    def invalidate(cls):
+        cls._fake_context = None
+        cls._key = None
+
+    @classmethod
+    def stats(cls):
+        total = cls._hits + cls._misses
+        return {'hits': cls._hits, 'misses': cls._misses,
+                'hit_rate': cls._hits / total if total > 0 else 0.0}
+
+    @classmethod
+    def reset_stats(cls):
+        cls._hits = 0
+        cls._misses = 0
+
+    @classmethod
+    def camera_border(cls, context):
+        cls.update(context)
+        return cls._border
+
+    @classmethod
+    def pixel_size(cls, context):
+        cls.update(context)
+        return cls._pixel_size
+
+    @classmethod
+    def is_in_area(cls, context, x, y):
+        cls.update(context)
+        w, h = cls._area_size
+        return (0 <= x <= w) and (0 <= y <= h)
+
+    @classmethod
+    def is_safe_region(cls, context, x, y):
+        cls.update(context)
+        for x1, y1, x2, y2 in cls._side_regions:
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                return False
+        return True
+
+    @classmethod
+    def image_space_to_region_array(cls, context, points):
+        """ (n, 2) image space points to region space """
+        x1, y1, x2, y2 = cls.camera_border(context)
+        res = np.array(points, dtype=np.float32).reshape((-1, 2))
+        sc = x2 - x1
+        res[:, 0] = x1 + (res[:, 0] + 0.5) * sc
+        res[:, 1] = (y1 + y2) * 0.5 + res[:, 1] * sc
+        return res
+
+    @classmethod
+    def region_to_image_space_array(cls, context, points):
+        """ (n, 2) region space points to image space """
+        x1, y1, x2, y2 = cls.camera_border(context)
+        res = np.array(points, dtype=np.float32).reshape((-1, 2))
+        sc = (x2 - x1) if x2 != x1 else 1.0
+        res[:, 0] = (res[:, 0] - (x1 + x2) * 0.5) / sc
+        res[:, 1] = (res[:, 1] - (y1 + y2) * 0.5) / sc
+        return res
+
+
+def get_camera_border(context):
+    """ Camera corners detection via context and parameters """
+    return FBViewGeometry.camera_border(context)
+
+
 def is_safe_region(context, x, y):
     """ Safe region for pin operation """
-    if bpy.app.background:
-        context = get_fake_context()
-
-    a = context.area
-    rr = a.regions
-    x0 = a.x
-    y0 = a.y
-    w = a.width
-    h = a.height
-    for i, r in enumerate(rr):
-        if r.type != 'WINDOW':
-            if (r.x <= x + x0 <= r.x + r.width) and (
-                    r.y <= y + y0 <= r.y + r.height):
-                return False
-    return True
+    return FBViewGeometry.is_safe_region(context, x, y)
 
 
 def is_in_area(context, x, y):
     """ Is point in context.area """
-    if bpy.app.background:
-        context = get_fake_context()
-
-    a = context.area
-    return (0 <= x <= a.width) and (0 <= y <= a.height)
+    return FBViewGeometry.is_in_area(context, x, y)
 
 
 def get_pixel_relative_size(context):
     """ One Pixel size in relative coords via current zoom """
-    if bpy.app.background:
-        context = get_fake_context()
-
-    a = context.area
-    w = a.width if a.width > 0 else 1.0
-    rv3d = context.space_data.region_3d
-    z = rv3d.view_camera_zoom
-    # Blender Zoom formula
-    f = (z * 0.01 + math.sqrt(0.5)) ** 2  # f - scale factor
-    ps = 1.0 / (w * f)
-    return ps
+    return FBViewGeometry.pixel_size(context)
@@ -0,0 +1,87 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+
+import time
+
+from ..config import Config
+
+
+class FBDragScheduler:
+    """ Coalesces mouse moves of a pin drag.
+        Only the latest pointer position is kept. The solve pipeline runs
+        not more often than once per frame and not faster than the measured
+        pipeline time allows, so fast mice and tablets don't queue work """
+    _pending = None
+    _last_position = None
+    _last_run = 0.0
+    _run_time = 0.0  # Moving average of pipeline duration
+    _moves = 0
+    _runs = 0
+
+    @classmethod
+    def reset(cls):
+        cls._pending = None
+        cls._last_position = None
+        cls._last_run = 0.0
+        cls._moves = 0
+        cls._runs = 0
+
+    @classmethod
+    def push(cls, mouse_x, mouse_y):
+        cls._moves += 1
+        position = (mouse_x, mouse_y)
+        cls._pending = None if position == cls._last_position else position
+
+    @classmethod
+    def has_pending(cls):
+        return cls._pending is not None
+
+    @classmethod
+    def interval(cls):
+        return max(Config.drag_frame_interval,
+                   cls._run_time * Config.drag_run_time_factor)
+
+    @classmethod
+    def is_due(cls):
+        return cls._pending is not None and \
+               time.perf_counter() - cls._last_run >= cls.interval()
+
+    @classmethod
+    def pop(cls):
+        position = cls._pending
+        cls._pending = None
+        cls._last_position = position
+        return position
+
+    @classmethod
+    def run_started(cls):
+        cls._last_run = time.perf_counter()
+
+    @classmethod
+    def run_finished(cls):
+        duration = time.perf_counter() - cls._last_run
+        cls._runs += 1
+        k = Config.drag_run_time_smoothing
+        cls._run_time = duration if cls._run_time == 0.0 \
+            else k * duration + (1.0 - k) * cls._run_time
+
+    @classmethod
+    def stats(cls):
+        """ Mouse moves received, pipeline runs and moves dropped """
+        return {'moves': cls._moves, 'runs': cls._runs,
+                'coalesced': max(0, cls._moves - cls._runs)}
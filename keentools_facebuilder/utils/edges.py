@@ -31,6 +31,7 @@ from ..utils.images import (check_bpy_image_has_same_size,
                             find_bpy_image_by_name,
                             remove_bpy_image, add_alpha_channel)
 from ..utils import coords
+from .tracing import traced
 
 
 class FBEdgeShaderBase:
@@ -157,6 +158,7 @@ class FBEdgeShader2D(FBEdgeShaderBase):
         self.line_shader.bind()
         self.line_batch.draw(self.line_shader)
 
+    @traced('create_batch.residuals')
     def create_batch(self):
         if bpy.app.background:
             return
@@ -250,6 +252,7 @@ class FBRectangleShader2D(FBEdgeShader2D):
         self.line_shader.bind()
         self.line_batch.draw(self.line_shader)
 
+    @traced('create_batch.rectangles')
     def create_batch(self):
         if bpy.app.background:
             return
@@ -268,12 +271,25 @@ class FBRasterEdgeShader3D(FBEdgeShaderBase):
     def _inverse_gamma_color(col, power=2.2):
         return [x ** (1.0 / power) for x in col]
 
+    _pos_format = None
+    _uv_format = None
+
     def __init__(self):
         self._edges_indices = np.array([], dtype=np.int)
         self._edges_uvs = []
         self._colors = [(1, 0, 0), (0, 1, 0), (0, 0, 1)]
         self._opacity = 0.3
         self._use_simple_shader = False
+        # Vertices are kept in object space, matrix is applied on GPU
+        self._object_matrix = None
+        # GPU data that depends only on topology
+        self._fill_ibo = None
+        self._line_buffers = {}  # Keyed by LOD mode
+        # Decimated wireframe used while a pin is dragged
+        self._use_lod = False
+        self._lod_ratio = 1.0
+        self._lod_edges = None
+        self._special_texture = None
         super().__init__()
 
     def init_colors(self, colors, opacity):
@@ -287,12 +303,16 @@ class FBRasterEdgeShader3D(FBEdgeShaderBase):
         self._use_simple_shader = False
 
     def init_wireframe_image(self, fb, show_specials):
+        self._special_texture = None
+        self._lod_edges = None
+        self._line_buffers.pop(True, None)
         if not show_specials or not fb.face_texture_available():
             self.switch_to_simple_shader()
             return False
 
         fb.set_face_texture_colors(self._colors)
         image_data = fb.face_texture()[::2, ::2, :]  # sample down x0.5
+        self._special_texture = image_data
         size = image_data.shape[:2]
         assert size[0] > 0 and size[1] > 0
         image_name = Config.coloring_texture_name
@@ -352,6 +372,10 @@ class FBRasterEdgeShader3D(FBEdgeShaderBase):
         bgl.glEnable(bgl.GL_POLYGON_OFFSET_FILL)
         bgl.glPolygonOffset(1.0, 1.0)
 
+        gpu.matrix.push()
+        if self._object_matrix is not None:
+            gpu.matrix.multiply_matrix(self._object_matrix)
+
         bgl.glColorMask(bgl.GL_FALSE, bgl.GL_FALSE, bgl.GL_FALSE, bgl.GL_FALSE)
         bgl.glPolygonMode(bgl.GL_FRONT_AND_BACK, bgl.GL_FILL)
 
@@ -384,19 +408,131 @@ class FBRasterEdgeShader3D(FBEdgeShaderBase):
                 'color', ((*self._colors[0][:3], self._opacity)))
             self.simple_line_batch.draw(self.simple_line_shader)
 
+        gpu.matrix.pop()
         bgl.glPolygonMode(bgl.GL_FRONT_AND_BACK, bgl.GL_FILL)
         bgl.glDepthMask(bgl.GL_TRUE)
         bgl.glDisable(bgl.GL_DEPTH_TEST)
 
-    def create_batches(self):
-        if bpy.app.background:
+    @classmethod
+    def _vertex_buffer(cls, attr, data):
+        if cls._pos_format is None:
+            cls._pos_format = gpu.types.GPUVertFormat()
+            cls._pos_format.attr_add(id='pos', comp_type='F32', len=3,
+                                     fetch_mode='FLOAT')
+            cls._uv_format = gpu.types.GPUVertFormat()
+            cls._uv_format.attr_add(id='texCoord', comp_type='F32', len=2,
+                                    fetch_mode='FLOAT')
+        vbo = gpu.types.GPUVertBuf(
+            len=len(data),
+            format=cls._pos_format if attr == 'pos' else cls._uv_format)
+        vbo.attr_fill(id=attr, data=data)
+        return vbo
+
+    def _clear_topology_buffers(self):
+        self._fill_ibo = None
+        self._line_buffers = {}
+        self._lod_edges = None
+
+    def set_lod_mode(self, state, ratio=1.0):
+        """ Decimated edge set is used while state is True.
+            Returns True if mode has been changed """
+        state = state and ratio < 1.0
+        if state and ratio != self._lod_ratio:
+            self._lod_ratio = ratio
+            self._lod_edges = None
+            self._line_buffers.pop(True, None)
+        if state == self._use_lod:
+            return False
+        self._use_lod = state
+        return True
+
+    def lod_mode(self):
+        return self._use_lod
+
+    def _special_edges_mask(self, rows):
+        """ Edges colored by special or midline colors in face texture """
+        image_data = self._special_texture
+        if image_data is None or len(rows) == 0:
+            return np.zeros(len(rows), dtype=bool)
+        h, w = image_data.shape[:2]
+        uvs = np.asarray(self._edges_uvs, dtype=np.float32)
+        mid_uvs = np.clip((uvs[rows * 2] + uvs[rows * 2 + 1]) * 0.5, 0, 1)
+        cols = image_data[(mid_uvs[:, 1] * (h - 1)).astype(np.int32),
+                          (mid_uvs[:, 0] * (w - 1)).astype(np.int32), :3]
+        main_color = np.array(self._colors[0][:3], dtype=np.float32)
+        return np.abs(cols - main_color).max(axis=1) > \
+            Config.wireframe_lod_color_tolerance
+
+    def _decimated_edges(self):
+        """ Border, special and midline edges are always kept,
+            the rest is subsampled uniformly up to LOD ratio """
+        edges = np.sort(self._edges_indices, axis=1)
+        _, rows, counts = np.unique(edges, axis=0, return_index=True,
+                                    return_counts=True)
+        keep = counts == 1  # Border edges belong to one face only
+        keep |= self._special_edges_mask(rows)
+        rest = np.flatnonzero(~keep)
+        extra = int(len(rows) * self._lod_ratio) - np.count_nonzero(keep)
+        if extra > 0 and len(rest) > 0:
+            keep[rest[np.linspace(0, len(rest) - 1,
+                                  min(extra, len(rest))).astype(np.int32)]] \
+                = True
+        rows = np.sort(rows[keep])
+        uv_rows = np.column_stack((rows * 2, rows * 2 + 1)).ravel()
+        return self._edges_indices[rows], \
+            np.asarray(self._edges_uvs, dtype=np.float32)[uv_rows]
+
+    def _active_edges(self):
+        if not self._use_lod or len(self._edges_indices) == 0:
+            return self._edges_indices, self._edges_uvs
+        if self._lod_edges is None:
+            self._lod_edges = self._decimated_edges()
+        return self._lod_edges
+
+    def _init_line_buffers(self):
+        edges_indices, edges_uvs = self._active_edges()
+        if len(edges_indices) == 0:
+            return None
+        edges_ibo = gpu.types.GPUIndexBuf(
+            type='LINES', seq=edges_indices.astype(np.int32))
+        # Textured lines need a point per (vertex, uv) pair because of seams
+        pairs = np.column_stack((edges_indices.ravel(),
+                                 edges_uvs)).astype(np.float32)
+        unique_pairs, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        line_points = unique_pairs[:, 0].astype(np.int32)
+        line_uv_vbo = self._vertex_buffer(
+            'texCoord', np.ascontiguousarray(unique_pairs[:, 1:]))
+        line_ibo = gpu.types.GPUIndexBuf(
+            type='LINES', seq=inverse.astype(np.int32).reshape((-1, 2)))
+        return edges_ibo, line_points, line_uv_vbo, line_ibo
+
+    def _create_persistent_batches(self):
+        """ Index and UV buffers are reused, only positions are uploaded """
+        if self._fill_ibo is None:
+            self._fill_ibo = gpu.types.GPUIndexBuf(
+                type='TRIS', seq=np.asarray(self.indices, dtype=np.int32))
+        if self._use_lod not in self._line_buffers:
+            self._line_buffers[self._use_lod] = self._init_line_buffers()
+        line_buffers = self._line_buffers[self._use_lod]
+
+        vertices = np.asarray(self.vertices, dtype=np.float32)
+        vbo = self._vertex_buffer('pos', vertices)
+        self.fill_batch = gpu.types.GPUBatch(type='TRIS', buf=vbo,
+                                             elem=self._fill_ibo)
+        if line_buffers is None:
+            self._create_line_batches()
             return
-        self.fill_batch = batch_for_shader(
-            self.fill_shader, 'TRIS',
-            {'pos': self.vertices},
-            indices=self.indices,
-        )
 
+        edges_ibo, line_points, line_uv_vbo, line_ibo = line_buffers
+        self.simple_line_batch = gpu.types.GPUBatch(
+            type='LINES', buf=vbo, elem=edges_ibo)
+        self.line_batch = gpu.types.GPUBatch(
+            type='LINES', buf=self._vertex_buffer(
+                'pos', vertices[line_points]),
+            elem=line_ibo)
+        self.line_batch.vertbuf_add(line_uv_vbo)
+
+    def _create_line_batches(self):
         self.simple_line_batch = batch_for_shader(
             self.simple_line_shader, 'LINES',
             {'pos': self.edges_vertices},
@@ -404,9 +540,23 @@ class FBRasterEdgeShader3D(FBEdgeShaderBase):
 
         self.line_batch = batch_for_shader(
             self.line_shader, 'LINES',
-            {'pos': self.edges_vertices, 'texCoord': self._edges_uvs}
+            {'pos': self.edges_vertices, 'texCoord': self._active_edges()[1]}
         )
 
+    @traced('create_batch.wireframe')
+    def create_batches(self):
+        if bpy.app.background:
+            return
+        if Config.wireframe_persistent_buffers:
+            self._create_persistent_batches()
+            return
+        self.fill_batch = batch_for_shader(
+            self.fill_shader, 'TRIS',
+            {'pos': self.vertices},
+            indices=self.indices,
+        )
+        self._create_line_batches()
+
     def init_shaders(self):
         self.fill_shader = gpu.types.GPUShader(
             simple_fill_vertex_shader(), black_fill_fragment_shader())
@@ -417,13 +567,10 @@ class FBRasterEdgeShader3D(FBEdgeShaderBase):
         self.simple_line_shader = gpu.shader.from_builtin('3D_UNIFORM_COLOR')
 
     def init_geom_data_from_fb(self, obj, fb, keyframe):
-        geom_verts = fb.applied_args_model_vertices_at(keyframe) @ \
-                     coords.xy_to_xz_rotation_matrix_3x3()
-        m = np.array(obj.matrix_world, dtype=np.float32).transpose()
-        vv = np.ones((len(geom_verts), 4), dtype=np.float32)
-        vv[:, :-1] = geom_verts
-        vv = vv @ m
-        self.vertices = vv[:, :3]
+        self.vertices = (fb.applied_args_model_vertices_at(keyframe) @
+                         coords.xy_to_xz_rotation_matrix_3x3()).astype(
+            np.float32, copy=False)
+        self._object_matrix = obj.matrix_world.copy()
 
     def init_geom_data_from_mesh(self, obj):
         mesh = obj.data
@@ -437,18 +584,16 @@ class FBRasterEdgeShader3D(FBEdgeShaderBase):
         mesh.loop_triangles.foreach_get(
             "vertices", np.reshape(indices, len(mesh.loop_triangles) * 3))
 
-        # Object matrix usage
-        m = np.array(obj.matrix_world, dtype=np.float32).transpose()
-        vv = np.ones((len(mesh.vertices), 4), dtype=np.float32)
-        vv[:, :-1] = verts
-        vv = vv @ m
-
-        self.vertices = vv[:, :3]  # Transformed vertices
+        self.vertices = verts
         self.indices = indices
+        self._object_matrix = obj.matrix_world.copy()
+        self._clear_topology_buffers()
 
     def _clear_edge_indices(self):
         self._edges_indices = np.array([], dtype=np.int)
         self._edges_uvs = []
+        self.edges_vertices = []
+        self._clear_topology_buffers()
 
     def init_edge_indices(self, builder):
         if not builder.face_texture_available():
@@ -479,7 +624,11 @@ class FBRasterEdgeShader3D(FBEdgeShaderBase):
 
         self._edges_indices = indices
         self._edges_uvs = tex_coords
+        self._clear_topology_buffers()
         self.update_edges_vertices()
 
     def update_edges_vertices(self):
-        self.edges_vertices = self.vertices[self._edges_indices.ravel()]
+        if Config.wireframe_persistent_buffers and \
+                len(self._edges_indices) > 0:
+            return  # Edges are drawn via index buffers
+        self.edges_vertices = self.vertices[self._active_edges()[0].ravel()]
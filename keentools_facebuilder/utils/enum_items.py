@@ -0,0 +1,65 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+
+import logging
+
+
+class FBEnumItemsCache:
+    """ Item lists for dynamic EnumProperty callbacks.
+        Blender calls item callbacks on every redraw and requires Python
+        to keep references to the returned strings, so every list is built
+        once per key and stored here until the key changes """
+    _items = {}
+    # Lists replaced by invalidate() are held until the next build,
+    # because Blender UI may still point to their strings
+    _retired = {}
+    _calls = {}
+    _builds = {}
+
+    @classmethod
+    def get(cls, name, key, build_func):
+        cls._calls[name] = cls._calls.get(name, 0) + 1
+        cached = cls._items.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        items = build_func()
+        cls._builds[name] = cls._builds.get(name, 0) + 1
+        if cached is not None:
+            cls._retired[name] = cached[1]
+        cls._items[name] = (key, items)
+        logger = logging.getLogger(__name__)
+        logger.debug('ENUM ITEMS BUILT: {} {}'.format(name, key))
+        return items
+
+    @classmethod
+    def invalidate(cls):
+        for name, (_, items) in cls._items.items():
+            cls._retired[name] = items
+        cls._items = {}
+
+    @classmethod
+    def stats(cls):
+        """ {name: (callback calls, item list builds)} """
+        return {name: (calls, cls._builds.get(name, 0))
+                for name, calls in cls._calls.items()}
+
+    @classmethod
+    def reset_stats(cls):
+        cls._calls = {}
+        cls._builds = {}
@@ -24,6 +24,7 @@ from ..blender_independent_packages.exifread import \
     DEFAULT_STOP_TAG, FIELD_TYPES
 
 from ..config import Config, get_main_settings
+from .tracing import traced
 
 
 # Convert frac record like '16384/32768' to float 0.5
@@ -324,6 +325,7 @@ def reload_all_camera_exif(headnum):
             read_exif_to_camera(headnum, i, filepath)
 
 
+@traced('read_exif')
 def read_exif_to_camera(headnum, camnum, filepath):
     settings = get_main_settings()
     camera = settings.get_camera(headnum, camnum)
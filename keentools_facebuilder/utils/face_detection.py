@@ -0,0 +1,231 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+import copy
+import logging
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import bpy
+
+from ..config import Config
+from .tracing import traced
+
+
+class FBDetectionCache:
+    """ Downscaled working images and detect_faces results.
+        Working images are keyed by cheap bpy.types.Image identity
+        and file version, detection results by working image digest
+        and orientation. Cached faces keep working image coordinates
+        and are never changed, callers get scaled copies """
+    _max_working_images = 8
+    _max_faces = 64
+    _working_images = {}
+    _faces = {}
+    _hits = 0
+    _misses = 0
+
+    @classmethod
+    def get_working_image(cls, key):
+        return cls._working_images.get(key)
+
+    @classmethod
+    def put_working_image(cls, key, value):
+        if len(cls._working_images) >= cls._max_working_images:
+            cls._working_images = {}
+        cls._working_images[key] = value
+
+    @classmethod
+    def get_faces(cls, key):
+        faces = cls._faces.get(key)
+        if faces is None:
+            cls._misses += 1
+        else:
+            cls._hits += 1
+        return faces
+
+    @classmethod
+    def put_faces(cls, key, faces):
+        if len(cls._faces) >= cls._max_faces:
+            cls._faces = {}
+        cls._faces[key] = faces
+
+    @classmethod
+    def stats(cls):
+        return cls._hits, cls._misses
+
+    @classmethod
+    def clear(cls):
+        cls._working_images = {}
+        cls._faces = {}
+        cls._hits = 0
+        cls._misses = 0
+
+
+def _image_version(image):
+    """ Changes when the image file is edited or replaced on disk """
+    if image.packed_file is not None:
+        return 'packed', image.packed_file.size
+    try:
+        return os.path.getmtime(
+            bpy.path.abspath(image.filepath, library=image.library))
+    except (OSError, ValueError):
+        return None
+
+
+def _image_key(image):
+    if image.is_dirty:  # Pixels can be changed in Blender without any trace
+        return None
+    return image.name, image.filepath, tuple(image.size), \
+        _image_version(image)
+
+
+def _read_pixels(image):
+    w, h = image.size
+    buf = np.empty(w * h * 4, dtype=np.float32)
+    try:
+        image.pixels.foreach_get(buf)  # Much faster but Blender 2.83+ only
+    except (AttributeError, TypeError):
+        buf[:] = image.pixels[:]
+    return buf.reshape((h, w, 4))
+
+
+def _downscale(img, factor):
+    if factor <= 1:
+        return img
+    h, w, channels = img.shape
+    h2 = h // factor
+    w2 = w // factor
+    return img[:h2 * factor, :w2 * factor].reshape(
+        (h2, factor, w2, factor, channels)).mean(axis=(1, 3), dtype=np.float32)
+
+
+def _downscale_factor(w, h):
+    max_size = Config.face_detection_max_image_size
+    if max_size <= 0:
+        return 1
+    return max(1, int(np.ceil(max(w, h) / max_size)))
+
+
+def _process_pixels(pixels, factor):
+    img = np.ascontiguousarray(_downscale(pixels, factor))
+    digest = hashlib.sha1(img.tobytes()).hexdigest()
+    return img, factor, digest
+
+
+def _working_image(image):
+    """ Unrotated downscaled image, its downscale factor and digest """
+    key = _image_key(image)
+    cached = FBDetectionCache.get_working_image(key) if key else None
+    if cached is not None:
+        return cached
+
+    w, h = image.size
+    result = _process_pixels(_read_pixels(image), _downscale_factor(w, h))
+    if key:
+        FBDetectionCache.put_working_image(key, result)
+    return result
+
+
+def prepare_working_images(images):
+    """ Working images for many images at once, None for bad images.
+        Pixels are read in the calling thread (bpy is not thread-safe),
+        downscaling and hashing are done in a thread pool """
+    results = [None] * len(images)
+    jobs = []
+    for i, image in enumerate(images):
+        if image is None or image.size[0] <= 0 or image.size[1] <= 0:
+            continue
+        key = _image_key(image)
+        cached = FBDetectionCache.get_working_image(key) if key else None
+        if cached is not None:
+            results[i] = cached
+            continue
+        w, h = image.size
+        jobs.append((i, key, _read_pixels(image), _downscale_factor(w, h)))
+
+    if len(jobs) == 0:
+        return results
+    workers = min(len(jobs), Config.face_detection_threads)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        processed = executor.map(lambda job: _process_pixels(job[2], job[3]),
+                                 jobs)
+        for job, result in zip(jobs, processed):
+            results[job[0]] = result
+            if job[1]:
+                FBDetectionCache.put_working_image(job[1], result)
+    return results
+
+
+def _with_rects(faces):
+    return [(face, (tuple(face.xy_min), tuple(face.xy_max)))
+            for face in faces]
+
+
+def _scaled_faces(faces, factor):
+    """ Faces with rectangles in full resolution, None if rectangles
+        can not be changed. Cached faces are kept intact """
+    if factor == 1:
+        return [face for face, _ in faces]
+    result = []
+    for face, (xy_min, xy_max) in faces:
+        try:
+            scaled = copy.copy(face)
+        except Exception:
+            # Not copyable, coordinates are always set from the
+            # cached ones, so they are never scaled twice
+            scaled = face
+        try:
+            scaled.xy_min = tuple(x * factor for x in xy_min)
+            scaled.xy_max = tuple(x * factor for x in xy_max)
+        except (AttributeError, TypeError):
+            return None
+        result.append(scaled)
+    return result
+
+
+@traced('detect_faces')
+def detect_faces(fb, camera, working_image=None):
+    """ Cached replacement for fb.detect_faces(camera.np_image()).
+        Rectangles are returned in full resolution oriented image space.
+        working_image can be taken from prepare_working_images """
+    logger = logging.getLogger(__name__)
+    if working_image is None:
+        image = camera.cam_image
+        if image is None or image.size[0] <= 0 or image.size[1] <= 0:
+            return None
+        working_image = _working_image(image)
+
+    img, factor, digest = working_image
+    key = (digest, camera.orientation % 4)
+    cached = FBDetectionCache.get_faces(key)
+    if cached is not None:
+        logger.debug('detect_faces cache hit: {}'.format(key))
+        return _scaled_faces(cached[1], cached[0])
+
+    faces = _with_rects(fb.detect_faces(np.rot90(img, camera.orientation)))
+    result = _scaled_faces(faces, factor)
+    if result is None:
+        logger.debug('detect_faces full resolution fallback')
+        factor = 1
+        faces = _with_rects(fb.detect_faces(camera.np_image()))
+        result = _scaled_faces(faces, factor)
+
+    FBDetectionCache.put_faces(key, (factor, faces))
+    return result
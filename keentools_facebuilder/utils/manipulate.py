@@ -151,6 +151,8 @@ def get_obj_from_context(context, force_fbloader=True):
 
 
 def force_undo_push(msg='KeenTools operation'):
+    # Undo step has to contain actual serial string
+    FBLoader.flush_deferred_save()
     inc_operation()
     bpy.ops.ed.undo_push(message=msg)
 
@@ -367,6 +369,8 @@ def reconstruct_by_head():
                 bpy.data.objects.remove(c.camobj, do_unlink=True)
             head.cameras.remove(i)
         settings.heads.remove(headnum)
+        from ..settings import FBObjectIndex
+        FBObjectIndex.invalidate()
         scene.render.resolution_x = rx
         scene.render.resolution_y = ry
         logger.info("SCENE PARAMETERS RESTORED")
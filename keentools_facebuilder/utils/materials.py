@@ -23,6 +23,7 @@ import numpy as np
 from .. config import Config, get_main_settings
 from .. fbloader import FBLoader
 from ..blender_independent_packages.pykeentools_loader import module as pkt_module
+from ..utils.tracing import traced
 from ..utils.images import find_bpy_image_by_name
 
 
@@ -165,6 +166,7 @@ def _create_frame_data_loader(settings, head, camnums, fb):
     return frame_data_loader
 
 
+@traced('bake_tex')
 def bake_tex(headnum, tex_name):
     logger = logging.getLogger(__name__)
     settings = get_main_settings()
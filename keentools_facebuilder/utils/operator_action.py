@@ -153,6 +153,20 @@ def clear_animation(operator):
     return {'FINISHED'}
 
 
+def fbx_export_params():
+    return dict(use_selection=True,
+                bake_anim_use_all_actions=False,
+                bake_anim_use_nla_strips=False,
+                add_leaf_bones=False,
+                mesh_smooth_type='FACE',
+                # Default directions for axes in FBX
+                axis_forward='-Z',
+                axis_up='Y',
+                # Warning! Option marked as experimental in docs
+                # but we need it for same UX in UE4/Unity imports
+                bake_space_transform=True)
+
+
 def export_head_to_fbx(operator):
     logger = logging.getLogger(__name__)
     logger.debug('export_head_to_fbx call')
@@ -162,18 +176,7 @@ def export_head_to_fbx(operator):
         return {'CANCELLED'}
 
     manipulate.select_object_only(obj)
-    bpy.ops.export_scene.fbx('INVOKE_DEFAULT',
-                             use_selection=True,
-                             bake_anim_use_all_actions=False,
-                             bake_anim_use_nla_strips=False,
-                             add_leaf_bones=False,
-                             mesh_smooth_type='FACE',
-                             # Default directions for axes in FBX
-                             axis_forward='-Z',
-                             axis_up='Y',
-                             # Warning! Option marked as experimental in docs
-                             # but we need it for same UX in UE4/Unity imports
-                             bake_space_transform=True)
+    bpy.ops.export_scene.fbx('INVOKE_DEFAULT', **fbx_export_params())
     logger.debug('fbx operator called')
     return {'FINISHED'}
 
@@ -110,10 +110,11 @@ class FBTimer:
         return cls._active
 
     @classmethod
-    def _start(cls, callback, persistent=True):
+    def _start(cls, callback, persistent=True, first_interval=0.0):
         logger = logging.getLogger(__name__)
         cls._stop(callback)
-        bpy.app.timers.register(callback, persistent=persistent)
+        bpy.app.timers.register(callback, first_interval=first_interval,
+                                persistent=persistent)
         logger.debug("REGISTER TIMER")
         cls.set_active()
 
@@ -168,6 +169,23 @@ class FBStopShaderTimer(FBTimer):
         cls._stop(cls.check_pinmode)
 
 
+class FBDeferredSaveTimer(FBTimer):
+    """ Restarts on every start call, so the callback fires only once
+        after the last change in a burst """
+    _callback = None
+
+    @classmethod
+    def start(cls, callback, interval):
+        cls._callback = callback
+        cls._start(callback, persistent=False, first_interval=interval)
+
+    @classmethod
+    def stop(cls):
+        if cls._callback is not None:
+            cls._stop(cls._callback)
+        cls._callback = None
+
+
 class FBText:
     """ Text on screen output in Modal view"""
     # Test only
@@ -0,0 +1,118 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+
+import json
+import logging
+import time
+
+import bpy
+
+from ..config import Config
+from . import coords
+
+
+class FBPinSessionRecorder:
+    """ Records pin drags of one head for replaying them later
+        (see benchmark.py). Coordinates are stored in image space,
+        so sessions do not depend on the viewport size """
+    ADD_PIN = 'add_pin'
+    MOUSE_MOVE = 'mouse_move'
+    MOUSE_RELEASE = 'mouse_release'
+
+    _active = False
+    _session = None
+    _start_time = 0.0
+
+    @classmethod
+    def is_active(cls):
+        return cls._active
+
+    @classmethod
+    def start(cls):
+        logger = logging.getLogger(__name__)
+        logger.info('PIN SESSION RECORDING STARTED')
+        cls._session = None
+        cls._start_time = time.perf_counter()
+        cls._active = True
+
+    @classmethod
+    def stop(cls):
+        logger = logging.getLogger(__name__)
+        logger.info('PIN SESSION RECORDING STOPPED: {} events'.format(
+            cls.events_count()))
+        cls._active = False
+
+    @classmethod
+    def session(cls):
+        return cls._session
+
+    @classmethod
+    def events_count(cls):
+        return 0 if cls._session is None else len(cls._session['events'])
+
+    @classmethod
+    def _new_session(cls, head):
+        """ Head state is taken before the first recorded event """
+        from ..fbloader import FBLoader  # Circular import otherwise
+        FBLoader.flush_deferred_save()
+        return {'format': Config.pin_session_format,
+                'version': Config.pin_session_version,
+                'addon_version': Config.addon_version,
+                'blend_file': bpy.data.filepath,
+                'head': head.headobj.name,
+                'model_type': head.model_type,
+                'serial_str': head.get_serial_str(),
+                'events': []}
+
+    @classmethod
+    def record(cls, action, head, camnum, mouse_x, mouse_y, context):
+        if not cls._active:
+            return
+        x, y = coords.get_image_space_coord(mouse_x, mouse_y, context)
+        if cls._session is None:
+            cls._session = cls._new_session(head)
+        elif cls._session['head'] != head.headobj.name:
+            logger = logging.getLogger(__name__)
+            logger.debug('PIN SESSION SKIPS OTHER HEAD: {}'.format(
+                head.headobj.name))
+            return
+        cls._session['events'].append(
+            [round(time.perf_counter() - cls._start_time, 4), action,
+             camnum, round(x, 6), round(y, 6)])
+
+    @classmethod
+    def save(cls, filepath):
+        if cls._session is None:
+            raise ValueError('No pin session has been recorded')
+        save_session(cls._session, filepath)
+
+
+def save_session(session, filepath):
+    with open(filepath, 'w') as f:
+        json.dump(session, f, separators=(',', ':'))
+
+
+def load_session(filepath):
+    with open(filepath) as f:
+        session = json.load(f)
+    if session.get('format') != Config.pin_session_format:
+        raise ValueError('Not a pin session file: {}'.format(filepath))
+    if session.get('version', 0) > Config.pin_session_version:
+        raise ValueError('Unsupported pin session version: {}'.format(
+            session.get('version')))
+    return session
@@ -25,12 +25,13 @@ from .shaders import (flat_color_3d_vertex_shader,
                       flat_color_2d_vertex_shader)
 from ..config import Config
 from ..preferences.user_preferences import UserPreferences
+from .tracing import traced
 
 
 class FBShaderPoints:
     """ Base class for Point Drawing Shaders """
     _is_visible = True
-    _point_size = UserPreferences.get_value('pin_size', UserPreferences.type_float)
+    _point_size = None  # Read from user preferences on first draw
 
     # Store all draw handlers registered by class objects
     handler_list = []
@@ -71,6 +72,17 @@ class FBShaderPoints:
     def set_point_size(cls, ps):
         cls._point_size = ps
 
+    @classmethod
+    def default_point_size(cls):
+        return UserPreferences.get_value('pin_size', UserPreferences.type_float)
+
+    @classmethod
+    def get_point_size(cls):
+        if cls._point_size is None:
+            cls.set_point_size(cls.default_point_size())
+        return cls._point_size
+
+    @traced('create_batch.points')
     def _create_batch(self, vertices, vertices_colors,
                       shadername='2D_FLAT_COLOR'):
         if bpy.app.background:
@@ -145,7 +157,7 @@ class FBShaderPoints:
             return
 
         if self.shader is not None:
-            bgl.glPointSize(self._point_size)
+            bgl.glPointSize(self.get_point_size())
             bgl.glEnable(bgl.GL_BLEND)
             self.shader.bind()
             self.batch.draw(self.shader)
@@ -178,8 +190,6 @@ class FBPoints3D(FBShaderPoints):
         # 3D_FLAT_COLOR
         self._create_batch(self.vertices, self.vertices_colors, 'CUSTOM_3D')
 
-    def __init__(self):
-        super().__init__()
-        self.set_point_size(
-            UserPreferences.get_value('pin_size', UserPreferences.type_float) *
-            Config.surf_pin_size_scale)
+    @classmethod
+    def default_point_size(cls):
+        return super().default_point_size() * Config.surf_pin_size_scale
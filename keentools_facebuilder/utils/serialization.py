@@ -0,0 +1,79 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+
+import base64
+import time
+import zlib
+
+from ..config import Config
+
+
+# Version header of compressed serial strings. Strings without it are
+# treated as raw fb.serialize() output of previous addon versions
+_COMPRESSED_HEADER_V1 = 'ktz1:'
+
+
+def is_compressed_serial_str(serial_str):
+    return serial_str.startswith(_COMPRESSED_HEADER_V1)
+
+
+def compress_serial_str(serial_str):
+    if serial_str == '' or is_compressed_serial_str(serial_str):
+        return serial_str
+    packed = zlib.compress(serial_str.encode('utf-8'),
+                           Config.serial_str_compression_level)
+    return _COMPRESSED_HEADER_V1 + base64.b64encode(packed).decode('ascii')
+
+
+def decompress_serial_str(serial_str):
+    if not is_compressed_serial_str(serial_str):
+        return serial_str
+    packed = base64.b64decode(serial_str[len(_COMPRESSED_HEADER_V1):])
+    return zlib.decompress(packed).decode('utf-8')
+
+
+def encode_serial_str(serial_str):
+    if Config.compress_serial_str:
+        return compress_serial_str(serial_str)
+    return decompress_serial_str(serial_str)
+
+
+def serial_str_report(serial_strings):
+    """ Size and timing statistics for a set of raw serial strings """
+    raw_size = 0
+    compressed_size = 0
+    compress_time = 0.0
+    decompress_time = 0.0
+    for serial_str in serial_strings:
+        start = time.perf_counter()
+        compressed = compress_serial_str(serial_str)
+        compress_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        decompress_serial_str(compressed)
+        decompress_time += time.perf_counter() - start
+
+        raw_size += len(serial_str)
+        compressed_size += len(compressed)
+
+    return {'count': len(serial_strings),
+            'raw_size': raw_size,
+            'compressed_size': compressed_size,
+            'ratio': compressed_size / raw_size if raw_size > 0 else 1.0,
+            'compress_time': compress_time,
+            'decompress_time': decompress_time}
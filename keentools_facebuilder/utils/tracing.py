@@ -0,0 +1,199 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from functools import wraps
+
+from ..config import Config
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        FBTracer.add_event(self.name, self.start,
+                           time.perf_counter() - self.start, self.args)
+        return False
+
+
+class FBTracer:
+    """ Runtime switchable latency tracing.
+        When disabled span() returns a shared no-op object
+        and traced() functions pay only one flag check """
+    _enabled = False
+    _origin = time.perf_counter()
+    _events = deque(maxlen=Config.tracing_max_events)
+    _durations = {}
+
+    @classmethod
+    def is_enabled(cls):
+        return cls._enabled
+
+    @classmethod
+    def enable(cls, flag=True):
+        logger = logging.getLogger(__name__)
+        logger.info('TRACING {}'.format('ON' if flag else 'OFF'))
+        cls._enabled = flag
+
+    @classmethod
+    def clear(cls):
+        cls._events.clear()
+        cls._durations = {}
+
+    @classmethod
+    def span(cls, name, **args):
+        if not cls._enabled:
+            return _NULL_SPAN
+        return _Span(name, args)
+
+    @classmethod
+    def add_event(cls, name, start, duration, args=None):
+        cls._events.append((name, start, duration,
+                            threading.get_ident(), args))
+        samples = cls._durations.get(name)
+        if samples is None:
+            samples = deque(maxlen=Config.tracing_max_samples)
+            cls._durations[name] = samples
+        samples.append(duration)
+
+    @classmethod
+    def events(cls):
+        return list(cls._events)
+
+    @classmethod
+    def stats(cls):
+        """ {name: {'count', 'p50', 'p95', 'max'}} in seconds """
+        def _percentile(sorted_values, p):
+            index = int(round(p * (len(sorted_values) - 1)))
+            return sorted_values[index]
+
+        res = {}
+        for name, samples in list(cls._durations.items()):
+            values = sorted(samples)
+            if len(values) == 0:
+                continue
+            res[name] = {'count': len(values),
+                         'p50': _percentile(values, 0.5),
+                         'p95': _percentile(values, 0.95),
+                         'max': values[-1]}
+        return res
+
+    @classmethod
+    def to_json(cls):
+        return {'stats': cls.stats(),
+                'events': [{'name': name,
+                            'start': start - cls._origin,
+                            'duration': duration,
+                            'thread': tid,
+                            'args': args or {}}
+                           for name, start, duration, tid, args
+                           in cls.events()]}
+
+    @classmethod
+    def to_chrome_trace(cls):
+        """ Trace Event Format, opens in chrome://tracing and Perfetto """
+        pid = os.getpid()
+        return {'traceEvents': [{'name': name,
+                                 'cat': Config.prefix,
+                                 'ph': 'X',
+                                 'ts': (start - cls._origin) * 1e6,
+                                 'dur': duration * 1e6,
+                                 'pid': pid,
+                                 'tid': tid,
+                                 'args': args or {}}
+                                for name, start, duration, tid, args
+                                in cls.events()],
+                'displayTimeUnit': 'ms'}
+
+    @classmethod
+    def export(cls, filepath, trace_format='CHROME'):
+        data = cls.to_chrome_trace() if trace_format == 'CHROME' \
+            else cls.to_json()
+        with open(filepath, 'w') as f:
+            json.dump(data, f, default=str)
+        logger = logging.getLogger(__name__)
+        logger.info('TRACE EXPORTED: {} events to {}'.format(
+            len(cls._events), filepath))
+
+
+def traced(name):
+    """ Decorator recording every call of a function as a span.
+        Not for operator methods, see traced_operator_method """
+    def _decorator(func):
+        @wraps(func)
+        def _wrapper(*args, **kwargs):
+            if not FBTracer._enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                FBTracer.add_event(name, start, time.perf_counter() - start)
+        return _wrapper
+    return _decorator
+
+
+def traced_operator_method(name):
+    """ traced for operator execute/invoke/modal. Blender checks argument
+        count of these methods on class registration, so the wrapper
+        keeps the fixed signature of the decorated one """
+    def _decorator(func):
+        def _call(args):
+            if not FBTracer._enabled:
+                return func(*args)
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                FBTracer.add_event(name, start, time.perf_counter() - start)
+
+        if func.__code__.co_argcount == 2:
+            @wraps(func)
+            def _wrapper(self, context):
+                return _call((self, context))
+        else:
+            @wraps(func)
+            def _wrapper(self, context, event):
+                return _call((self, context, event))
+        return _wrapper
+    return _decorator
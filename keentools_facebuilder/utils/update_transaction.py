@@ -0,0 +1,92 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+# KeenTools for blender is a blender addon for using KeenTools in Blender.
+# Copyright (C) 2019  KeenTools
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ##### END GPL LICENSE BLOCK #####
+
+import logging
+from contextlib import contextmanager
+
+
+class FBUpdateTransaction:
+    """ Collapses property update callbacks into one deferred flush.
+        Work deferred inside a transaction is deduplicated by key and
+        performed stage by stage when the outermost transaction ends.
+        Work deferred during the flush joins the same flush """
+    STAGE_MESH = 0
+    STAGE_SCALE = 1
+    STAGE_FOCAL = 2
+    STAGE_SAVE = 3
+
+    _depth = 0
+    _pending = {}  # key -> (stage, func)
+    _deferred = 0
+    _collapsed = 0
+    _flushes = 0
+
+    @classmethod
+    def is_active(cls):
+        return cls._depth > 0
+
+    @classmethod
+    @contextmanager
+    def begin(cls):
+        cls._depth += 1
+        try:
+            yield
+        finally:
+            cls._depth -= 1
+            if cls._depth == 0:
+                cls._flush()
+
+    @classmethod
+    def defer(cls, stage, key, func):
+        """ The latest func wins for the same key """
+        cls._deferred += 1
+        if key in cls._pending:
+            cls._collapsed += 1
+        cls._pending[key] = (stage, func)
+
+    @classmethod
+    def _flush(cls):
+        logger = logging.getLogger(__name__)
+        cls._depth += 1
+        try:
+            while len(cls._pending) > 0:
+                stage = min(item[0] for item in cls._pending.values())
+                keys = [key for key, item in cls._pending.items()
+                        if item[0] == stage]
+                for key in keys:
+                    _, func = cls._pending.pop(key)
+                    try:
+                        func()
+                    except Exception as err:
+                        logger.error('UPDATE TRANSACTION {}: {}'.format(
+                            key, str(err)))
+        finally:
+            cls._pending = {}
+            cls._depth -= 1
+        cls._flushes += 1
+
+    @classmethod
+    def stats(cls):
+        return {'deferred': cls._deferred, 'collapsed': cls._collapsed,
+                'flushes': cls._flushes}
+
+    @classmethod
+    def reset_stats(cls):
+        cls._deferred = 0
+        cls._collapsed = 0
+        cls._flushes = 0
@@ -15,7 +15,6 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 # ##### END GPL LICENSE BLOCK #####
-import cProfile
 import bpy
 
 import numpy as np
@@ -72,13 +71,6 @@ class FBScreenPins:
 
 
 class FBViewport:
-    profiling = False
-    # --- PROFILING ---
-    if profiling:
-        pr = cProfile.Profile()
-        pr.disable()
-    # --- PROFILING ---
-
     # Current View Pins draw
     _points2d = FBPoints2D()
     # Rectangles for Face picking
@@ -101,8 +93,7 @@ class FBViewport:
     def pins(cls):
         return cls._pins
 
-    POINT_SENSITIVITY = UserPreferences.get_value('pin_sensitivity',
-                                                  UserPreferences.type_float)
+    POINT_SENSITIVITY = None  # Read from user preferences on first use
     PIXEL_SIZE = 0.1  # Auto Calculated
 
     @classmethod
@@ -134,13 +125,20 @@ class FBViewport:
         ps = coords.get_pixel_relative_size(context)
         cls.PIXEL_SIZE = ps
 
+    @classmethod
+    def point_sensitivity(cls):
+        if cls.POINT_SENSITIVITY is None:
+            cls.POINT_SENSITIVITY = UserPreferences.get_value(
+                'pin_sensitivity', UserPreferences.type_float)
+        return cls.POINT_SENSITIVITY
+
     @classmethod
     def tolerance_dist(cls):  # distance * sensitivity
-        return cls.POINT_SENSITIVITY * cls.PIXEL_SIZE
+        return cls.point_sensitivity() * cls.PIXEL_SIZE
 
     @classmethod
     def tolerance_dist2(cls):  # squared distance
-        return (cls.POINT_SENSITIVITY * cls.PIXEL_SIZE)**2
+        return (cls.point_sensitivity() * cls.PIXEL_SIZE)**2
 
     @classmethod
     def in_pin_drag(cls):
@@ -210,6 +208,24 @@ class FBViewport:
                                      settings.wireframe_opacity)
         cls.wireframer().create_batches()
 
+    @classmethod
+    def update_wireframe_lod(cls, lod=None):
+        """ Decimated wireframe while a pin is dragged, full one otherwise.
+            Batches are rebuilt here only on return to full wireframe """
+        wf = cls.wireframer()
+        if lod is None:
+            lod = cls.in_pin_drag()
+        if lod == wf.lod_mode():
+            return False
+        ratio = UserPreferences.get_value(
+            'wireframe_lod_ratio', UserPreferences.type_float) if lod else 1.0
+        if not wf.set_lod_mode(lod, ratio):
+            return False
+        if not lod:
+            wf.update_edges_vertices()
+            wf.create_batches()
+        return True
+
     @classmethod
     def update_pin_sensitivity(cls):
         settings = get_main_settings()
@@ -274,18 +290,14 @@ class FBViewport:
             vertex_colors.append((1.0, 0.0, 1.0, 0.2))  # left camera corner
             vertex_colors.append((1.0, 0, 1.0, 0.2))  # right camera corner
 
-        points = cls.pins().arr().copy()
-
         scene = context.scene
         rx = scene.render.resolution_x
         ry = scene.render.resolution_y
         asp = ry / rx
 
         x1, y1, x2, y2 = coords.get_camera_border(context)
-
-        for i, p in enumerate(points):
-            x, y = coords.image_space_to_region(p[0], p[1], x1, y1, x2, y2)
-            points[i] = (x, y)
+        points = coords.FBViewGeometry.image_space_to_region_array(
+            context, cls.pins().arr()).tolist()
 
         vertex_colors = [Config.pin_color for _ in range(len(points))]
 
@@ -310,8 +322,6 @@ class FBViewport:
         rx = scene.render.resolution_x
         ry = scene.render.resolution_y
 
-        x1, y1, x2, y2 = coords.get_camera_border(context)
-
         p2d = cls.img_points(fb, keyframe)
         p3d = cls.points3d().get_vertices()
 
@@ -347,17 +357,16 @@ class FBViewport:
         vv = vv @ transform
         vv = (vv.T / vv[:, 3]).T
 
-        verts2 = []
-        for i, v in enumerate(vv):
-            x, y = coords.frame_to_image_space(v[0], v[1], rx, ry)
-            verts2.append(coords.image_space_to_region(x, y,
-                                                       x1, y1, x2, y2))
-            wire.edge_lengths.append(0)
-            verts2.append(coords.image_space_to_region(p2d[i][0], p2d[i][1],
-                                                       x1, y1, x2, y2))
-            # length = np.linalg.norm((v[0]-p2d[i][0], v[1]-p2d[i][1]))
-            length = 22.0
-            wire.edge_lengths.append(length)
+        # Projected points and pins interleaved, both in image space
+        points = np.empty((len(vv) * 2, 2), dtype=np.float32)
+        points[0::2, 0] = vv[:, 0] / rx - 0.5
+        points[0::2, 1] = (vv[:, 1] - 0.5 * ry) / rx
+        points[1::2] = p2d
+        verts2 = coords.FBViewGeometry.image_space_to_region_array(
+            context, points).tolist()
+        # length = np.linalg.norm((v[0]-p2d[i][0], v[1]-p2d[i][1]))
+        length = 22.0
+        wire.edge_lengths = [0, length] * len(vv)
 
         wire.vertices = verts2
         wire.vertices_colors = np.full((len(verts2), 4),
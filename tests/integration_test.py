@@ -6,7 +6,11 @@
 import unittest
 import sys
 import os
+import shutil
 import logging
+import time
+import json
+import subprocess
 import numpy as np
 
 import bpy
@@ -17,9 +21,23 @@ import test_utils
 
 from keentools_facebuilder.settings import model_type_callback, uv_items_callback
 from keentools_facebuilder.utils import coords, materials
+from keentools_facebuilder.utils.serialization import (
+    serial_str_report, is_compressed_serial_str)
 from keentools_facebuilder.config import Config, get_main_settings, get_operator
 from keentools_facebuilder.fbloader import FBLoader
-from keentools_facebuilder.pick_operator import reset_detected_faces, get_detected_faces
+from keentools_facebuilder.pick_operator import (
+    reset_detected_faces, get_detected_faces, auto_pin_cameras, AutoPinStatus)
+from keentools_facebuilder.utils.face_detection import FBDetectionCache
+from keentools_facebuilder.utils.enum_items import FBEnumItemsCache
+from keentools_facebuilder.utils.tracing import FBTracer
+from keentools_facebuilder.utils.drag_scheduler import FBDragScheduler
+from keentools_facebuilder.utils.update_transaction import FBUpdateTransaction
+from keentools_facebuilder.async_solver import FBAsyncSolver
+from keentools_facebuilder.utils.pin_session import (FBPinSessionRecorder,
+                                                     load_session)
+from keentools_facebuilder import batch, benchmark
+import keentools_facebuilder
+from keentools_facebuilder.preferences.user_preferences import UserPreferences
 
 
 class TestConfig:
@@ -28,6 +46,9 @@ class TestConfig:
     faces_on_test_render = 3
     skip_heavy_tests_flag = False
     heavy_tests = ('test_uv_switch', 'test_models_and_parts')
+    # Seconds for `import keentools_facebuilder` + register() in a fresh
+    # Blender process
+    addon_startup_budget = 1.5
 
     @classmethod
     def skip_this_test(cls, name):
@@ -49,6 +70,60 @@ def _get_models():
     return [x[0] for x in model_type_callback(None, None)]
 
 
+_STARTUP_MARKER = '@@addon_startup@@ '
+_STARTUP_SCRIPT = """
+import sys, time, json
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import keentools_facebuilder
+imported = time.perf_counter()
+keentools_facebuilder.register()
+registered = time.perf_counter()
+print({marker!r} + json.dumps({{
+    'import': imported - start,
+    'register': registered - imported,
+    'pykeentools_loaded': 'pykeentools' in sys.modules}}), flush=True)
+"""
+
+
+def _parse_importtime(stderr):
+    """ Parse `python -X importtime` output into {module: cumulative_us} """
+    res = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            res[parts[2].strip()] = int(parts[1])
+        except ValueError:
+            pass
+    return res
+
+
+def _measure_addon_startup():
+    """ Import and register the addon in a separate background Blender
+        with import time profiling enabled """
+    addon_dir = os.path.dirname(os.path.dirname(
+        os.path.abspath(keentools_facebuilder.__file__)))
+    script = _STARTUP_SCRIPT.format(path=addon_dir, marker=_STARTUP_MARKER)
+    env = os.environ.copy()
+    env['PYTHONPROFILEIMPORTTIME'] = '1'
+    proc = subprocess.run(
+        [bpy.app.binary_path, '-b', '--factory-startup',
+         '--python-use-system-env', '--python-exit-code', '1',
+         '--python-expr', script],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, env=env)
+    lines = [x for x in proc.stdout.splitlines()
+             if x.startswith(_STARTUP_MARKER)]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError('Addon startup failed: {}'.format(proc.stderr))
+    return json.loads(lines[-1][len(_STARTUP_MARKER):]), \
+        _parse_importtime(proc.stderr)
+
+
 class FaceBuilderTest(unittest.TestCase):
 
     def _head_and_cameras(self):
@@ -110,6 +185,199 @@ class FaceBuilderTest(unittest.TestCase):
         test_utils.new_scene()
         self._head_cams_and_pins()
 
+    def test_deferred_save(self):
+        test_utils.new_scene()
+        self._head_cams_and_pins()
+        settings = get_main_settings()
+        headnum = settings.get_last_headnum()
+        camnum = settings.get_last_camnum(headnum)
+        head = settings.get_head(headnum)
+        serial_before = head.get_serial_str()
+
+        FBLoader.load_model(headnum)
+        fb = FBLoader.get_builder()
+        fb.remove_pins(head.get_keyframe(camnum))
+        FBLoader.save_deferred(headnum)
+        self.assertTrue(FBLoader.has_deferred_save())
+        self.assertEqual(serial_before, head.get_serial_str())
+
+        self.assertTrue(FBLoader.flush_deferred_save())
+        self.assertFalse(FBLoader.has_deferred_save())
+        self.assertNotEqual(serial_before, head.get_serial_str())
+
+    def test_deferred_save_on_file_load(self):
+        test_utils.new_scene()
+        self._head_cams_and_pins()
+        settings = get_main_settings()
+        headnum = settings.get_last_headnum()
+        FBLoader.load_model(headnum)
+        FBLoader.save_deferred(headnum)
+        self.assertTrue(FBLoader.has_deferred_save())
+
+        # Pending save must not reach heads of another file
+        bpy.ops.wm.read_homefile(use_empty=True)
+        self.assertFalse(FBLoader.has_deferred_save())
+        self.assertFalse(FBLoader.flush_deferred_save())
+
+    def test_model_mat_bulk_read(self):
+        logger = logging.getLogger(__name__)
+        test_utils.new_scene()
+        test_utils.create_head()
+        settings = get_main_settings()
+        headnum = settings.get_last_headnum()
+        head = settings.get_head(headnum)
+        cameras_count = 100
+        for _ in range(cameras_count):
+            test_utils.create_empty_camera(headnum)
+        self.assertEqual(cameras_count, len(head.cameras))
+
+        matrices = [np.random.rand(4, 4).astype(np.float32)
+                    for _ in range(cameras_count)]
+        hex_strings = []
+        for camera, mat in zip(head.cameras, matrices):
+            camera.set_model_mat(mat)
+            hex_strings.append(camera.convert_matrix_to_str(mat))
+
+        rounds = 20
+        start = time.perf_counter()
+        for _ in range(rounds):
+            typed = [camera.get_model_mat() for camera in head.cameras]
+        typed_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            legacy = [head.cameras[0].convert_str_to_matrix(x)
+                      for x in hex_strings]
+        legacy_time = time.perf_counter() - start
+        logger.info('Model matrices bulk read ({} cameras x {}): '
+                    'typed {:.6f}s, hex {:.6f}s'.format(
+                        cameras_count, rounds, typed_time, legacy_time))
+
+        for mat, typed_mat, legacy_mat in zip(matrices, typed, legacy):
+            self.assertTrue(np.array_equal(mat, typed_mat))
+            self.assertTrue(np.array_equal(mat, legacy_mat))
+
+        # Migration from hex strings of old scenes
+        camera = head.cameras[0]
+        camera.model_mat_token = 0
+        camera.model_mat = hex_strings[1]
+        self.assertTrue(np.array_equal(matrices[1], camera.get_model_mat()))
+        camera.migrate_model_mat()
+        self.assertEqual('', camera.model_mat)
+        self.assertNotEqual(0, camera.model_mat_token)
+        self.assertTrue(np.array_equal(matrices[1], camera.get_model_mat()))
+
+    def test_serial_str_compression(self):
+        logger = logging.getLogger(__name__)
+        test_utils.new_scene()
+        self._head_cams_and_pins()
+        settings = get_main_settings()
+        headnum = settings.get_last_headnum()
+        head = settings.get_head(headnum)
+        self.assertEqual(Config.compress_serial_str,
+                         is_compressed_serial_str(head.serial_str))
+
+        FBLoader.load_model(headnum)
+        raw = FBLoader.get_builder().serialize()
+        self.assertEqual(raw, head.get_serial_str())
+
+        # Legacy uncompressed strings are read transparently
+        head.serial_str = raw
+        self.assertEqual(raw, head.get_serial_str())
+        self.assertTrue(FBLoader.load_model(headnum))
+
+        report = serial_str_report([x.get_serial_str()
+                                    for x in settings.heads])
+        logger.info('Serial strings: {count} heads, raw {raw_size} bytes, '
+                    'compressed {compressed_size} bytes ({ratio:.3f}), '
+                    'compress {compress_time:.6f}s, '
+                    'decompress {decompress_time:.6f}s'.format(**report))
+        self.assertTrue(report['compressed_size'] < report['raw_size'])
+
+    def test_object_index(self):
+        test_utils.new_scene()
+        self._head_and_cameras()
+        self._head_and_cameras_second()
+        settings = get_main_settings()
+        for i, head in enumerate(settings.heads):
+            self.assertEqual(i, settings.find_head_index(head.headobj))
+            self.assertEqual(i, head.get_headnum())
+            for j, camera in enumerate(head.cameras):
+                self.assertEqual((i, j), settings.find_cam_index(camera.camobj))
+                self.assertEqual((i, j), camera.get_headnum_camnum())
+                self.assertEqual(i, settings.head_by_obj(camera.camobj))
+
+        headnum = settings.get_last_headnum()
+        head = settings.get_head(headnum)
+        camobj = head.get_camera(1).camobj
+        test_utils.delete_camera(headnum, 0)
+        self.assertEqual((headnum, 0), settings.find_cam_index(camobj))
+        self.assertEqual((-1, -1), settings.find_cam_index(None))
+        self.assertEqual(-1, settings.find_head_index(camobj))
+
+        # Camera object replaced while the camera count stays the same
+        cam_data = bpy.data.cameras.new('replaced_camera')
+        new_camobj = bpy.data.objects.new('replaced_camera', cam_data)
+        bpy.context.scene.collection.objects.link(new_camobj)
+        self.assertEqual((-1, -1), settings.find_cam_index(new_camobj))
+        head.get_camera(0).camobj = new_camobj
+        self.assertEqual((headnum, 0), settings.find_cam_index(new_camobj))
+        self.assertEqual((-1, -1), settings.find_cam_index(camobj))
+
+    def _head_and_cameras_second(self):
+        settings = get_main_settings()
+        test_utils.create_head()
+        headnum = settings.get_last_headnum()
+        for filepath in DataHolder.get_image_file_names():
+            test_utils.create_camera(headnum, filepath)
+
+    def test_user_preferences_cache(self):
+        counter = {'load': 0, 'save': 0}
+        load_settings = UserPreferences.__dict__['_load_settings']
+        save_settings = UserPreferences.__dict__['_save_settings']
+
+        def _counting_load(cls):
+            counter['load'] += 1
+            return load_settings.__func__(cls)
+
+        def _counting_save(cls, dict_to_save):
+            counter['save'] += 1
+            save_settings.__func__(cls, dict_to_save)
+
+        UserPreferences.invalidate()
+        UserPreferences._load_settings = classmethod(_counting_load)
+        UserPreferences._save_settings = classmethod(_counting_save)
+        try:
+            settings = get_main_settings()
+            prefs = settings.preferences()
+            pin_size = prefs.pin_size
+            # Simulated UI session: many panel redraws and slider steps
+            for i in range(100):
+                _ = (prefs.pin_size, prefs.pin_sensitivity,
+                     prefs.prevent_view_rotation, prefs.wireframe_opacity,
+                     prefs.wireframe_color, prefs.wireframe_special_color,
+                     prefs.wireframe_midline_color,
+                     settings.pin_size, settings.pin_sensitivity)
+                if i % 10 == 0:
+                    prefs.pin_size = pin_size + i * 0.01
+            self.assertEqual(1, counter['load'])
+            self.assertEqual(0, counter['save'])
+            self.assertTrue(UserPreferences.is_dirty())
+
+            self.assertTrue(UserPreferences.flush())
+            self.assertEqual(1, counter['save'])
+            self.assertFalse(UserPreferences.flush())
+            self.assertEqual(1, counter['save'])
+
+            prefs.pin_size = pin_size
+            UserPreferences.invalidate()
+            self.assertEqual(2, counter['save'])
+            self.assertAlmostEqual(pin_size, prefs.pin_size, places=4)
+            self.assertEqual(2, counter['load'])
+        finally:
+            UserPreferences._load_settings = load_settings
+            UserPreferences._save_settings = save_settings
+
     def test_wireframe_coloring(self):
         test_utils.new_scene()
         self._head_and_cameras()
@@ -310,6 +578,389 @@ class FaceBuilderTest(unittest.TestCase):
                                        selected=i)
         test_utils.out_pinmode()
 
+    def test_auto_pin_all(self):
+        test_utils.new_scene()
+        self._head_and_cameras()
+        settings = get_main_settings()
+        headnum = settings.get_last_headnum()
+        head = settings.get_head(headnum)
+        camnum = head.get_last_camnum()
+
+        op = get_operator(Config.fb_auto_pin_all_idname)
+        op('EXEC_DEFAULT', headnum=headnum, only_unpinned=False)
+        self.assertTrue(head.get_camera(camnum - 1).has_pins())
+        self.assertTrue(head.get_camera(camnum).has_pins())
+        self.assertFalse(FBLoader.has_deferred_save())
+
+        status, results = auto_pin_cameras(headnum + 100)
+        self.assertEqual(AutoPinStatus.NoHead, status)
+        self.assertEqual({}, results)
+        status, results = auto_pin_cameras(headnum, only_unpinned=True)
+        self.assertEqual(AutoPinStatus.Ok, status)
+        self.assertEqual({}, results)
+
+    def test_batch_process_image_set(self):
+        input_dir = os.path.join(test_utils.test_dir(), 'batch_input')
+        set_dir = os.path.join(input_dir, 'head1')
+        os.makedirs(set_dir, exist_ok=True)
+        renders = [x for x in DataHolder.get_image_file_names()
+                   if os.path.basename(x) == 'head_render1.jpg']
+        self.assertEqual(1, len(renders))
+        shutil.copy(renders[0], set_dir)
+        self.assertEqual([set_dir], batch.find_image_sets(input_dir))
+
+        output_dir = os.path.join(test_utils.test_dir(), 'batch_output')
+        manifest = batch.process_image_set(set_dir, output_dir)
+        self.assertEqual('done', manifest['status'])
+        self.assertEqual(1, len(manifest['cameras']))
+        self.assertTrue(manifest['cameras'][0]['pinned'])
+        for filepath in manifest['outputs'].values():
+            self.assertTrue(os.path.exists(filepath))
+        self.assertEqual(manifest, batch.read_manifest(output_dir))
+
+    def test_batch_farm_jobs_in_one_worker(self):
+        renders = [x for x in DataHolder.get_image_file_names()
+                   if os.path.basename(x) == 'head_render1.jpg']
+        input_dir = os.path.join(test_utils.test_dir(), 'farm_input')
+        output_dir = os.path.join(test_utils.test_dir(), 'farm_output')
+        jobs = []
+        for name in ('head1', 'head2'):
+            set_dir = os.path.join(input_dir, name)
+            os.makedirs(set_dir, exist_ok=True)
+            shutil.copy(renders[0], set_dir)
+            jobs.append({'id': name, 'set': set_dir,
+                         'output': os.path.join(output_dir, name),
+                         'options': {'bake_texture': False,
+                                     'export_fbx': False}})
+        # Both jobs run in this session like in one long-living worker
+        for job in jobs:
+            self.assertEqual('done', batch.farm_job(job)['status'])
+
+        bpy.ops.wm.open_mainfile(
+            filepath=os.path.join(jobs[1]['output'], 'head.blend'))
+        heads = [head for scene in bpy.data.scenes
+                 for head in getattr(scene, Config.addon_global_var_name)
+                 .heads]
+        self.assertEqual(1, len(heads))
+        self.assertEqual(1, len(heads[0].cameras))
+        batch.reset_session()
+
+    def test_detect_faces_cache(self):
+        test_utils.new_scene()
+        self._head_and_cameras()
+        settings = get_main_settings()
+        headnum = settings.get_last_headnum()
+        head = settings.get_head(headnum)
+        camnum = head.get_last_camnum()
+
+        FBDetectionCache.clear()
+        test_utils.select_camera(headnum, camnum)
+        rects = []
+        for _ in range(3):
+            reset_detected_faces()
+            test_utils.pickmode_start(headnum=headnum, camnum=camnum)
+            faces = get_detected_faces()
+            self.assertEqual(TestConfig.faces_on_test_render, len(faces))
+            rects.append([(tuple(f.xy_min), tuple(f.xy_max)) for f in faces])
+        # Repeated cache hits must not scale rectangles again
+        self.assertEqual((2, 1), FBDetectionCache.stats())
+        self.assertEqual(rects[0], rects[1])
+        self.assertEqual(rects[0], rects[2])
+
+        w, h = head.get_camera(camnum).get_oriented_image_size()
+        for (x1, y1), (x2, y2) in rects[0]:
+            self.assertTrue(0 <= min(x1, x2) and max(x1, x2) <= w)
+            self.assertTrue(0 <= min(y1, y2) and max(y1, y2) <= h)
+        test_utils.out_pinmode()
+
+    def test_enum_items_cache(self):
+        FBEnumItemsCache.invalidate()
+        FBEnumItemsCache.reset_stats()
+        items = model_type_callback(None, None)
+        self.assertIs(items, model_type_callback(None, None))
+        uv_items = uv_items_callback(None, None)
+        self.assertIs(uv_items, uv_items_callback(None, None))
+        self.assertEqual({'model_type': (2, 1), 'uv_items': (2, 1)},
+                         FBEnumItemsCache.stats())
+
+        FBEnumItemsCache.invalidate()
+        self.assertEqual(items, model_type_callback(None, None))
+        self.assertEqual((3, 2), FBEnumItemsCache.stats()['model_type'])
+
+    def test_tracing(self):
+        FBTracer.clear()
+        test_utils.new_scene()
+        self._head_cams_and_pins()
+        self.assertEqual({}, FBTracer.stats())  # Disabled by default
+
+        FBTracer.enable(True)
+        try:
+            test_utils.new_scene()
+            self._head_cams_and_pins()
+        finally:
+            FBTracer.enable(False)
+        stats = FBTracer.stats()
+        for name in ('solve', 'place_camera',
+                     Config.fb_movepin_idname + '.execute'):
+            self.assertIn(name, stats)
+            item = stats[name]
+            self.assertTrue(0 <= item['p50'] <= item['p95'] <= item['max'])
+
+        filepath = os.path.join(test_utils.test_dir(), 'trace.json')
+        FBTracer.export(filepath, 'CHROME')
+        with open(filepath) as f:
+            events = json.load(f)['traceEvents']
+        self.assertEqual(len(FBTracer.events()), len(events))
+        self.assertTrue(all(x['ph'] == 'X' for x in events))
+        FBTracer.clear()
+
+    def test_traced_operator_arity(self):
+        # bpy.utils.register_class checks argument count of these methods
+        from keentools_facebuilder.movepin import FB_OT_MovePin
+        from keentools_facebuilder.pinmode import FB_OT_PinMode
+        from keentools_facebuilder.pick_operator import (
+            FB_OT_PickMode, FB_OT_PickModeStarter, FB_OT_AutoPinAll)
+        for cls, method, argcount in (
+                (FB_OT_MovePin, 'execute', 2), (FB_OT_MovePin, 'invoke', 3),
+                (FB_OT_MovePin, 'modal', 3), (FB_OT_PinMode, 'invoke', 3),
+                (FB_OT_PinMode, 'modal', 3), (FB_OT_PickMode, 'modal', 3),
+                (FB_OT_PickModeStarter, 'invoke', 3),
+                (FB_OT_AutoPinAll, 'execute', 2)):
+            self.assertEqual(argcount,
+                             getattr(cls, method).__code__.co_argcount)
+
+    def test_pin_session_flushes_deferred_save(self):
+        test_utils.new_scene()
+        self._head_and_cameras()
+        settings = get_main_settings()
+        headnum = settings.get_last_headnum()
+        head = settings.get_head(headnum)
+        FBLoader.save_deferred(headnum)
+        self.assertTrue(FBLoader.has_deferred_save())
+
+        session = FBPinSessionRecorder._new_session(head)
+        self.assertFalse(FBLoader.has_deferred_save())
+        self.assertEqual(head.get_serial_str(), session['serial_str'])
+
+    def test_pin_session_replay(self):
+        test_utils.new_scene()
+        FBPinSessionRecorder.start()
+        try:
+            self._head_cams_and_pins()
+        finally:
+            FBPinSessionRecorder.stop()
+        session_path = os.path.join(test_utils.test_dir(), 'session.json')
+        FBPinSessionRecorder.save(session_path)
+        session = load_session(session_path)
+        actions = [x[1] for x in session['events']]
+        self.assertEqual(12, len(actions))
+        self.assertEqual(4, actions.count(FBPinSessionRecorder.MOUSE_MOVE))
+
+        report_path = os.path.join(test_utils.test_dir(), 'report.json')
+        report = benchmark.replay_file(session_path, report_path, repeat=2)
+        self.assertEqual(2 * len(actions), len(report['events']))
+        self.assertEqual(2 * 4, report['solve_count'])
+        self.assertEqual(8, report['actions']['mouse_move']['count'])
+        self.assertIn('place_camera', report['stages'])
+        self.assertGreater(report['view_geometry']['hit_rate'], 0.5)
+        with open(report_path) as f:
+            self.assertEqual(report['solve_count'],
+                             json.load(f)['solve_count'])
+
+        settings = get_main_settings()
+        headnum = settings.get_last_headnum()
+        camnum = settings.get_last_camnum(headnum)
+        self.assertEqual(4, settings.get_camera(headnum, camnum).pins_count)
+        self.assertFalse(FBTracer.is_enabled())
+
+    def test_drag_scheduler(self):
+        FBDragScheduler.reset()
+        FBDragScheduler.push(1, 1)
+        self.assertTrue(FBDragScheduler.is_due())
+        self.assertEqual((1, 1), FBDragScheduler.pop())
+        FBDragScheduler.run_started()
+        FBDragScheduler.run_finished()
+
+        for i in range(2, 12):
+            FBDragScheduler.push(i, 1)
+        # Frame interval has not passed yet, only the latest move is kept
+        self.assertFalse(FBDragScheduler.is_due())
+        self.assertEqual((11, 1), FBDragScheduler.pop())
+        self.assertEqual({'moves': 11, 'runs': 1, 'coalesced': 10},
+                         FBDragScheduler.stats())
+        # Already solved position is not solved again on release
+        FBDragScheduler.push(11, 1)
+        self.assertFalse(FBDragScheduler.has_pending())
+        self.assertGreaterEqual(FBDragScheduler.interval(),
+                                Config.drag_frame_interval)
+
+    def test_async_solver(self):
+        test_utils.new_scene()
+        self._head_cams_and_pins()
+        settings = get_main_settings()
+        headnum = settings.get_last_headnum()
+        camnum = settings.get_last_camnum(headnum)
+        kid = settings.get_keyframe(headnum, camnum)
+        test_utils.select_camera(headnum, camnum)
+        FBLoader.load_model(headnum)
+        fb = FBLoader.get_builder()
+        x, y = fb.pin(kid, 0).img_pos
+
+        # Solve time on the test model is too small for the probe
+        FBAsyncSolver._gil_released = True
+        before = FBAsyncSolver.stats()
+        try:
+            self.assertTrue(FBAsyncSolver.start(headnum, camnum))
+            for i in range(5):
+                FBAsyncSolver.submit(kid, 0, (x + i, y))
+            FBAsyncSolver.finish()
+        finally:
+            FBAsyncSolver._gil_released = None
+        self.assertFalse(FBAsyncSolver.is_running())
+
+        after = FBAsyncSolver.stats()
+        self.assertEqual(5, after['submitted'] - before['submitted'])
+        self.assertEqual(5, after['applied'] + after['dropped'] -
+                         before['applied'] - before['dropped'])
+        self.assertGreaterEqual(after['applied'] - before['applied'], 1)
+        # Latest request always wins
+        self.assertAlmostEqual(x + 4, fb.pin(kid, 0).img_pos[0], places=3)
+
+        # The first real solve decides, no extra probe solve is made
+        FBAsyncSolver._gil_released = None
+        FBTracer.clear()
+        before = FBAsyncSolver.stats()
+        try:
+            self.assertTrue(FBAsyncSolver.start(headnum, camnum))
+            FBAsyncSolver.submit(kid, 0, (x, y))
+            self.assertIsNotNone(FBAsyncSolver._gil_released)
+            self.assertEqual(before['applied'] + 1,
+                             FBAsyncSolver.stats()['applied'])
+            self.assertEqual(FBAsyncSolver._gil_released,
+                             FBAsyncSolver.is_running())
+            FBAsyncSolver.finish()
+        finally:
+            FBAsyncSolver._gil_released = None
+        self.assertAlmostEqual(x, fb.pin(kid, 0).img_pos[0], places=3)
+        # Worker timings are recorded only when tracing is enabled
+        self.assertEqual({}, FBTracer.stats())
+        test_utils.out_pinmode()
+
+    def test_update_all_camera_positions(self):
+        test_utils.new_scene()
+        self._head_cams_and_pins()
+        settings = get_main_settings()
+        headnum = settings.get_last_headnum()
+        head = settings.get_head(headnum)
+        FBLoader.load_model(headnum)
+        fb = FBLoader.get_builder()
+
+        FBLoader.update_all_camera_positions(headnum)
+        tokens = [c.model_mat_token for c in head.cameras]
+        for camnum, camera in enumerate(head.cameras):
+            if not camera.has_pins():
+                continue
+            self.assertTrue(np.allclose(
+                fb.model_mat(camera.get_keyframe()),
+                camera.get_model_mat(), atol=1e-5))
+            pose = np.array(camera.camobj.matrix_world)
+            FBLoader.place_camera(headnum, camnum)
+            self.assertTrue(np.allclose(
+                pose, np.array(camera.camobj.matrix_world), atol=1e-5))
+
+        # Nothing has changed, so nothing is written back
+        FBLoader.update_all_camera_positions(headnum)
+        self.assertEqual(tokens, [c.model_mat_token for c in head.cameras])
+
+    def test_solver_config_diffing(self):
+        test_utils.new_scene()
+        self._head_cams_and_pins()
+        settings = get_main_settings()
+        headnum = settings.get_last_headnum()
+        head = settings.get_head(headnum)
+
+        FBLoader.load_model(headnum)
+        self.assertTrue(FBLoader.configure_solver(head))
+        self.assertFalse(FBLoader.configure_solver(head))
+
+        settings.shape_rigidity = settings.shape_rigidity * 0.5
+        self.assertTrue(FBLoader.configure_solver(head))
+        head.get_camera(0).auto_focal_estimation = \
+            not head.get_camera(0).auto_focal_estimation
+        self.assertTrue(FBLoader.configure_solver(head))
+        self.assertFalse(FBLoader.configure_solver(head))
+
+        # Builder state is replaced by deserialization
+        FBLoader.load_model(headnum)
+        self.assertTrue(FBLoader.configure_solver(head))
+
+    def test_update_transaction(self):
+        test_utils.new_scene()
+        self._head_cams_and_pins()
+        settings = get_main_settings()
+        headnum = settings.get_last_headnum()
+        camnum = settings.get_last_camnum(headnum)
+        head = settings.get_head(headnum)
+        test_utils.select_camera(headnum, camnum)
+
+        FBTracer.clear()
+        FBTracer.enable(True)
+        try:
+            head.focal = 35.0
+            head.model_scale = 1.5
+        finally:
+            FBTracer.enable(False)
+        # One serialization per property change, not per camera
+        self.assertEqual(2, FBTracer.stats()['serialize']['count'])
+        for camera in head.cameras:
+            self.assertAlmostEqual(camera.focal, camera.camobj.data.lens,
+                                   places=4)
+
+        FBUpdateTransaction.reset_stats()
+        with FBUpdateTransaction.begin():
+            head.masks[0] = False
+            head.masks[1] = False
+            head.masks[0] = True
+        self.assertEqual({'deferred': 3, 'collapsed': 2, 'flushes': 1},
+                         FBUpdateTransaction.stats())
+        self.assertFalse(FBUpdateTransaction.is_active())
+
+    def test_view_geometry_cache(self):
+        test_utils.new_scene()
+        geometry = coords.FBViewGeometry
+        geometry.invalidate()
+        geometry.reset_stats()
+        border = coords.get_camera_border(bpy.context)
+        self.assertEqual(border, coords.get_camera_border(bpy.context))
+        coords.get_pixel_relative_size(bpy.context)
+        self.assertEqual({'hits': 2, 'misses': 1},
+                         {k: geometry.stats()[k] for k in ('hits', 'misses')})
+
+        points = geometry.image_space_to_region_array(
+            bpy.context, [(0.1, -0.2), (-0.3, 0.25)])
+        back = geometry.region_to_image_space_array(bpy.context, points)
+        self.assertTrue(np.allclose(back, [(0.1, -0.2), (-0.3, 0.25)],
+                                    atol=1e-5))
+        x, y = coords.image_space_to_region(0.1, -0.2, *border)
+        self.assertAlmostEqual(x, points[0][0], places=3)
+        self.assertAlmostEqual(y, points[0][1], places=3)
+
+        bpy.context.scene.render.resolution_x += 100
+        self.assertNotEqual(border, coords.get_camera_border(bpy.context))
+        self.assertEqual(2, geometry.stats()['misses'])
+
+    def test_addon_startup_time(self):
+        timings, importtime = _measure_addon_startup()
+        slowest = sorted(((v, k) for k, v in importtime.items()
+                          if k.startswith('keentools_facebuilder')),
+                         reverse=True)[:10]
+        logger = logging.getLogger(__name__)
+        logger.info('Addon startup: {} slowest imports (us): {}'.format(
+            timings, slowest))
+        self.assertFalse(timings['pykeentools_loaded'])
+        self.assertLess(timings['import'] + timings['register'],
+                        TestConfig.addon_startup_budget)
+
 
 def prepare_test_environment():
     test_utils.clear_test_dir()